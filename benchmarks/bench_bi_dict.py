@@ -0,0 +1,77 @@
+"""
+Compares the lookups and the updates of BiDict with the previous implementation, which caught a KeyError on every
+lookup in the inverse direction and updated the items one by one, on dictionaries of 10^3 and 10^5 items.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_bi_dict.py
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+
+from flanautils import BiDict
+
+
+class LegacyBiDict(dict):
+    def __init__(self, dict_: dict = None):
+        dict_ = {} if dict_ is None else dict_
+        super().__init__(dict_)
+        self.inverted = {v: k for k, v in dict_.items()}
+
+    def __getitem__(self, item):
+        try:
+            return super().__getitem__(item)
+        except (KeyError, TypeError):
+            return self.inverted[item]
+
+    def get(self, key, default=None):
+        if (value := super().get(key, default)) == default:
+            return self.inverted.get(key, default)
+        else:
+            return value
+
+    def update(self, mapping, **kwargs):
+        items = list(mapping.items())
+        items.extend(list(kwargs.items()))
+        for k, v in items:
+            self[k] = v
+            self.inverted[v] = k
+
+
+def main(sizes=(10 ** 3, 10 ** 5), number=10 ** 5, repeat=3):
+    random_ = random.Random(0)
+    for size in sizes:
+        items = {i: f'word_{i}' for i in range(size)}
+        new_items = {i: f'new_word_{i}' for i in random_.sample(range(size), size // 2)}
+        keys = [random_.randrange(size) for _ in range(number)]
+        values = [items[key] for key in keys]
+        misses = [f'miss_{key}' for key in keys]
+        print(f'{size} items')
+        cases = (
+            ('d[key]', lambda d: [d[key] for key in keys]),
+            ('d[value]', lambda d: [d[value] for value in values]),
+            ('d.get(key)', lambda d: [d.get(key) for key in keys]),
+            ('d.get(value)', lambda d: [d.get(value) for value in values]),
+            ('d.get(miss)', lambda d: [d.get(miss) for miss in misses]),
+            ('d.inverse[value]', lambda d: [d.inverse[value] for value in values]),
+            ('d.forward.get(key)', lambda d: [d.forward.get(key) for key in keys])
+        )
+        for name, function in cases:
+            times = []
+            for class_ in (LegacyBiDict, BiDict):
+                if class_ is LegacyBiDict and name.startswith(('d.forward', 'd.inverse')):  # the views are new
+                    times.append(None)
+                    continue
+                d = class_(items)
+                times.append(min(timeit.repeat(lambda: function(d), number=1, repeat=repeat)))
+            legacy = '-' if times[0] is None else f'{times[0] * 10 ** 9 / number:7.1f}'
+            print(f'    {name:<20} legacy {legacy:>7} ns   BiDict {times[1] * 10 ** 9 / number:7.1f} ns')
+
+        for name, function in (('build', lambda class_: class_(items)), ('update', lambda class_: class_(items).update(new_items))):
+            times = [min(timeit.repeat(lambda: function(class_), number=1, repeat=repeat)) for class_ in (LegacyBiDict, BiDict)]
+            print(f'    {name:<20} legacy {times[0] * 1000:7.2f} ms   BiDict {times[1] * 1000:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Compares the previous BytesBase serialization (pickle.dumps / pickle.loads) with the out-of-band wire format for Media
+objects with big payloads and with small ones.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_bytes.py
+"""
+
+from __future__ import annotations
+
+import pickle
+import timeit
+
+from flanautils import Media, MediaType
+
+
+def main(repeat=5):
+    cases = (
+        ('16 MiB x 10', [Media(f'https://example.com/{i}.mp4', bytes(16 << 20), MediaType.VIDEO) for i in range(10)]),
+        ('1 KiB x 10000', [Media(f'https://example.com/{i}.mp4', bytes(1 << 10), MediaType.VIDEO) for i in range(10000)])
+    )
+    for name, medias in cases:
+        pickles = [pickle.dumps(media) for media in medias]
+        frames = [bytes(media) for media in medias]
+        times = (
+            min(timeit.repeat(lambda: [pickle.dumps(media) for media in medias], number=1, repeat=repeat)),
+            min(timeit.repeat(lambda: [media.to_frames() for media in medias], number=1, repeat=repeat)),
+            min(timeit.repeat(lambda: [bytes(media) for media in medias], number=1, repeat=repeat)),
+            min(timeit.repeat(lambda: [pickle.loads(bytes_) for bytes_ in pickles], number=1, repeat=repeat)),
+            min(timeit.repeat(lambda: [Media.from_bytes(bytes_) for bytes_ in frames], number=1, repeat=repeat)),
+            min(timeit.repeat(lambda: [Media.from_bytes(bytes_, zero_copy=True) for bytes_ in frames], number=1, repeat=repeat))
+        )
+        print(
+            f'{name:<14} dumps: pickle {times[0] * 1000:8.2f} ms   to_frames {times[1] * 1000:8.2f} ms   bytes {times[2] * 1000:8.2f} ms'
+            f'   loads: pickle {times[3] * 1000:8.2f} ms   from_bytes {times[4] * 1000:8.2f} ms   zero_copy {times[5] * 1000:8.2f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares the memory, the construction, the membership tests, the set algebra and the pickled size of OrderedSet and
+CompactOrderedSet with a million ints (user ids) and a million short strings.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_compact_ordered_set.py
+"""
+
+from __future__ import annotations
+
+import gc
+import pickle
+import random
+import timeit
+import tracemalloc
+from typing import Callable
+
+from flanautils import CompactOrderedSet, OrderedSet
+
+
+def measure_memory(class_, create_elements: Callable[[], list]) -> float:
+    """Returns the memory that a set keeps alive, including its elements."""
+
+    gc.collect()
+    tracemalloc.start()
+    elements = create_elements()
+    ordered_set = class_(elements)
+    ordered_set.add(elements[0])  # builds the index of CompactOrderedSet
+    del elements
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del ordered_set
+    return memory
+
+
+def main(size=10 ** 6, repeat=3):
+    random_ = random.Random(0)
+    datasets = (
+        ('ints', lambda: [random_.randrange(10 ** 12) for _ in range(size)]),
+        ('strings', lambda: [f'user_{random_.randrange(10 ** 8):x}' for _ in range(size)])
+    )
+    for name, create_elements in datasets:
+        elements = create_elements()
+        other_elements = elements[size // 2:] + create_elements()[size // 2:]
+        print(f'{size} {name}')
+        for class_ in (OrderedSet, CompactOrderedSet):
+            memory = measure_memory(class_, create_elements)
+            ordered_set = class_(elements)
+            other = class_(other_elements)
+            probes = random_.sample(elements, 1000)
+            build_time = min(timeit.repeat(lambda: class_(elements), number=1, repeat=repeat))
+            contains_time = min(timeit.repeat(lambda: [probe in ordered_set for probe in probes], number=1, repeat=repeat))
+            and_time = min(timeit.repeat(lambda: ordered_set & other, number=1, repeat=repeat))
+            sub_time = min(timeit.repeat(lambda: ordered_set - other, number=1, repeat=repeat))
+            pickle_size = len(pickle.dumps(ordered_set))
+            print(
+                f'    {class_.__name__:<17}'
+                f' memory {memory / size:6.1f} B/element'
+                f'   build {build_time * 1000:7.1f} ms'
+                f'   1000 x in {contains_time * 1000:6.2f} ms'
+                f'   & {and_time * 1000:7.1f} ms'
+                f'   - {sub_time * 1000:7.1f} ms'
+                f'   pickle {pickle_size / size:5.1f} B/element'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares copy.deepcopy with CopyBase.deep_copy (with and without copy on write) on an object graph with Media payloads,
+a MultiTraceChart and a big OrderedSet. Every case runs in a new process to measure its peak RSS increase.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_deep_copy.py
+"""
+
+from __future__ import annotations
+
+import copy
+import multiprocessing
+import resource
+import time
+from dataclasses import dataclass, field
+
+from flanautils import FlanaBase, Media, MediaType, OrderedSet
+from flanautils.models.plotly_charts import MultiTraceChart
+
+
+@dataclass
+class Library(FlanaBase):
+    medias: list[Media] = field(default_factory=list)
+    chart: MultiTraceChart = None
+    tags: OrderedSet[str] = field(default_factory=OrderedSet)
+
+
+def build_library() -> Library:
+    chart = MultiTraceChart()
+    for i in range(5):
+        chart.figure.add_scatter(x=list(range(10000)), y=[j * i for j in range(10000)])
+
+    return Library(
+        [Media(f'https://example.com/{i}.mp4', bytes(4 << 20), MediaType.VIDEO) for i in range(20)],
+        chart,
+        OrderedSet(f'tag_{i}' for i in range(100000))
+    )
+
+
+def measure(name: str, queue: multiprocessing.Queue):
+    library = build_library()
+    copy_functions = {
+        'copy.deepcopy': copy.deepcopy,
+        'deep_copy': Library.deep_copy,
+        'deep_copy cow': lambda library_: library_.deep_copy(copy_on_write=True)
+    }
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_time = time.perf_counter()
+    copy_functions[name](library)
+    elapsed_time = time.perf_counter() - start_time
+    queue.put((elapsed_time, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - max_rss))
+
+
+def main():
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    for name in ('copy.deepcopy', 'deep_copy', 'deep_copy cow'):
+        process = context.Process(target=measure, args=(name, queue))
+        process.start()
+        elapsed_time, rss_increase = queue.get()
+        process.join()
+        print(f'{name:<14} {elapsed_time * 1000:9.2f} ms   peak RSS +{rss_increase / 1024:7.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Compares DictBase.from_dict and DictBase.to_dict with the previous implementation, which resolved the type hints and
+matched every value on every call.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_dict_codec.py
+"""
+
+from __future__ import annotations
+
+import copy
+import pickle
+import timeit
+import typing
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from flanautils.models.bases import DictBase, MongoBase
+
+
+def legacy_from_dict(cls, data: dict, lazy=True) -> DictBase:
+    def decode_dict(cls_, data_: dict) -> typing.Any:
+        new_data = copy.copy(data_)
+        type_hints = typing.get_type_hints(cls_)
+        for k, v in data_.items():
+            try:
+                type_ = type_hints[k]
+            except (KeyError, TypeError):
+                continue
+
+            type_origin = typing.get_origin(type_)
+            type_args = typing.get_args(type_)
+            try:
+                value_type = type_args[-1]
+            except (IndexError, TypeError):
+                value_type = type
+
+            type_ = type_origin or type_
+
+            match v:
+                case dict() if issubclass(type_, DictBase) and lazy:
+                    continue
+                case dict(dict_) if issubclass(type_, DictBase) and not lazy:
+                    new_data[k] = decode_dict(type_, dict_)
+                case [*_, dict()] as list_ if not isinstance(list_, set) and type_origin and type_origin is not typing.Union and issubclass(type_origin, Iterable) and issubclass(value_type, DictBase) and not lazy:
+                    new_data[k] = [decode_dict(value_type, dict_) for dict_ in list_]
+                case [*_, bytes()] as list_ if not lazy:
+                    try:
+                        new_data[k] = [pickle.loads(bytes_) for bytes_ in list_]
+                    except (pickle.UnpicklingError, EOFError):
+                        pass
+                case bytes(bytes_):
+                    try:
+                        new_data[k] = pickle.loads(bytes_)
+                    except (pickle.UnpicklingError, EOFError):
+                        pass
+
+        return new_data if issubclass(cls_, dict) else cls_(**new_data)
+
+    return decode_dict(cls, data)
+
+
+def legacy_to_dict(self, pickle_types: tuple | list = ()) -> typing.Any:
+    def encode_obj(obj_) -> typing.Any:
+        match obj_:
+            case _ if isinstance(obj_, pickle_types):
+                return pickle.dumps(obj_)
+            case MongoBase():
+                return legacy_to_dict(obj_, pickle_types)
+            case [*_, _] as objs:
+                return [encode_obj(obj) for obj in objs]
+            case _:
+                return obj_
+
+    if not isinstance(dict_repr := self._dict_repr(), dict):
+        return dict_repr
+
+    self_vars = dict_repr.copy()
+    for k, v in self_vars.items():
+        self_vars[k] = encode_obj(v)
+
+    return self_vars
+
+
+@dataclass
+class Point(DictBase):
+    x: float = 0
+    y: float = 0
+    label: str = ''
+
+
+@dataclass
+class Track(DictBase):
+    id: int = 0
+    name: str = ''
+    tags: list[str] = field(default_factory=list)
+    start: Point = None
+    points: list[Point] = field(default_factory=list)
+    extra: bytes = None
+
+
+def main(n_documents=2000, repeat=5):
+    tracks = [
+        Track(
+            i,
+            f'track_{i}',
+            ['a', 'b', 'c'],
+            Point(i, i, 'start'),
+            [Point(i, j, f'point_{j}') for j in range(10)],
+            pickle.dumps({i})
+        )
+        for i in range(n_documents)
+    ]
+    documents = [track.to_dict() for track in tracks]
+
+    cases = (
+        ('from_dict lazy', lambda: [legacy_from_dict(Track, document) for document in documents], lambda: [Track.from_dict(document) for document in documents]),
+        ('from_dict eager', lambda: [legacy_from_dict(Track, document, lazy=False) for document in documents], lambda: [Track.from_dict(document, lazy=False) for document in documents]),
+        ('to_dict', lambda: [legacy_to_dict(track) for track in tracks], lambda: [track.to_dict() for track in tracks])
+    )
+    for name, legacy, compiled in cases:
+        legacy_time = min(timeit.repeat(legacy, number=1, repeat=repeat))
+        compiled_time = min(timeit.repeat(compiled, number=1, repeat=repeat))
+        print(f'{name:<16} legacy {legacy_time * 1000:8.2f} ms   compiled {compiled_time * 1000:8.2f} ms   x{legacy_time / compiled_time:.1f}')
+
+
+if __name__ == '__main__':
+    main()
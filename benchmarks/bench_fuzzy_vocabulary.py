@@ -0,0 +1,138 @@
+"""
+Compares text_to_number and text_to_time, which now match the words with precompiled FuzzyVocabulary objects, with the
+previous implementations, which compared every word with every vocabulary word, on 10^4 chat messages, and the matching
+alone without the memo. It also checks that both return the same results.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_fuzzy_vocabulary.py
+"""
+
+from __future__ import annotations
+
+import datetime
+import random
+import re
+import string
+import timeit
+
+import jellyfish
+
+from flanautils import FuzzyVocabulary, constants, strings
+
+
+def legacy_text_to_number(text: str, parse_k=True, ignore_no_numbers=True) -> int | float:
+    text = strings.remove_accents(text)
+    text = strings.remove_symbols(text, ('+', '-', '.'))
+    number_words_es = constants.NUMBER_WORDS['es']
+    text = strings.replace(text, {'y': ' ', 'ç': None})
+    text = re.sub(r'(([ei]nt[aeio])|(ec))', r'\1 ', text)
+    words = text.lower().split()
+    total = 0
+    sign = 1
+    for i, word in enumerate(words):
+        word = word.strip('.')
+
+        if parse_k:
+            if word and (has_k := word[-1].lower() == 'k'):
+                word = word[:-1]
+            else:
+                has_k = i + 1 < len(words) and words[i + 1].lower() == 'k'
+        else:
+            has_k = False
+
+        try:
+            n = sign * strings.cast_number(word)
+        except ValueError:
+            pass
+        else:
+            total += n * 1000 if has_k else n
+            continue
+
+        if len(word) > constants.TEXT_TO_NUMBER_MAX_WORD_LENGTH:
+            continue
+
+        if word == '+' or jellyfish.jaro_winkler_similarity(word, number_words_es['+']) >= constants.NUMBERS_SCORE_MATCHING:
+            sign = 1
+            continue
+        elif word == '-' or jellyfish.jaro_winkler_similarity(word, number_words_es['-']) >= constants.NUMBERS_SCORE_MATCHING:
+            sign = -1
+            continue
+
+        if word_matches := strings.cartesian_product_string_matching(word, number_words_es.values(), constants.NUMBERS_SCORE_MATCHING):
+            number_word = max(word_matches[word].items(), key=lambda item: item[1])[0]
+            total += sign * number_words_es[number_word]
+        elif not ignore_no_numbers:
+            raise KeyError(word)
+
+    return total
+
+
+def legacy_text_to_time(text: str) -> datetime.timedelta:
+    delta_time = datetime.timedelta()
+    n = 0
+    for word in text.split():
+        if jellyfish.jaro_winkler_similarity(word, 'segundo') >= constants.TIME_UNITS_SCORE_MATCHING:
+            delta_time += datetime.timedelta(seconds=n)
+            n = 0
+        elif jellyfish.jaro_winkler_similarity(word, 'minuto') >= constants.TIME_UNITS_SCORE_MATCHING or jellyfish.jaro_winkler_similarity(word, 'min') >= constants.TIME_UNITS_SCORE_MATCHING:
+            delta_time += datetime.timedelta(minutes=n)
+            n = 0
+        elif jellyfish.jaro_winkler_similarity(word, 'hora') >= constants.TIME_UNITS_SCORE_MATCHING:
+            delta_time += datetime.timedelta(hours=n)
+            n = 0
+        elif jellyfish.jaro_winkler_similarity(word, 'dia') >= constants.TIME_UNITS_SCORE_MATCHING:
+            delta_time += datetime.timedelta(days=n)
+            n = 0
+        elif jellyfish.jaro_winkler_similarity(word, 'semana') >= constants.TIME_UNITS_SCORE_MATCHING:
+            delta_time += datetime.timedelta(weeks=n)
+            n = 0
+        elif jellyfish.jaro_winkler_similarity(word, 'mes') >= constants.TIME_UNITS_SCORE_MATCHING:
+            delta_time += datetime.timedelta(weeks=n * constants.WEEKS_IN_A_MONTH)
+            n = 0
+        elif jellyfish.jaro_winkler_similarity(word, 'año') >= constants.TIME_UNITS_SCORE_MATCHING:
+            delta_time += datetime.timedelta(weeks=n * constants.WEEKS_IN_A_YEAR)
+            n = 0
+        else:
+            n += legacy_text_to_number(word)
+
+    return delta_time
+
+
+def typo(random_: random.Random, word: str) -> str:
+    if len(word) < 4 or random_.random() < 0.7:
+        return word
+    i = random_.randrange(len(word))
+    return word[:i] + random_.choice(string.ascii_lowercase) + word[i + 1:]
+
+
+def main(n_messages=10 ** 4, repeat=3):
+    random_ = random.Random(0)
+    vocabulary = list(constants.NUMBER_WORDS['es'].values()) + list(constants.TIME_UNITS['es'])
+    other_words = [''.join(random_.choices(string.ascii_lowercase, k=random_.randint(2, 9))) for _ in range(2000)]
+    messages = [
+        ' '.join(typo(random_, random_.choice(vocabulary)) if random_.random() < 0.3 else random_.choice(other_words) for _ in range(random_.randint(3, 12)))
+        for _ in range(n_messages)
+    ]
+
+    cases = (
+        ('text_to_number', legacy_text_to_number, strings.text_to_number),
+        ('text_to_time', legacy_text_to_time, strings.text_to_time)
+    )
+    for name, legacy_function, function in cases:
+        if [legacy_function(message) for message in messages] != [function(message) for message in messages]:
+            raise AssertionError(f'{name} results differ')
+        legacy_time = min(timeit.repeat(lambda: [legacy_function(message) for message in messages], number=1, repeat=repeat))
+        strings._fuzzy_vocabulary.cache_clear()
+        cold_time = timeit.timeit(lambda: [function(message) for message in messages], number=1)
+        warm_time = min(timeit.repeat(lambda: [function(message) for message in messages], number=1, repeat=repeat))
+        print(f'{name:<15} {n_messages} messages   legacy {legacy_time * 1000:8.2f} ms   cold memo {cold_time * 1000:8.2f} ms   warm memo {warm_time * 1000:8.2f} ms')
+
+    words = ' '.join(messages).split()
+    number_words = list(constants.NUMBER_WORDS['es'].values())
+    legacy_time = min(timeit.repeat(lambda: [strings.cartesian_product_string_matching(word, number_words, constants.NUMBERS_SCORE_MATCHING) for word in words], number=1, repeat=repeat))
+    uncached_vocabulary = FuzzyVocabulary(number_words, constants.NUMBERS_SCORE_MATCHING, cache_size=0)
+    uncached_time = min(timeit.repeat(lambda: [uncached_vocabulary.matches(word) for word in words], number=1, repeat=repeat))
+    print(f'{"matching only":<15} {len(words)} words   legacy {legacy_time * 1000:8.2f} ms   no memo {uncached_time * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Compares the positional operations of OrderedSet, which iterate the elements, with the ones of IndexedOrderedSet on
+sets of 100000 elements.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_indexed_ordered_set.py
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+
+from flanautils import IndexedOrderedSet, OrderedSet
+
+
+def main(size=100000, number=100, repeat=3):
+    random_ = random.Random(0)
+    positions = [random_.randrange(size) for _ in range(number)]
+    cases = (
+        ('getitem', lambda s: [s[i] for i in positions]),
+        ('index', lambda s: [s.index(i) for i in positions]),
+        ('slice', lambda s: [s[i:i + 10] for i in positions]),
+        ('insert', lambda s: [s.insert(i, -i - 1) for i in positions]),
+        ('pop(0)', lambda s: [s.pop(0) for _ in positions]),
+        ('pop()', lambda s: [s.pop() for _ in positions])
+    )
+    for class_ in (OrderedSet, IndexedOrderedSet):
+        build_time = min(timeit.repeat(lambda: class_(range(size)), number=1, repeat=repeat))
+        print(f'{class_.__name__:<17} build {build_time * 1000:8.2f} ms')
+
+    for name, function in cases:
+        times = []
+        for class_ in (OrderedSet, IndexedOrderedSet):
+            sets = [class_(range(size)) for _ in range(repeat)]
+            times.append(min(timeit.repeat(lambda: function(sets.pop()), number=1, repeat=repeat)))
+        print(f'{name:<8} x{number}   OrderedSet {times[0] * 1000:9.2f} ms   IndexedOrderedSet {times[1] * 1000:7.2f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Compares JSONBASE.to_json and JSONBASE.from_json with the typed JSON engine (to_typed_json and from_typed_json) for Media
+and OrderedSet payloads, with the fast backend if it is installed and with the json module.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_json.py
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from flanautils import Media, MediaType, OrderedSet, Source
+from flanautils.models import bases
+
+
+def measure(objects: list, repeat: int) -> tuple[float, float, float, float]:
+    texts = [object_.to_json() for object_ in objects]
+    typed_texts = [object_.to_typed_json() for object_ in objects]
+    class_ = type(objects[0])
+    return (
+        min(timeit.repeat(lambda: [object_.to_json() for object_ in objects], number=1, repeat=repeat)),
+        min(timeit.repeat(lambda: [class_.from_json(text) for text in texts], number=1, repeat=repeat)),
+        min(timeit.repeat(lambda: [object_.to_typed_json() for object_ in objects], number=1, repeat=repeat)),
+        min(timeit.repeat(lambda: [class_.from_typed_json(text) for text in typed_texts], number=1, repeat=repeat))
+    )
+
+
+def main(n_objects=2000, repeat=5):
+    cases = (
+        ('Media', [Media(f'https://example.com/{i}.mp4', bytes(100), MediaType.VIDEO, 'mp4', Source.YOUTUBE, f'title {i}') for i in range(n_objects)]),
+        ('OrderedSet', [OrderedSet(f'element_{j}' for j in range(20)) for _ in range(n_objects)])
+    )
+    backends = (('fast', bases.orjson), ('stdlib', None)) if bases.orjson else (('stdlib', None),)
+    for backend_name, orjson in backends:
+        bases.orjson = orjson
+        for name, objects in cases:
+            to_json_time, from_json_time, to_typed_json_time, from_typed_json_time = measure(objects, repeat)
+            print(
+                f'{name:<10} {backend_name:<6}'
+                f' to_json {to_json_time * 1000:8.2f} ms   typed {to_typed_json_time * 1000:8.2f} ms   x{to_json_time / to_typed_json_time:.1f}'
+                f'   from_json {from_json_time * 1000:8.2f} ms   typed {from_typed_json_time * 1000:8.2f} ms   x{from_json_time / from_typed_json_time:.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
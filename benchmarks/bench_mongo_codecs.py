@@ -0,0 +1,57 @@
+"""
+Compares loading documents whose fields were saved pickled with loading the same documents encoded with the MongoCodec
+of each type. The documents go through a BSON round trip like the ones returned by pymongo. "decode fields" only measures
+the decoding of the values and "from_dict" also the construction of the objects.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_mongo_codecs.py
+"""
+
+from __future__ import annotations
+
+import datetime
+import timeit
+from dataclasses import dataclass, field
+from typing import AbstractSet
+
+import bson
+
+from flanautils import DCMongoBase, MediaType, OrderedSet, TimeUnits
+
+
+@dataclass(eq=False)
+class Track(DCMongoBase):
+    id: int = None
+    tags: set[str] = field(default_factory=set)
+    artists: OrderedSet[str] = field(default_factory=OrderedSet)
+    media_types: list[MediaType] = field(default_factory=list)
+    duration: datetime.timedelta = None
+    time_units: TimeUnits = None
+
+
+def main(n_documents=2000, repeat=5):
+    tracks = [
+        Track(
+            i,
+            {f'tag_{j}' for j in range(10)},
+            OrderedSet(f'artist_{j}' for j in range(5)),
+            [MediaType.AUDIO, MediaType.VIDEO],
+            datetime.timedelta(seconds=i),
+            TimeUnits(seconds=i)
+        )
+        for i in range(n_documents)
+    ]
+    pickle_types = (AbstractSet, MediaType, datetime.timedelta, TimeUnits)
+    cases = (
+        ('pickled', [bson.decode(bson.encode(track.to_mongo(pickle_types))) for track in tracks]),
+        ('codecs', [bson.decode(bson.encode(track.to_mongo())) for track in tracks])
+    )
+    data_decoder = Track._get_data_decoder()
+    for name, documents in cases:
+        decode_time = min(timeit.repeat(lambda: [data_decoder(document) for document in documents], number=1, repeat=repeat))
+        from_dict_time = min(timeit.repeat(lambda: [Track.from_dict(document) for document in documents], number=1, repeat=repeat))
+        size = sum(len(bson.encode(document)) for document in documents)
+        print(f'{name:<8} decode fields {decode_time * 1000:8.2f} ms   from_dict {from_dict_time * 1000:8.2f} ms   {size / n_documents:6.0f} bytes/document')
+
+
+if __name__ == '__main__':
+    main()
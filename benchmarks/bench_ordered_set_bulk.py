@@ -0,0 +1,103 @@
+"""
+Compares the bulk operations of OrderedSet, which now rebuild the elements in one pass, with the previous
+implementations, which discarded and added the elements one by one, on sets of 10^5 and 10^6 elements.
+
+The previous implementations are only measured up to 10^5 elements since clear, reverse and sort take seconds there,
+and intersection_update, which is O(n * m), up to 10^3 elements.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_ordered_set_bulk.py
+"""
+
+from __future__ import annotations
+
+import itertools
+import random
+import timeit
+
+from flanautils import IndexedOrderedSet, OrderedSet, iterables
+
+LEGACY_MAX_SIZE = 10 ** 5
+LEGACY_INTERSECTION_MAX_SIZE = 10 ** 3
+
+
+def legacy_clear(ordered_set: OrderedSet):
+    try:
+        while True:
+            ordered_set.pop()
+    except IndexError:
+        pass
+
+
+def legacy_difference_update(ordered_set: OrderedSet, *args):
+    ordered_set.discard_many(iterables.flatten(*args, depth=ordered_set.FLATTEN_DEPTH, lazy=True))
+
+
+def legacy_eq(ordered_set: OrderedSet, other: OrderedSet) -> bool:
+    for self_element, other_element in itertools.zip_longest(ordered_set, other):
+        if self_element != other_element:
+            return False
+    return True
+
+
+def legacy_intersection_update(ordered_set: OrderedSet, *args):
+    elements_to_delete = []
+    for element in ordered_set:
+        for arg in args:
+            if element not in iterables.flatten(arg, depth=ordered_set.FLATTEN_DEPTH, lazy=True):
+                elements_to_delete.append(element)
+                break
+
+    ordered_set.discard_many(elements_to_delete)
+
+
+def legacy_reverse(ordered_set: OrderedSet):
+    reversed_self = list(reversed(ordered_set))
+    legacy_clear(ordered_set)
+    ordered_set.add_many(reversed_self)
+
+
+def legacy_sort(ordered_set: OrderedSet):
+    sorted_values = sorted(ordered_set)
+    legacy_clear(ordered_set)
+    ordered_set.add_many(sorted_values)
+
+
+def legacy_symmetric_difference_update(ordered_set: OrderedSet, *args):
+    for arg in args:
+        other_minus_self = ordered_set.ensure_set(arg) - ordered_set
+        legacy_difference_update(ordered_set, arg)
+        ordered_set.update(other_minus_self)
+
+
+def measure(class_, size: int, function, repeat: int) -> float:
+    elements = list(range(size))
+    random.Random(0).shuffle(elements)
+    others = [list(range(i, size + i, 2)) for i in range(3)]
+    copy = OrderedSet(elements)
+    sets = [class_(elements) for _ in range(repeat)]
+    return min(timeit.repeat(lambda: function(sets.pop(), others, copy), number=1, repeat=repeat))
+
+
+def main(sizes=(10 ** 5, 10 ** 6), repeat=3):
+    cases = (
+        ('clear', lambda s, _, __: s.clear(), lambda s, _, __: legacy_clear(s)),
+        ('reverse', lambda s, _, __: s.reverse(), lambda s, _, __: legacy_reverse(s)),
+        ('sort', lambda s, _, __: s.sort(), lambda s, _, __: legacy_sort(s)),
+        ('difference_update', lambda s, others, _: s.difference_update(*others), lambda s, others, _: legacy_difference_update(s, *others)),
+        ('intersection_update', lambda s, others, _: s.intersection_update(*others), lambda s, others, _: legacy_intersection_update(s, *others)),
+        ('symmetric_difference_update', lambda s, others, _: s.symmetric_difference_update(*others), lambda s, others, _: legacy_symmetric_difference_update(s, *others)),
+        ('__eq__', lambda s, _, copy: s == copy, lambda s, _, copy: legacy_eq(s, copy))
+    )
+
+    for size in sizes:
+        print(f'{size} elements')
+        for name, function, legacy_function in cases:
+            legacy_size = min(size, LEGACY_INTERSECTION_MAX_SIZE if name == 'intersection_update' else LEGACY_MAX_SIZE)
+            legacy_time = measure(OrderedSet, legacy_size, legacy_function, repeat)
+            new_time = measure(OrderedSet, size, function, repeat)
+            indexed_time = measure(IndexedOrderedSet, size, function, repeat)
+            print(f'    {name:<28} legacy {legacy_time * 1000:9.2f} ms on {legacy_size:<7}   OrderedSet {new_time * 1000:8.2f} ms   IndexedOrderedSet {indexed_time * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Compares strings.replace, which compiles the replacements into a trie once, with the previous implementation, which
+joined a growing pattern from every position, on texts of 10^4 and 10^6 characters and on a batch of 1000 short texts.
+
+The previous implementation is only measured up to 10^3 characters since joining the growing pattern from every
+position makes it cubic in the length of the text.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_replace.py
+"""
+
+from __future__ import annotations
+
+import random
+import string
+import timeit
+
+from flanautils import strings
+
+LEGACY_MAX_SIZE = 10 ** 3
+
+
+def legacy_replace(text: str, replacements: dict) -> str:
+    if not replacements:
+        return text
+
+    result: list[str] = []
+
+    start = 0
+    while start < len(text):
+        pattern: list[str] = []
+
+        for char in text[start:]:
+            pattern.append(char)
+            try:
+                new_value = replacements[''.join(pattern)]
+            except KeyError:
+                pass
+            else:
+                result.append(new_value or '')
+                start += len(pattern)
+                break
+        else:
+            result.append(text[start])
+            start += 1
+
+    return ''.join(result)
+
+
+def main(sizes=(10 ** 4, 10 ** 6), repeat=3):
+    random_ = random.Random(0)
+    words = [''.join(random_.choices(string.ascii_lowercase, k=random_.randint(3, 8))) for _ in range(1000)]
+    cases = (
+        ('text_to_number', {'y': ' ', 'ç': None}),
+        ('find_coordinates', {'-': ' -', '+': ' +'}),
+        ('1000 words', {word: word.upper() for word in words})
+    )
+    for size in sizes:
+        text = ' '.join(random_.choices(words + ['y', '-12.5', '+3'], k=size // 5))[:size]
+        print(f'{len(text)} characters')
+        for name, replacements in cases:
+            legacy_size = min(size, LEGACY_MAX_SIZE)
+            legacy_time = min(timeit.repeat(lambda: legacy_replace(text[:legacy_size], replacements), number=1, repeat=repeat))
+            new_time = min(timeit.repeat(lambda: strings.replace(text, replacements), number=1, repeat=repeat))
+            print(f'    {name:<18} legacy {legacy_time * 1000:9.2f} ms on {legacy_size:<7}   replace {new_time * 1000:8.2f} ms')
+
+    texts = [' '.join(random_.choices(words, k=10)) for _ in range(1000)]
+    print(f'{len(texts)} texts of about {len(texts[0])} characters')
+    for name, replacements in cases:
+        legacy_time = min(timeit.repeat(lambda: [legacy_replace(text, replacements) for text in texts], number=1, repeat=repeat))
+        new_time = min(timeit.repeat(lambda: [strings.replace(text, replacements) for text in texts], number=1, repeat=repeat))
+        many_time = min(timeit.repeat(lambda: strings.replace_many(texts, replacements), number=1, repeat=repeat))
+        print(f'    {name:<18} legacy {legacy_time * 1000:9.2f} ms   replace {new_time * 1000:8.2f} ms   replace_many {many_time * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Compares the previous REPRBase.__str__ (pprint.pformat of to_dict()) with the bounded one for Media objects with
+payloads of increasing size, and the cost of a discarded debug log line with and without LazyRepr.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_repr.py
+"""
+
+from __future__ import annotations
+
+import logging
+import pprint
+import timeit
+
+from flanautils import LazyRepr, Media, MediaType, OrderedSet
+
+
+def legacy_str(self) -> str:
+    formatted = pprint.pformat(self.to_dict())
+    return f'{self.__class__.__name__} {formatted[0]}\n {formatted[1:-1]}\n{formatted[-1]}'
+
+
+def main(repeat=5):
+    for size in (1 << 10, 1 << 20, 16 << 20):
+        media = Media('https://example.com/video.mp4', bytes(size), MediaType.VIDEO)
+        media.tags = OrderedSet(f'tag_{i}' for i in range(size // 1024))
+        legacy_time = min(timeit.repeat(lambda: legacy_str(media), number=1, repeat=repeat))
+        bounded_time = min(timeit.repeat(lambda: str(media), number=1, repeat=repeat))
+        print(f'{size >> 10:>6} KiB   legacy {legacy_time * 1000:9.2f} ms   bounded {bounded_time * 1000:7.3f} ms   {len(legacy_str(media)):>10} -> {len(str(media))} characters')
+
+    logger = logging.getLogger('bench_repr')
+    logger.setLevel(logging.INFO)
+    media = Media('https://example.com/video.mp4', bytes(1 << 20), MediaType.VIDEO)
+    f_string_time = min(timeit.repeat(lambda: logger.debug(f'{media}'), number=100, repeat=repeat)) / 100
+    lazy_time = min(timeit.repeat(lambda: logger.debug('%s', LazyRepr(media)), number=100, repeat=repeat)) / 100
+    print(f'discarded debug line   f-string {f_string_time * 1000:7.3f} ms   LazyRepr {lazy_time * 1000:7.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Compares cartesian_product_string_matching, which compares every pair of words, with
+cartesian_product_string_matching_matrix and cartesian_product_string_matching_top_k, which skip the pairs that can't
+reach min_score because of their lengths, characters and first characters, matching 2000 user names against 2000
+targets.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/bench_string_matching.py
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import string
+import timeit
+
+from flanautils import strings
+
+
+def main(size=2000, repeat=3):
+    random_ = random.Random(0)
+    targets = [''.join(random_.choices(string.ascii_lowercase, k=random_.randint(3, 14))) for _ in range(size)]
+    names = [target[:-1] + random_.choice(string.ascii_lowercase) if random_.random() < 0.3 else ''.join(random_.choices(string.ascii_lowercase, k=random_.randint(3, 14))) for target in targets]
+    processes = os.cpu_count()
+    print(f'{size} x {size} words, {processes} CPUs')
+    for min_score in (0, 0.8, 0.9):
+        cases = (
+            ('cartesian_product_string_matching', lambda: strings.cartesian_product_string_matching(names, targets, min_score)),
+            ('matrix', lambda: strings.cartesian_product_string_matching_matrix(names, targets, min_score)),
+            (f'matrix processes={processes}', lambda: strings.cartesian_product_string_matching_matrix(names, targets, min_score, processes)),
+            ('top_k k=5', lambda: strings.cartesian_product_string_matching_top_k(names, targets, 5, min_score))
+        )
+        print(f'    min_score {min_score}')
+        for name, function in cases:
+            print(f'        {name:<34} {min(timeit.repeat(function, number=1, repeat=repeat)) * 1000:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 import asyncio
 import datetime
 import inspect
+import itertools
 import multiprocessing
 import queue
 from asyncio import Task
-from collections.abc import Callable, Iterable
+from collections.abc import AsyncIterator, Callable, Iterable
 from typing import Any, Never, Type
 
 
@@ -103,6 +104,25 @@ def do_later(
     return asyncio.create_task(do_later_())
 
 
+async def iterate_in_thread(iterable: Iterable, chunk_size=100) -> AsyncIterator:
+    """
+    Asynchronous generator that iterates a blocking iterable (e.g. a database cursor) in a worker thread, so the event
+    loop isn't blocked.
+
+    The elements are fetched in chunks of chunk_size elements to reduce the cost of switching threads. If the iterator
+    can be closed (e.g. a generator or a cursor), it is closed when the iteration ends, even if the consumer stops early.
+    """
+
+    iterator = iter(iterable)
+    try:
+        while chunk := await asyncio.to_thread(lambda: list(itertools.islice(iterator, chunk_size))):
+            for element in chunk:
+                yield element
+    finally:
+        if close := getattr(iterator, 'close', None):
+            await asyncio.to_thread(close)
+
+
 async def poll_process(process: multiprocessing.Process, sleep_seconds=1) -> None:
     """
     Starts the process and wait until the process is done.
@@ -2,7 +2,7 @@ import datetime
 import random
 from typing import Iterable, Sequence
 
-from flanautils.data_structures.bi_dict import BiDict
+from flanautils.data_structures.bi_dict import FrozenBiDict
 from flanautils.data_structures.ordered_set import OrderedSet
 
 GOOGLE_BOT_USER_AGENTS = [
@@ -13,7 +13,7 @@ GOOGLE_BOT_USER_AGENTS = [
 MONGODB_INT64_MAX = 2 ** 63 - 1
 MONGODB_INT64_MIN = - 2 ** 63
 NUMBER_WORDS = {
-    'es': BiDict({
+    'es': FrozenBiDict({
         '+': 'mas',
         '-': 'menos',
         0: 'cero', 1: 'uno', 2: 'dos', 3: 'tres', 4: 'cuatro', 5: 'cinco', 6: 'seis', 7: 'siete', 8: 'ocho', 9: 'nueve',
@@ -23,9 +23,11 @@ NUMBER_WORDS = {
     })
 }
 NUMBERS_SCORE_MATCHING = 0.9
+STRING_MATCHING_PROCESS_MIN_PAIRS = 10 ** 5
 SYMBOLS = ('!', '"', '#', '$', '%', '&', "'", '(', ')', '*', '+', ',', '-', '.', '/', ':', ';', '<', '=', '>', '?', '@',
            '[', '\\', ']', '^', '_', '`', '{', '|', '}', '~', '¡', '¨', 'ª', '¬', '´', '·', 'º', '¿', '€')
 TEXT_TO_NUMBER_MAX_WORD_LENGTH = 25
+TIME_UNITS = {'es': ('segundo', 'minuto', 'min', 'hora', 'dia', 'semana', 'mes', 'año')}
 TIME_UNITS_SCORE_MATCHING = 0.9
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'
 WEEKS_IN_A_MONTH = 4.34524
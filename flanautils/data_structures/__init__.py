@@ -1,2 +1,4 @@
+from flanautils.data_structures.shared_table import *
 from flanautils.data_structures.bi_dict import *
+from flanautils.data_structures.fuzzy_vocabulary import *
 from flanautils.data_structures.ordered_set import *
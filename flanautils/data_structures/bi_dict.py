@@ -1,6 +1,44 @@
 from __future__ import annotations  # todo0 remove when it's by default
 
-from typing import Any, Iterable, Mapping
+import contextlib
+import pathlib
+import threading
+from types import MappingProxyType
+from typing import Any, Iterable, Iterator, Mapping
+
+from flanautils.data_structures.shared_table import SharedTable
+from flanautils.models.bases import MongoCodec
+
+_MISSING = object()
+
+
+class _ForwardView(Mapping):
+    """Read-only view of the key -> value direction of a BiDict, that never falls back to the inverse direction."""
+
+    __slots__ = ('_bi_dict',)
+
+    def __init__(self, bi_dict: BiDict):
+        self._bi_dict = bi_dict
+
+    def __contains__(self, key):
+        return dict.__contains__(self._bi_dict, key)
+
+    def __getitem__(self, key):
+        if (value := dict.get(self._bi_dict, key, _MISSING)) is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator:
+        return dict.__iter__(self._bi_dict)
+
+    def __len__(self) -> int:
+        return dict.__len__(self._bi_dict)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({dict(self)})'
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return dict.get(self._bi_dict, key, default)
 
 
 class BiDict(dict):
@@ -8,92 +46,420 @@ class BiDict(dict):
     Dictionary that also stores an inverted dictionary to access efficiently through hashes in both directions
     (key -> value, value -> key).
 
-    Reimplements all dictionary methods.
+    The dictionary itself is the forward store and the inverted attribute is the inverse store. Every method keeps them
+    consistent, so the dictionary is a bijection: assigning a value that already has another key removes that key, and
+    when the initial items repeat a value the last key wins.
+
+    Use forward and inverse to look up in only one direction.
     """
 
-    def __init__(self, dict_: dict = None):
-        dict_ = {} if dict_ is None else dict_
-        super().__init__(dict_)
-        self.inverted = {v: k for k, v in dict_.items()}
+    __slots__ = ('inverted',)
+
+    def __init__(self, dict_: Mapping | Iterable = None):
+        super().__init__()
+        self.inverted = {}
+        if dict_ is not None:
+            self._update_items(dict_ if dict_.__class__ is dict else dict(dict_))
 
     def __contains__(self, item):
-        if exists := super().__contains__(item):
-            return exists
-        else:
-            return item in self.inverted
+        return super().__contains__(item) or item in self.inverted
 
     def __delitem__(self, item):
-        value = self[item]
-        try:
-            super().__delitem__(item)
-        except (KeyError, TypeError):
+        if (value := super().pop(item, _MISSING)) is not _MISSING:
             del self.inverted[value]
+        else:
+            super().__delitem__(self.inverted.pop(item))
 
-    def __getitem__(self, item):
-        try:
-            return super().__getitem__(item)
-        except (KeyError, TypeError):
-            return self.inverted[item]
+    def __missing__(self, key):
+        return self.inverted[key]
 
     def __or__(self, other):
-        return BiDict(super().__or__(other))
+        new_bi_dict = self.copy()
+        new_bi_dict.update(other)
+        return new_bi_dict
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
 
     def __ror__(self, other):
-        return BiDict(dict.__or__(other, self))
+        return self.__class__(other) | self
 
     def __repr__(self):
         return str(self)
 
+    def __setitem__(self, key, value):
+        self._update_items({key: value})
+
     def __str__(self):
         return f"{{{', '.join(f'{repr(k)}::{repr(v)}' for k, v in self.items())}}}"
 
+    def _update_items(self, forward: dict):
+        """
+        Adds the items of a dictionary removing the items that share a key or a value with them, with the same result as
+        assigning them one by one but with a few dictionary operations.
+        """
+
+        if len(inverse := {v: k for k, v in forward.items()}) == len(forward):
+            displaced_keys = ()
+        else:
+            displaced_keys = [k for k, v in forward.items() if inverse[v] != k]
+            forward = {k: v for k, v in forward.items() if inverse[v] == k}
+
+        if self:
+            inverted = self.inverted
+            get_value = super().__getitem__
+            pop_item = super().pop
+            for k in forward.keys() & super().keys():
+                del inverted[get_value(k)]
+            for k in displaced_keys:
+                if (old_value := pop_item(k, _MISSING)) is not _MISSING:
+                    del inverted[old_value]
+            for v in inverse.keys() & inverted.keys():
+                if (old_key := inverted[v]) != inverse[v]:
+                    pop_item(old_key)
+
+        super().update(forward)
+        self.inverted.update(inverse)
+
     def clear(self):
         super().clear()
         self.inverted.clear()
 
     def copy(self) -> BiDict:
-        return BiDict(self)
+        return self.__class__(self)
+
+    @property
+    def forward(self) -> Mapping:
+        """Read-only view of the key -> value direction."""
+
+        return _ForwardView(self)
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[tuple[Any, Any]]) -> BiDict:
+        return cls(pairs)
 
     @classmethod
     def fromkeys(cls, iterable: Iterable, value: Any = None) -> BiDict:
         return cls(dict.fromkeys(iterable, value))
 
     def get(self, key: Any, default: Any = None) -> Any:
-        if (value := super().get(key, default)) == default:
+        if (value := super().get(key, _MISSING)) is _MISSING:
             return self.inverted.get(key, default)
-        else:
+        return value
+
+    @property
+    def inverse(self) -> Mapping:
+        """Read-only view of the value -> key direction."""
+
+        return MappingProxyType(self.inverted)
+
+    def pop(self, key: Any, default: Any = _MISSING) -> Any:
+        if (value := super().pop(key, _MISSING)) is not _MISSING:
+            del self.inverted[value]
             return value
+        if (value := self.inverted.pop(key, _MISSING)) is not _MISSING:
+            super().__delitem__(value)
+            return value
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
 
-    def pop(self, key: Any) -> Any:
-        try:
-            return super().pop(key)
-        except KeyError:
-            return self.inverted.pop(key)
+    def popitem(self) -> tuple[Any, Any]:
+        k, v = super().popitem()
+        del self.inverted[v]
+        return k, v
 
     def setdefault(self, key: Any, default: Any = None) -> Any:
-        if key in self:
-            return self[key]
-        else:
-            self[key] = default
-            self.inverted[default] = key
-            return default
+        if (value := self.get(key, _MISSING)) is not _MISSING:
+            return value
+        self[key] = default
+        return default
+
+    def union(self, mapping: Mapping | Iterable, **kwargs):
+        new_bi_dict = self.copy()
+        new_bi_dict.update(mapping, **kwargs)
+        return new_bi_dict
+
+    def update(self, mapping: Mapping | Iterable = (), **kwargs):
+        forward = dict(mapping)
+        forward.update(kwargs)
+        self._update_items(forward)
+
+    union_update = update
+
+
+class FrozenBiDict(BiDict):
+    """
+    Immutable and hashable BiDict, for vocabularies that never change (e.g. constants.NUMBER_WORDS).
+
+    Both directions are computed once when it's built and the mutators raise TypeError. intern() returns the first
+    interned FrozenBiDict equal to it, so that equal vocabularies share one instance; unpickling interns them too, so a
+    worker process that receives the same vocabulary many times keeps only one.
+
+    save() writes it to a file that SharedBiDict.open() memory-maps, so that a vocabulary prebuilt once is shared by
+    every process instead of being rebuilt in each one.
+    """
+
+    __slots__ = ('_hash',)
+
+    _interned: dict[FrozenBiDict, FrozenBiDict] = {}
+
+    def __init__(self, dict_: Mapping | Iterable = None):
+        super().__init__(dict_)
+        self._hash = None
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(dict.items(self)))
+        return self._hash
+
+    def __or__(self, other):
+        return self.__class__(BiDict(self) | other)
+
+    def __reduce__(self):
+        return self._intern_dict, (dict(self),)
+
+    def __ror__(self, other):
+        new_bi_dict = BiDict(other)
+        new_bi_dict.update(self)
+        return self.__class__(new_bi_dict)
+
+    def _raise_immutable(self, *_args, **_kwargs):
+        raise TypeError(f"'{self.__class__.__name__}' object is immutable")
+
+    __delitem__ = __ior__ = __setitem__ = clear = pop = popitem = setdefault = update = union_update = _raise_immutable
+
+    @classmethod
+    def _intern_dict(cls, dict_: dict) -> FrozenBiDict:
+        return cls(dict_).intern()
+
+    def copy(self) -> FrozenBiDict:
+        return self
+
+    def intern(self) -> FrozenBiDict:
+        """Returns the first interned FrozenBiDict equal to this one, interning this one if there is none."""
+
+        return self._interned.setdefault(self, self)
+
+    def save(self, path: str | pathlib.Path):
+        """Saves the dictionary to a file that SharedBiDict.open() can memory-map."""
+
+        with SharedBiDict(self) as shared_bi_dict:
+            shared_bi_dict.save(path)
 
     def union(self, mapping: Mapping | Iterable, **kwargs):
         new_bi_dict = BiDict(self)
         new_bi_dict.update(mapping, **kwargs)
+        return self.__class__(new_bi_dict)
+
+
+class ConcurrentBiDict(BiDict):
+    """
+    BiDict that can be shared between threads.
+
+    The keys are distributed in N_STRIPES stripes with a lock each, so the operations on a key only lock the stripes of
+    the key and of its related keys and values, and the operations on different keys don't block each other. The
+    operations on the whole dictionary (update, iteration, copy...) lock every stripe. Iterating iterates a snapshot and
+    items, keys and values return lists, so the dictionary can be modified while they are iterated.
+
+    The methods never await, so they are atomic between asyncio tasks too. Use transaction() to make several operations
+    atomic.
+    """
+
+    __slots__ = ('_locks',)
+
+    N_STRIPES = 16
+
+    def __init__(self, dict_: dict = None):
+        self._locks = tuple(threading.RLock() for _ in range(self.N_STRIPES))
+        super().__init__(dict_)
+
+    def __contains__(self, item):
+        with self._locking(item):
+            return super().__contains__(item)
+
+    def __delitem__(self, item):
+        with self._locking(item):
+            super().__delitem__(item)
+
+    def __eq__(self, other):
+        with self.transaction():
+            return super().__eq__(other)
+
+    def __getitem__(self, item):
+        with self._locking(item):
+            return super().__getitem__(item)
+
+    def __iter__(self) -> Iterator:
+        with self.transaction():
+            return iter(list(super().__iter__()))
+
+    def __or__(self, other):
+        with self.transaction():
+            return self.__class__(dict(self) | other)
+
+    def __reduce__(self):
+        with self.transaction():
+            return self.__class__, (dict(self),)
+
+    def __reversed__(self) -> Iterator:
+        with self.transaction():
+            return iter(list(super().__reversed__()))
+
+    def __ror__(self, other):
+        with self.transaction():
+            return self.__class__(other | dict(self))
+
+    def __setitem__(self, key, value):
+        with self._locking(key, value):
+            super().__setitem__(key, value)
+
+    def __str__(self):
+        with self.transaction():
+            return super().__str__()
+
+    @contextlib.contextmanager
+    def _locking(self, *keys: Any) -> Iterator[None]:
+        """
+        Locks the stripes of the keys and of the keys and values related to them, always in ascending order to avoid
+        deadlocks. If the related keys change while waiting for the locks, it locks again.
+        """
+
+        while True:
+            stripes = self._related_stripes(keys)
+            for stripe in stripes:
+                self._locks[stripe].acquire()
+            if set(self._related_stripes(keys)) <= set(stripes):
+                break
+            for stripe in reversed(stripes):
+                self._locks[stripe].release()
+
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self._locks[stripe].release()
+
+    def _related_stripes(self, keys: Iterable) -> list[int]:
+        stripes = set()
+        for key in keys:
+            try:
+                stripes.add(hash(key) % self.N_STRIPES)
+                for related_key in (dict.get(self, key, key), self.inverted.get(key, key)):
+                    stripes.add(hash(related_key) % self.N_STRIPES)
+            except TypeError:
+                stripes.add(0)
+        return sorted(stripes)
+
+    def clear(self):
+        with self.transaction():
+            super().clear()
+
+    def copy(self) -> ConcurrentBiDict:
+        with self.transaction():
+            return self.__class__(self)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._locking(key):
+            return super().get(key, default)
+
+    def items(self):
+        with self.transaction():
+            return list(super().items())
+
+    def keys(self):
+        with self.transaction():
+            return list(super().keys())
+
+    def pop(self, key: Any, default: Any = _MISSING) -> Any:
+        with self._locking(key):
+            return super().pop(key, default)
+
+    def popitem(self) -> tuple[Any, Any]:
+        with self.transaction():
+            return super().popitem()
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        with self._locking(key, default):
+            return super().setdefault(key, default)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Context manager that locks every stripe, to make several operations atomic."""
+
+        with contextlib.ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            yield
+
+    def union(self, mapping: Mapping | Iterable, **kwargs):
+        with self.transaction():
+            new_bi_dict = self.__class__(self)
+        new_bi_dict.update(mapping, **kwargs)
         return new_bi_dict
 
-    def update(self, mapping: Mapping | Iterable, **kwargs):
-        if isinstance(mapping, Mapping):
-            items = list(mapping.items())
-        elif isinstance(mapping, Iterable):
-            items = [(element[0], element[1]) for element in mapping]
-        else:
-            items = []
-        items.extend(list(kwargs.items()))
+    def update(self, mapping: Mapping | Iterable = (), **kwargs):
+        with self.transaction():
+            super().update(mapping, **kwargs)
 
-        for k, v in items:
-            self[k] = v
-            self.inverted[v] = k
+    def values(self):
+        with self.transaction():
+            return list(super().values())
 
     union_update = update
+
+
+class SharedBiDict(SharedTable, Mapping):
+    """
+    Read-only BiDict stored in shared memory, for read-heavy lookups from several processes (e.g. vocabularies like
+    constants.NUMBER_WORDS in the worker processes of asyncs.run_process) without a copy of the dictionary per process.
+
+    It can also be prebuilt once and memory-mapped from a file with save() or FrozenBiDict.save() and open().
+
+    See SharedTable for the ownership of the shared memory block and the types of the keys and values.
+    """
+
+    def __init__(self, dict_: Mapping | Iterable = None):
+        dict_ = {} if dict_ is None else dict_
+        super().__init__(dict_.items() if isinstance(dict_, Mapping) else dict_, n_fields=2, n_indices=2)
+
+    def __contains__(self, item):
+        return self._find(item, 0) is not None or self._find(item, 1) is not None
+
+    def __getitem__(self, item):
+        if (row := self._find(item, 0)) is not None:
+            return self._load(row, 1)
+        if (row := self._find(item, 1)) is not None:
+            return self._load(row, 0)
+        raise KeyError(item)
+
+    def __iter__(self) -> Iterator:
+        return self._iter_fields(0)
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        return f"{{{', '.join(f'{repr(k)}::{repr(v)}' for k, v in self.items())}}}"
+
+    def to_bi_dict(self) -> BiDict:
+        return BiDict(dict(self.items()))
+
+    def to_frozen_bi_dict(self) -> FrozenBiDict:
+        return FrozenBiDict(dict(self.items()))
+
+
+def _decode_bi_dict(data: dict | list, type_hint: Any, decode_inner) -> BiDict:
+    class_ = type_hint if isinstance(type_hint, type) and issubclass(type_hint, BiDict) else BiDict
+    items = data.items() if isinstance(data, dict) else data
+    return class_({decode_inner(k, None): decode_inner(v, None) for k, v in items})
+
+
+def _encode_bi_dict(bi_dict: BiDict, _type_hint: Any, encode_inner) -> dict | list:
+    if all(isinstance(k, str) for k in bi_dict):
+        return {k: encode_inner(v, None) for k, v in bi_dict.items()}
+
+    return [[encode_inner(k, None), encode_inner(v, None)] for k, v in bi_dict.items()]
+
+
+MongoCodec.register(BiDict, _encode_bi_dict, _decode_bi_dict)
@@ -0,0 +1,123 @@
+from __future__ import annotations  # todo0 remove when it's by default
+
+import functools
+from typing import Iterable, Iterator
+
+import jellyfish
+
+_TOLERANCE = 1e-9
+
+
+def _max_score(length: int, other_length: int, same_first_char: bool) -> float:
+    """
+    Returns an upper bound of the Jaro-Winkler similarity of two words with those lengths: all the characters of the
+    shortest word match without transpositions and, if the first characters are the same, the common prefix is as long
+    as possible.
+    """
+
+    if not (n_matches := min(length, other_length)):
+        return 0.0
+
+    jaro = (n_matches / length + n_matches / other_length + 1) / 3
+    if same_first_char:
+        return jaro + min(4, n_matches) * 0.1 * (1 - jaro)
+    return jaro
+
+
+class FuzzyVocabulary:
+    """
+    Vocabulary that finds its words similar to a given one (Jaro-Winkler similarity >= min_score), with the same results
+    as strings.cartesian_product_string_matching(word, words, min_score)[word] but precompiled to be reused.
+
+    The words are grouped by length and first character and the groups that can't reach min_score are skipped without
+    comparing their words, with a plan of the groups to compare precomputed for every word length. The results for the
+    last cache_size words are memoized.
+
+    >>> vocabulary = FuzzyVocabulary(('segundo', 'minuto', 'hora'), 0.9)
+    >>> vocabulary.best_match('minutos')
+    'minuto'
+    >>> vocabulary.matches('hola')
+    {}
+    """
+
+    def __init__(self, words: Iterable[str], min_score: float = 0, cache_size: int | None = 4096):
+        self.words = tuple(dict.fromkeys(words))
+        self.min_score = min_score
+        self.cache_size = cache_size
+        self._words_by_length: dict[int, list[tuple[int, str]]] = {}
+        self._words_by_length_and_first_char: dict[tuple[int, str], list[tuple[int, str]]] = {}
+        for i, word in enumerate(self.words):
+            self._words_by_length.setdefault(len(word), []).append((i, word))
+            if word:
+                self._words_by_length_and_first_char.setdefault((len(word), word[0]), []).append((i, word))
+        self._plans: dict[int, tuple[list[tuple[int, str]], list[int]]] = {}
+        self._cached_matches = functools.lru_cache(maxsize=cache_size)(self._matches)
+
+    def __contains__(self, word: str) -> bool:
+        return any(word == other for _, other in self._words_by_length.get(len(word), ()))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.words)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __reduce__(self):
+        return self.__class__, (self.words, self.min_score, self.cache_size)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.words}, {self.min_score})'
+
+    def _candidates(self, word: str) -> list[tuple[int, str]]:
+        """Returns the indices and the words that can reach min_score."""
+
+        if not word:
+            return list(enumerate(self.words))
+
+        if (plan := self._plans.get(len(word))) is None:
+            plan = self._plans[len(word)] = self._plan(len(word))
+        words, first_char_lengths = plan
+        if not first_char_lengths:
+            return words
+
+        return words + [
+            index_word
+            for length in first_char_lengths
+            for index_word in self._words_by_length_and_first_char.get((length, word[0]), ())
+        ]
+
+    def _matches(self, word: str) -> tuple[tuple[str, float], ...]:
+        jaro_winkler_similarity = jellyfish.jaro_winkler_similarity
+        matches = [(i, other, score) for i, other in self._candidates(word) if (score := jaro_winkler_similarity(word, other)) >= self.min_score]
+        matches.sort()
+        return tuple((other, score) for _, other, score in matches)
+
+    def _plan(self, length: int) -> tuple[list[tuple[int, str]], list[int]]:
+        """
+        Returns the indices and the words that can reach min_score with any word of that length and the lengths of the
+        words that can only reach it if they start with the same character.
+        """
+
+        min_score = self.min_score - _TOLERANCE
+        words = []
+        first_char_lengths = []
+        for other_length, other_words in self._words_by_length.items():
+            if _max_score(length, other_length, False) >= min_score:
+                words.extend(other_words)
+            elif _max_score(length, other_length, True) >= min_score:
+                first_char_lengths.append(other_length)
+        return words, first_char_lengths
+
+    def best_match(self, word: str) -> str | None:
+        """Returns the most similar word of the vocabulary (the first one if there are ties) or None if none matches."""
+
+        if matches := self._cached_matches(word):
+            return max(matches, key=lambda match: match[1])[0]
+
+    def clear_cache(self):
+        self._cached_matches.cache_clear()
+
+    def matches(self, word: str) -> dict[str, float]:
+        """Returns the words of the vocabulary whose similarity to word is at least min_score, with their scores."""
+
+        return dict(self._cached_matches(word))
@@ -1,17 +1,42 @@
 from __future__ import annotations  # todo0 remove when it's by default
 
+import contextlib
+import functools
 import itertools
 import json
 import math
+import operator
 import pickle
-from typing import AbstractSet, Any, Generic, Iterable, Iterator, MutableSet, Type, TypeVar
+import threading
+from typing import AbstractSet, Any, Callable, Generic, Iterable, Iterator, MutableSet, Type, TypeVar, get_origin
+
+import numpy
 
 from flanautils import iterables
-from flanautils.models.bases import FlanaBase, JSONBASE
+from flanautils.data_structures.shared_table import SharedTable
+from flanautils.models.bases import CopyBase, FlanaBase, JSONBASE, MongoCodec, SHAREABLE_TYPES
 
 E = TypeVar('E')
 
 
+def _synchronize(*method_names: str) -> Callable[[type], type]:
+    """Class decorator that makes the methods (usually inherited) run holding the lock of the object (self._lock)."""
+
+    def decorator(cls: type) -> type:
+        for method_name in method_names:
+            method = getattr(cls, method_name)
+
+            @functools.wraps(method)
+            def wrapper(self, *args, method_=method, **kwargs):
+                with self._lock:
+                    return method_(self, *args, **kwargs)
+
+            setattr(cls, method_name, wrapper)
+        return cls
+
+    return decorator
+
+
 class OrderedSet(FlanaBase, MutableSet, Generic[E]):
     """
     Set that maintains the insertion order.
@@ -26,6 +51,8 @@ class OrderedSet(FlanaBase, MutableSet, Generic[E]):
 
     T = TypeVar('T', bound='OrdereSet')
 
+    _shares_elements = False
+
     def __init__(self, *args: Any):
         self._elements_dict = {element: None for element in iterables.flatten(*args, depth=self.FLATTEN_DEPTH, lazy=True)}
 
@@ -63,10 +90,7 @@ class OrderedSet(FlanaBase, MutableSet, Generic[E]):
         if not isinstance(other, OrderedSet):
             return False
 
-        for self_element, other_element in itertools.zip_longest(self, other):
-            if self_element != other_element:
-                return False
-        return True
+        return len(self) == len(other) and not any(map(operator.ne, self, other))
 
     def __getitem__(self, item) -> E | OrderedSet[E]:
         # noinspection PyUnresolvedReferences
@@ -196,7 +220,36 @@ class OrderedSet(FlanaBase, MutableSet, Generic[E]):
     def _json_repr(self) -> Any:
         return [json.loads(element.to_json()) if isinstance(element, JSONBASE) else pickle.dumps(element) for element in self]
 
+    def _hashable_elements(self, *args: Iterable) -> set:
+        """Returns the hashable elements of the flattened arguments, the only ones that can be in the set."""
+
+        elements = iterables.flatten(*args, depth=self.FLATTEN_DEPTH)
+        try:
+            return set(elements)
+        except TypeError:
+            hashable_elements = set()
+            for element in elements:
+                try:
+                    hashable_elements.add(element)
+                except TypeError:
+                    pass
+            return hashable_elements
+
+    def _own_elements(self):
+        """Stops sharing the elements with the copies made by deep_copy(copy_on_write=True) before modifying them."""
+
+        self._elements_dict = self._elements_dict.copy()
+        self._shares_elements = False
+
+    def _replace_elements(self, elements: Iterable):
+        """Replaces all the elements in one pass instead of discarding and adding them one by one."""
+
+        self._elements_dict = dict.fromkeys(elements)
+        self._shares_elements = False
+
     def add(self, element: Any):
+        if self._shares_elements:
+            self._own_elements()
         self._elements_dict[element] = None
 
     def add_many(self, elements: Iterable):
@@ -204,11 +257,7 @@ class OrderedSet(FlanaBase, MutableSet, Generic[E]):
             self.add(element)
 
     def clear(self):
-        try:
-            while True:
-                self.pop()
-        except IndexError:
-            pass
+        self._replace_elements(())
 
     def copy(self) -> OrderedSet[E]:
         # noinspection PyUnresolvedReferences
@@ -224,6 +273,8 @@ class OrderedSet(FlanaBase, MutableSet, Generic[E]):
         self.discard_many(iterables.flatten(*args, depth=self.FLATTEN_DEPTH, lazy=True))
 
     def discard(self, element: Any):
+        if self._shares_elements:
+            self._own_elements()
         try:
             self._elements_dict.pop(element, None)
         except TypeError:
@@ -278,14 +329,8 @@ class OrderedSet(FlanaBase, MutableSet, Generic[E]):
         return new_ordered_set
 
     def intersection_update(self, *args: Iterable):
-        elements_to_delete = []
-        for element in self:
-            for arg in args:
-                if element not in iterables.flatten(arg, depth=self.FLATTEN_DEPTH, lazy=True):
-                    elements_to_delete.append(element)
-                    break
-
-        self.discard_many(elements_to_delete)
+        args_elements = [self._hashable_elements(arg) for arg in args]
+        self._replace_elements(element for element in self if all(element in arg_elements for arg_elements in args_elements))
 
     def is_disjoint(self, other) -> bool:
         return not self & other
@@ -307,14 +352,10 @@ class OrderedSet(FlanaBase, MutableSet, Generic[E]):
         return index_
 
     def reverse(self):
-        reversed_self = list(reversed(self))
-        self.clear()
-        self.add_many(reversed_self)
+        self._replace_elements(list(reversed(self)))
 
     def sort(self, key=None, reverse=False):
-        sorted_values = sorted(self, key=key, reverse=reverse)
-        self.clear()
-        self.add_many(sorted_values)
+        self._replace_elements(sorted(self, key=key, reverse=reverse))
 
     def symmetric_difference(self, *args: Iterable) -> OrderedSet[E]:
         # noinspection PyUnresolvedReferences
@@ -324,9 +365,12 @@ class OrderedSet(FlanaBase, MutableSet, Generic[E]):
 
     def symmetric_difference_update(self, *args: Iterable):
         for arg in args:
-            other_minus_self = self.ensure_set(arg) - self
-            self.difference_update(arg)
-            self.update(other_minus_self)
+            other = self.ensure_set(arg)
+            elements_to_delete = self._hashable_elements(arg)
+            self._replace_elements(itertools.chain(
+                (element for element in self if element not in elements_to_delete),
+                [element for element in other if element not in self]
+            ))
 
     def union(self, *args: Iterable) -> OrderedSet[E]:
         # noinspection PyUnresolvedReferences
@@ -338,3 +382,759 @@ class OrderedSet(FlanaBase, MutableSet, Generic[E]):
         self.add_many(iterables.flatten(*args, depth=self.FLATTEN_DEPTH, lazy=True))
 
     union_update = update
+
+
+class IndexedOrderedSet(OrderedSet[E]):
+    """
+    OrderedSet with efficient positional access, for example to use it as an indexed queue.
+
+    The elements are stored in blocks of up to 2 * BLOCK_SIZE elements with a Fenwick tree of the block lengths, so
+    __getitem__, pop, insert, index and discard are O(log n + BLOCK_SIZE) instead of O(n). The elements map to their
+    block to find them.
+
+    Same API and semantics as OrderedSet.
+    """
+
+    BLOCK_SIZE = 1000
+
+    def __init__(self, *args: Any):
+        self._replace_elements(iterables.flatten(*args, depth=self.FLATTEN_DEPTH, lazy=True))
+
+    def __getitem__(self, item) -> E | IndexedOrderedSet[E]:
+        if isinstance(item, slice):
+            # noinspection PyUnresolvedReferences
+            return self._from_iterable(self._element_at(i) for i in range(len(self))[item])
+        elif isinstance(item, int):
+            item = self.positive_index(item)
+            if not 0 <= item < len(self):
+                raise IndexError('index out of range')
+
+            return self._element_at(item)
+        else:
+            raise TypeError('indices must be integers or slices')
+
+    def __iter__(self) -> Iterator[E]:
+        return itertools.chain.from_iterable(self._blocks)
+
+    def __reversed__(self) -> Iterator[E]:
+        return itertools.chain.from_iterable(reversed(block) for block in reversed(self._blocks))
+
+    def __setstate__(self, state: dict):
+        vars(self).update(state)
+        self._rebuild_index()
+
+    def _element_at(self, position: int) -> E:
+        """Returns the element in a valid non-negative position."""
+
+        block_index, offset = self._find_block(position)
+        return self._blocks[block_index][offset]
+
+    def _find_block(self, position: int) -> tuple[int, int]:
+        """Returns the index of the block that contains a position and the offset of the position in the block."""
+
+        tree = self._tree
+        block_index = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            if (next_index := block_index + step) < len(tree) and tree[next_index] <= position:
+                block_index = next_index
+                position -= tree[block_index]
+            step >>= 1
+
+        return block_index, position
+
+    def _position(self, element: Any) -> int | None:
+        """Returns the position of an element or None if it isn't in the set."""
+
+        try:
+            block = self._elements_dict.get(element)
+        except TypeError:
+            return
+        if block is None:
+            return
+
+        block_index = self._block_indices[id(block)]
+        tree = self._tree
+        position = block.index(element)
+        while block_index:
+            position += tree[block_index]
+            block_index &= block_index - 1
+
+        return position
+
+    def _rebuild_index(self):
+        """Rebuilds the block indices and the Fenwick tree after adding or removing blocks."""
+
+        self._block_indices = {id(block): block_index for block_index, block in enumerate(self._blocks)}
+        self._tree = tree = [0, *(len(block) for block in self._blocks)]
+        for i in range(1, len(tree)):
+            if (parent := i + (i & -i)) < len(tree):
+                tree[parent] += tree[i]
+
+    def _replace_elements(self, elements: Iterable):
+        elements = list(dict.fromkeys(elements))
+        self._blocks = [elements[i:i + self.BLOCK_SIZE] for i in range(0, len(elements), self.BLOCK_SIZE)]
+        self._elements_dict = {element: block for block in self._blocks for element in block}
+        self._rebuild_index()
+
+    def _update_tree(self, block_index: int, delta: int):
+        tree = self._tree
+        i = block_index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def add(self, element: Any):
+        if element in self._elements_dict:
+            return
+
+        if not self._blocks or len(self._blocks[-1]) >= self.BLOCK_SIZE:
+            self._blocks.append([element])
+            self._elements_dict[element] = self._blocks[-1]
+            self._rebuild_index()
+        else:
+            self._blocks[-1].append(element)
+            self._elements_dict[element] = self._blocks[-1]
+            self._update_tree(len(self._blocks) - 1, 1)
+
+    def difference_update(self, *args: Iterable):
+        elements_to_delete = self._hashable_elements(*args)
+        if elements_to_delete:
+            self._replace_elements(element for element in self if element not in elements_to_delete)
+
+    def discard(self, element: Any):
+        try:
+            block = self._elements_dict.pop(element, None)
+        except TypeError:
+            return
+        if block is None:
+            return
+
+        block.remove(element)
+        if block:
+            self._update_tree(self._block_indices[id(block)], -1)
+        else:
+            del self._blocks[self._block_indices[id(block)]]
+            self._rebuild_index()
+
+    def index(self, element, start=None, stop=None, raise_exception=False) -> int:
+        position = self._position(element)
+        positions = range(len(self))[start:stop]
+        if position is not None and position in positions:
+            return (0 if start is None else max(0, start)) + position - positions.start
+
+        if raise_exception:
+            raise ValueError(f'{element} is not in the OrderedSet')
+
+    def insert(self, i, element):
+        if element in self:
+            return
+
+        i = min(max(0, self.positive_index(i)), len(self))
+        if i == len(self):
+            self.add(element)
+            return
+
+        block_index, offset = self._find_block(i)
+        block = self._blocks[block_index]
+        block.insert(offset, element)
+        self._elements_dict[element] = block
+        if len(block) <= 2 * self.BLOCK_SIZE:
+            self._update_tree(block_index, 1)
+            return
+
+        new_block = block[self.BLOCK_SIZE:]
+        del block[self.BLOCK_SIZE:]
+        for element_ in new_block:
+            self._elements_dict[element_] = new_block
+        self._blocks.insert(block_index + 1, new_block)
+        self._rebuild_index()
+
+
+class CompactOrderedSet(OrderedSet[E]):
+    """
+    OrderedSet of ints or of strings stored in a numpy array instead of a dict of Python objects, for big sets of
+    homogeneous primitives like user ids.
+
+    The ints are stored as int64 and the strings as UTF-8 in a fixed width bytes array, with an argsort of the array as
+    the index, so a million ints take about 16 MB instead of about 75 MB. The set operations with other
+    CompactOrderedSets or collections of the same kind are vectorized, but a single membership test is a binary search
+    of some microseconds instead of a hash lookup.
+
+    The kind of the elements is fixed by the first element added. Adding an element of another type (bools and int or
+    str subclasses included), an int out of the int64 range or a string ending in '\\0' raises TypeError. The results
+    of the set operations that can't be compact (e.g. s | ['a', 1]) are OrderedSets.
+
+    Same API and semantics as OrderedSet, but discard and insert are O(n) (vectorized).
+    """
+
+    CHUNK_SIZE = 4096
+    PENDING_SIZE = 1024
+
+    def __init__(self, *args: Any):
+        self._replace_keys(None, numpy.empty(0, dtype=numpy.int64))
+        if len(args) == 1 and args[0].__class__ in (list, tuple):  # flattening them wouldn't change valid elements
+            self.add_many(args[0])
+        else:
+            self.add_many(iterables.flatten(*args, depth=self.FLATTEN_DEPTH, lazy=True))
+
+    def __and__(self, other: Any) -> OrderedSet[E]:
+        if (keys := self._keys_of(self.ensure_set(other))) is None:
+            return super().__and__(other)
+
+        values = self._values[:self._size]
+        return self._from_keys(self._kind, values[_isin(values, keys)])
+
+    def __iand__(self, other: Any) -> OrderedSet[E]:
+        self.intersection_update(self.ensure_set(other))
+        return self
+
+    def __contains__(self, element: Any) -> bool:
+        return (key := self._lookup_key(element)) is not None and self._locate(key)[1] is not None
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, CompactOrderedSet) and self._kind is other._kind:
+            return bool(numpy.array_equal(self._values[:self._size], other._values[:other._size]))
+
+        return super().__eq__(other)
+
+    def __getitem__(self, item) -> E | CompactOrderedSet[E]:
+        if isinstance(item, slice):
+            return self._from_keys(self._kind, self._values[:self._size][item])
+        elif isinstance(item, int):
+            item = self.positive_index(item)
+            if not 0 <= item < self._size:
+                raise IndexError('index out of range')
+
+            return self._decode(self._values[item])
+        else:
+            raise TypeError('indices must be integers or slices')
+
+    def __getstate__(self) -> dict:
+        state = vars(self).copy()
+        state['_values'] = self._values[:self._size].copy()
+        for attribute_name in ('_indexed_size', '_order', '_pending', '_size'):
+            del state[attribute_name]
+        return state
+
+    def __iter__(self) -> Iterator[E]:
+        for i in range(0, self._size, self.CHUNK_SIZE):
+            yield from self._decode_many(self._values[i:min(i + self.CHUNK_SIZE, self._size)])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __or__(self, other: Any) -> OrderedSet[E]:
+        if self._keys_of(other := self.ensure_set(other)) is None:
+            return super().__or__(other)
+
+        new_ordered_set = self.copy()
+        new_ordered_set.update(other)
+        return new_ordered_set
+
+    def __ior__(self, other: Any) -> OrderedSet[E]:
+        self.update(self.ensure_set(other))
+        return self
+
+    def __reversed__(self) -> Iterator[E]:
+        for i in range(self._size, 0, -self.CHUNK_SIZE):
+            yield from reversed(self._decode_many(self._values[max(0, i - self.CHUNK_SIZE):i]))
+
+    def __setstate__(self, state: dict):
+        vars(self).update(state)
+        self._replace_keys(self._kind, self._values)
+
+    def __sub__(self, other: Any) -> OrderedSet[E]:
+        if (keys := self._keys_of(self.ensure_set(other))) is None:
+            return super().__sub__(other)
+
+        values = self._values[:self._size]
+        return self._from_keys(self._kind, values[~_isin(values, keys)])
+
+    def __isub__(self, other: Any) -> OrderedSet[E]:
+        self.difference_update(self.ensure_set(other))
+        return self
+
+    def __xor__(self, other: Any) -> OrderedSet[E]:
+        if self._keys_of(other := self.ensure_set(other)) is None:
+            return super().__xor__(other)
+
+        new_ordered_set = self.copy()
+        new_ordered_set.symmetric_difference_update(self.ensure_set(other))
+        return new_ordered_set
+
+    def __ixor__(self, other: Any) -> OrderedSet[E]:
+        self.symmetric_difference_update(self.ensure_set(other))
+        return self
+
+    def _build_index(self):
+        """Sorts the positions of all the elements, including the pending ones, to search them with binary search."""
+
+        self._order = numpy.argsort(self._values[:self._size], kind='stable')
+        self._indexed_size = self._size
+        self._pending = set()
+
+    def _decode(self, key: Any) -> E:
+        return int(key) if self._kind is int else bytes(key).decode(errors='surrogatepass')
+
+    def _decode_many(self, keys: numpy.ndarray) -> list[E]:
+        if self._kind is int:
+            return keys.tolist()
+
+        return [key.decode(errors='surrogatepass') for key in keys.tolist()]
+
+    def _encode(self, element: Any, kind: type) -> int | bytes:
+        """Returns the stored representation of an element or raises TypeError if it can't be stored."""
+
+        if element.__class__ is not kind:
+            raise TypeError(f"{self.__class__.__name__} of {kind.__name__} can't store {element!r}")
+
+        if kind is int:
+            if not -2 ** 63 <= element < 2 ** 63:
+                raise TypeError(f"{self.__class__.__name__} can't store {element!r}, it is out of the int64 range")
+            return element
+
+        if (key := element.encode(errors='surrogatepass')).endswith(b'\0'):
+            raise TypeError(f"{self.__class__.__name__} can't store {element!r}, it ends in '\\0'")
+        return key
+
+    def _encode_many(self, elements: list, kind: type) -> numpy.ndarray:
+        if kind is int:
+            for element in elements:
+                if element.__class__ is not int:
+                    self._encode(element, kind)
+            try:
+                return numpy.array(elements, dtype=numpy.int64)
+            except OverflowError:
+                for element in elements:
+                    self._encode(element, kind)
+
+        keys = [self._encode(element, kind) for element in elements]
+        return numpy.array(keys, dtype=f'S{max(1, max(map(len, keys), default=1))}')
+
+    @classmethod
+    def _from_iterable(cls, iterable: Iterable) -> OrderedSet[E]:
+        elements = list(iterable)
+        try:
+            return cls(elements)
+        except TypeError:
+            return OrderedSet(elements)
+
+    @classmethod
+    def _from_keys(cls, kind: type | None, keys: numpy.ndarray) -> CompactOrderedSet[E]:
+        """Returns a new set with the stored representations of unique elements."""
+
+        new_ordered_set = cls.__new__(cls)
+        new_ordered_set._replace_keys(kind, keys.copy())
+        return new_ordered_set
+
+    def _keys_of(self, *args: Iterable) -> numpy.ndarray | None:
+        """
+        Returns the stored representations of the flattened arguments or None if some elements aren't of the kind of
+        the set.
+        """
+
+        if len(args) == 1 and isinstance(args[0], CompactOrderedSet) and args[0]._kind is self._kind:
+            return args[0]._values[:args[0]._size]
+
+        elements = iterables.flatten(*args, depth=self.FLATTEN_DEPTH)
+        if not elements:
+            return numpy.empty(0, dtype=self._values.dtype)
+        try:
+            return self._encode_many(elements, self._kind if self._size else self._kind_of(elements[0]))
+        except TypeError:
+            return
+
+    def _json_repr(self) -> Any:
+        return list(self)
+
+    def _kind_of(self, element: Any) -> type:
+        if element.__class__ not in (int, str):
+            raise TypeError(f'{self.__class__.__name__} only stores ints or strings, not {element!r}')
+        return element.__class__
+
+    def _locate(self, key: int | bytes) -> tuple[int | None, int | None]:
+        """Returns the position of a stored representation in the index and in the set or (None, None)."""
+
+        if self._order is None:
+            self._build_index()
+
+        if key in self._pending:
+            return None, self._indexed_size + int(numpy.flatnonzero(self._values[self._indexed_size:self._size] == key)[0])
+
+        indexed_values = self._values[:self._indexed_size]
+        order_index = int(numpy.searchsorted(indexed_values, key, sorter=self._order))
+        if order_index < self._indexed_size and indexed_values[position := self._order[order_index]] == key:
+            return order_index, int(position)
+        return None, None
+
+    def _lookup_key(self, element: Any) -> int | bytes | None:
+        """Returns the stored representation of an element equal to the given one or None if there can't be any."""
+
+        if self._kind is int:
+            if isinstance(element, float):
+                if not element.is_integer():
+                    return
+                element = int(element)
+            else:
+                try:
+                    element = operator.index(element)
+                except TypeError:
+                    return
+            if -2 ** 63 <= element < 2 ** 63:
+                return element
+        elif self._kind is str and isinstance(element, str):
+            if not (key := element.encode(errors='surrogatepass')).endswith(b'\0'):
+                return key
+
+    def _replace_elements(self, elements: Iterable):
+        if not (elements := list(elements)):
+            self._replace_keys(None, numpy.empty(0, dtype=numpy.int64))
+            return
+
+        kind = self._kind_of(elements[0])
+        keys = self._encode_many(elements, kind)
+        _, first_indices = numpy.unique(keys, return_index=True)
+        self._replace_keys(kind, keys[numpy.sort(first_indices)])
+
+    def _replace_keys(self, kind: type | None, keys: numpy.ndarray):
+        """Replaces all the elements with the stored representations of unique elements."""
+
+        self._kind = kind
+        self._values = keys
+        self._size = len(keys)
+        self._order = None
+        self._indexed_size = 0
+        self._pending = set()
+
+    def _reserve(self, n_keys: int, width=0):
+        """Makes room in the array for n_keys more stored representations up to width bytes long."""
+
+        needed_size = self._size + n_keys
+        if needed_size <= len(self._values) and width <= self._values.dtype.itemsize:
+            return
+
+        dtype = numpy.int64 if self._kind is int else f'S{max(width, self._values.dtype.itemsize)}'
+        values = numpy.empty(max(needed_size, 2 * len(self._values), 8), dtype=dtype)
+        values[:self._size] = self._values[:self._size]
+        self._values = values
+
+    def add(self, element: Any):
+        if not self._size:
+            self._replace_elements((element,))
+            return
+
+        if self._locate(key := self._encode(element, self._kind))[1] is not None:
+            return
+
+        self._reserve(1, 0 if self._kind is int else len(key))
+        self._values[self._size] = key
+        self._size += 1
+        self._pending.add(key)
+        if len(self._pending) > max(self.PENDING_SIZE, self._size >> 4):
+            self._order = None
+
+    def add_many(self, elements: Iterable):
+        if not (elements := list(elements)):
+            return
+        if not self._size:
+            self._replace_elements(elements)
+            return
+        if len(elements) * 16 < self._size:
+            super().add_many(elements)
+            return
+
+        try:
+            keys = self._encode_many(elements, self._kind)
+        except TypeError:
+            super().add_many(elements)
+            return
+
+        _, first_indices = numpy.unique(keys, return_index=True)
+        keys = keys[numpy.sort(first_indices)]
+        keys = keys[~_isin(keys, self._values[:self._size])]
+        self._reserve(len(keys), keys.dtype.itemsize if self._kind is str else 0)
+        self._values[self._size:self._size + len(keys)] = keys
+        self._size += len(keys)
+        self._order = None
+
+    def copy(self) -> CompactOrderedSet[E]:
+        return self._from_keys(self._kind, self._values[:self._size])
+
+    def difference_update(self, *args: Iterable):
+        if not self:
+            return
+        if (keys := self._keys_of(*args)) is None:
+            super().difference_update(*args)
+            return
+
+        values = self._values[:self._size]
+        self._replace_keys(self._kind, values[~_isin(values, keys)])
+
+    def discard(self, element: Any):
+        if (key := self._lookup_key(element)) is None:
+            return
+        order_index, position = self._locate(key)
+        if position is None:
+            return
+
+        self._values[position:self._size - 1] = self._values[position + 1:self._size]
+        self._size -= 1
+        if order_index is None:
+            self._pending.discard(key)
+        else:
+            self._order = numpy.delete(self._order, order_index)
+            self._order[self._order > position] -= 1
+            self._indexed_size -= 1
+
+    def discard_many(self, elements: Iterable):
+        self.difference_update(elements)
+
+    @classmethod
+    def ensure_ordered_set(cls: Type[T], arg: Any) -> AbstractSet | T:
+        try:
+            return super().ensure_ordered_set(arg)
+        except TypeError:
+            return OrderedSet.ensure_ordered_set(arg)
+
+    @classmethod
+    def ensure_set(cls: Type[T], arg: Any) -> AbstractSet | T:
+        try:
+            return super().ensure_set(arg)
+        except TypeError:
+            return OrderedSet.ensure_set(arg)
+
+    def index(self, element, start=None, stop=None, raise_exception=False) -> int:
+        position = None if (key := self._lookup_key(element)) is None else self._locate(key)[1]
+        positions = range(self._size)[start:stop]
+        if position is not None and position in positions:
+            return (0 if start is None else max(0, start)) + position - positions.start
+
+        if raise_exception:
+            raise ValueError(f'{element} is not in the OrderedSet')
+
+    def insert(self, i, element):
+        if element in self:
+            return
+
+        i = min(max(0, self.positive_index(i)), self._size)
+        self.add(element)
+        self._values[i + 1:self._size] = self._values[i:self._size - 1].copy()
+        self._values[i] = self._encode(element, self._kind)
+        self._order = None
+
+    def intersection_update(self, *args: Iterable):
+        if not self:
+            return
+
+        values = self._values[:self._size]
+        mask = numpy.ones(self._size, dtype=bool)
+        for arg in args:
+            if (keys := self._keys_of(arg)) is None:
+                super().intersection_update(*args)
+                return
+            mask &= _isin(values, keys)
+
+        self._replace_keys(self._kind, values[mask])
+
+    def reverse(self):
+        self._replace_keys(self._kind, self._values[:self._size][::-1].copy())
+
+    def sort(self, key=None, reverse=False):
+        if key is not None:
+            super().sort(key, reverse)
+            return
+
+        values = numpy.sort(self._values[:self._size])
+        self._replace_keys(self._kind, values[::-1].copy() if reverse else values)
+
+    def symmetric_difference_update(self, *args: Iterable):
+        for arg in args:
+            if not self:
+                self.add_many(self.ensure_set(arg))
+                continue
+            if (other_keys := self._keys_of(self.ensure_set(arg))) is None or (keys := self._keys_of(arg)) is None:
+                super().symmetric_difference_update(arg)
+                continue
+
+            values = self._values[:self._size]
+            _, first_indices = numpy.unique(other_keys, return_index=True)
+            other_keys = other_keys[numpy.sort(first_indices)]
+            self._replace_keys(self._kind, numpy.concatenate((
+                values[~_isin(values, keys)],
+                other_keys[~_isin(other_keys, values)]
+            )))
+
+
+@_synchronize(
+    '__add__', '__iadd__', '__and__', '__iand__', '__contains__', '__delitem__', '__eq__', '__ge__', '__getitem__',
+    '__gt__', '__le__', '__lt__', '__or__', '__ior__', '__str__', '__sub__', '__isub__', '__xor__', '__ixor__', 'add',
+    'add_many', 'clear', 'copy', 'difference', 'difference_update', 'discard', 'discard_many', 'index', 'insert',
+    'intersection', 'intersection_update', 'is_disjoint', 'is_subset', 'is_superset', 'pop', 'reverse', 'sort',
+    'symmetric_difference', 'symmetric_difference_update', 'union', 'union_update', 'update'
+)
+class ConcurrentOrderedSet(OrderedSet[E]):
+    """
+    OrderedSet that can be shared between threads: every method runs holding a reentrant lock, and iterating iterates a
+    snapshot, so the set can be modified while it is iterated.
+
+    It has a single lock instead of striped locks since almost every operation depends on the order of all the
+    elements.
+
+    The methods never await, so they are atomic between asyncio tasks too. Use transaction() to make several operations
+    atomic.
+    """
+
+    def __init__(self, *args: Any):
+        self._lock = threading.RLock()
+        super().__init__(*args)
+
+    def __getstate__(self) -> dict:
+        with self._lock:
+            state = vars(self).copy()
+        del state['_lock']
+        return state
+
+    def __iter__(self) -> Iterator[E]:
+        with self._lock:
+            return iter(list(self._elements_dict))
+
+    def __reversed__(self) -> Iterator[E]:
+        with self._lock:
+            return iter(list(reversed(self._elements_dict)))
+
+    def __setstate__(self, state: dict):
+        vars(self).update(state)
+        self._lock = threading.RLock()
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Context manager that holds the lock, to make several operations atomic."""
+
+        with self._lock:
+            yield
+
+
+class SharedOrderedSet(SharedTable, AbstractSet):
+    """
+    Read-only OrderedSet stored in shared memory, for read-heavy lookups from several processes (e.g. in the worker
+    processes of asyncs.run_process) without a copy of the set per process. Positional access is O(1).
+
+    The set operations return OrderedSets. See SharedTable for the ownership of the shared memory block and the types of
+    the elements.
+    """
+
+    def __init__(self, *args: Any):
+        super().__init__(((element,) for element in OrderedSet(*args)), n_fields=1, n_indices=1)
+
+    def __contains__(self, element: Any) -> bool:
+        return self._find(element, 0) is not None
+
+    def __getitem__(self, item) -> E | OrderedSet[E]:
+        if isinstance(item, slice):
+            return OrderedSet(self._load(row, 0) for row in range(len(self))[item])
+        elif isinstance(item, int):
+            if not -len(self) <= item < len(self):
+                raise IndexError('index out of range')
+
+            return self._load(item % len(self), 0)
+        else:
+            raise TypeError('indices must be integers or slices')
+
+    def __iter__(self) -> Iterator[E]:
+        return self._iter_fields(0)
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def __reversed__(self) -> Iterator[E]:
+        for row in reversed(range(len(self))):
+            yield self._load(row, 0)
+
+    def __str__(self) -> str:
+        return f"#{{{', '.join(repr(element) for element in self)}}}"
+
+    @classmethod
+    def _from_iterable(cls, iterable: Iterable) -> OrderedSet[E]:
+        return OrderedSet(iterable)
+
+    def index(self, element, start=None, stop=None, raise_exception=False) -> int:
+        position = self._find(element, 0)
+        positions = range(len(self))[start:stop]
+        if position is not None and position in positions:
+            return (0 if start is None else max(0, start)) + position - positions.start
+
+        if raise_exception:
+            raise ValueError(f'{element} is not in the OrderedSet')
+
+    def to_ordered_set(self) -> OrderedSet[E]:
+        return OrderedSet(self)
+
+
+def _isin(values: numpy.ndarray, keys: numpy.ndarray) -> numpy.ndarray:
+    """
+    Like numpy.isin but searching the sorted values in the sorted keys, that is several times faster for big int and
+    bytes arrays.
+    """
+
+    if not len(keys) or not len(values):
+        return numpy.zeros(len(values), dtype=bool)
+
+    keys = numpy.sort(keys)
+    order = numpy.argsort(values)
+    sorted_values = values[order]
+    positions = numpy.searchsorted(keys, sorted_values)
+    positions[positions == len(keys)] = 0
+    is_in = numpy.empty(len(values), dtype=bool)
+    is_in[order] = keys[positions] == sorted_values
+    return is_in
+
+
+def _copy_ordered_set(ordered_set: OrderedSet, copy_inner: Callable[[Any], Any], copy_on_write: bool) -> OrderedSet:
+    copied = ordered_set.__class__.__new__(ordered_set.__class__)
+    vars(copied).update({k: copy_inner(v) for k, v in vars(ordered_set).items() if k != '_elements_dict'})
+    elements_dict = ordered_set._elements_dict
+    if not all(element.__class__ in SHAREABLE_TYPES for element in elements_dict):
+        copied._elements_dict = dict.fromkeys(copy_inner(element) for element in elements_dict)
+    elif copy_on_write:
+        copied._elements_dict = elements_dict
+        ordered_set._shares_elements = copied._shares_elements = True
+    else:
+        copied._elements_dict = elements_dict.copy()
+    return copied
+
+
+def _copy_indexed_ordered_set(ordered_set: IndexedOrderedSet, copy_inner: Callable[[Any], Any], copy_on_write: bool) -> IndexedOrderedSet:
+    copied = ordered_set.__class__.__new__(ordered_set.__class__)
+    vars(copied).update({k: copy_inner(v) for k, v in vars(ordered_set).items() if k not in ('_elements_dict', '_blocks', '_block_indices', '_tree')})
+    copied._replace_elements(copy_inner(element) for element in ordered_set)
+    return copied
+
+
+def _copy_compact_ordered_set(ordered_set: CompactOrderedSet, _copy_inner: Callable[[Any], Any], _copy_on_write: bool) -> CompactOrderedSet:
+    return ordered_set.copy()
+
+
+def _copy_concurrent_ordered_set(ordered_set: ConcurrentOrderedSet, copy_inner: Callable[[Any], Any], copy_on_write: bool) -> ConcurrentOrderedSet:
+    with ordered_set._lock:
+        copied = _copy_ordered_set(ordered_set, lambda value: None if value is ordered_set._lock else copy_inner(value), copy_on_write)
+    copied._lock = threading.RLock()
+    return copied
+
+
+def _decode_ordered_set(values: list, type_hint: Any, decode_inner) -> OrderedSet:
+    class_ = get_origin(type_hint) or type_hint
+    elements = MongoCodec.decode_elements(values, type_hint, decode_inner)
+    if class_ is not OrderedSet and isinstance(class_, type) and issubclass(class_, OrderedSet):
+        return class_(list(elements))
+
+    ordered_set = OrderedSet()
+    ordered_set._elements_dict = dict.fromkeys(elements)
+    return ordered_set
+
+
+CopyBase.register_copier(OrderedSet, _copy_ordered_set)
+CopyBase.register_copier(IndexedOrderedSet, _copy_indexed_ordered_set)
+CopyBase.register_copier(CompactOrderedSet, _copy_compact_ordered_set)
+CopyBase.register_copier(ConcurrentOrderedSet, _copy_concurrent_ordered_set)
+MongoCodec.register(OrderedSet, MongoCodec.encode_elements, _decode_ordered_set)
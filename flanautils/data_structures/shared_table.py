@@ -0,0 +1,222 @@
+from __future__ import annotations  # todo0 remove when it's by default
+
+import mmap
+import pathlib
+import pickle
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Iterable, Iterator, Sequence
+
+_register_lock = threading.Lock()
+
+
+def _attach_shared_memory(name: str) -> SharedMemory:
+    """
+    Attaches to an existing shared memory block without registering it in the resource tracker, which would destroy
+    the block when this process exits even if it belongs to another process (track=False since Python 3.13).
+
+    Unregistering it after attaching is not enough: the child processes share the resource tracker of their parent, so
+    it would also forget the registration of the owner.
+    """
+
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name, track=False)
+
+    with _register_lock:
+        register = resource_tracker.register
+
+        def register_others(name_: str, rtype: str):
+            if rtype != 'shared_memory' or name_.lstrip('/') != name.lstrip('/'):
+                register(name_, rtype)
+
+        resource_tracker.register = register_others
+        try:
+            return SharedMemory(name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedTable:
+    """
+    Read-only table of rows stored in a block of shared memory with hash indices on some of their fields, so that
+    several processes can look up the rows without a copy of the table each: pickling the table (e.g. to pass it to
+    asyncs.run_process) only pickles the name of the block, and unpickling it attaches to the block.
+
+    The fields are stored pickled and are looked up by their pickled bytes, so they have to be of simple types (str,
+    int, bytes...) and 1, 1.0 and True are different fields. When the indexed field of several rows is the same, the
+    index points to the last one.
+
+    The process that creates the table owns the block and has to unlink it when the other processes don't need it
+    anymore, with unlink() or using the table as a context manager.
+
+    A table can also be saved to a file with save() and memory-mapped read-only from it with open(), so that a table
+    prebuilt once is shared by every process through the page cache. Pickling a table opened from a file only pickles
+    its path.
+    """
+
+    MAGIC = b'FST\x01'
+    _HEADER = struct.Struct('=4sQQQQQ')  # magic, n_rows, n_fields, n_indices, n_slots, blob size
+
+    def __init__(self, rows: Iterable[Sequence], n_fields: int, n_indices: int):
+        encoded_rows = [[pickle.dumps(field, protocol=5) for field in row] for row in rows]
+        n_rows = len(encoded_rows)
+        n_slots = 1 << (2 * n_rows).bit_length()
+
+        offsets = [0]
+        for encoded_row in encoded_rows:
+            for encoded_field in encoded_row:
+                offsets.append(offsets[-1] + len(encoded_field))
+
+        size = self._HEADER.size + 8 * (n_rows * n_fields + 1) + 8 * n_indices * n_slots + offsets[-1]
+        self._shared_memory = SharedMemory(create=True, size=size)
+        self._mmap = None
+        self._path = None
+        self._is_owner = True
+        self._HEADER.pack_into(self._shared_memory.buf, 0, self.MAGIC, n_rows, n_fields, n_indices, n_slots, offsets[-1])
+        self._map_views()
+
+        self._offsets[:] = memoryview(array('Q', offsets))
+        self._blob[:] = b''.join(encoded_field for encoded_row in encoded_rows for encoded_field in encoded_row)
+        mask = n_slots - 1
+        for index, slots in enumerate(self._indices):
+            for row, encoded_row in enumerate(encoded_rows):
+                encoded_field = encoded_row[index]
+                slot = zlib.crc32(encoded_field) & mask
+                while (other_row := slots[slot]) and self._field(other_row - 1, index) != encoded_field:
+                    slot = (slot + 1) & mask
+                slots[slot] = row + 1
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self) -> SharedTable:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._is_owner:
+            self.unlink()
+        self.close()
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    def __reduce__(self):
+        if self._path:
+            return self.open, (self._path,)
+        return self.attach, (self.name,)
+
+    def _field(self, row: int, field: int) -> memoryview:
+        """Returns the pickled bytes of a field of a row."""
+
+        i = row * self._n_fields + field
+        return self._blob[self._offsets[i]:self._offsets[i + 1]]
+
+    def _find(self, value: Any, index: int) -> int | None:
+        """Returns the last row whose indexed field is equal to the value or None."""
+
+        try:
+            encoded_value = pickle.dumps(value, protocol=5)
+        except (AttributeError, TypeError, pickle.PicklingError):
+            return
+
+        slots = self._indices[index]
+        mask = len(slots) - 1
+        slot = zlib.crc32(encoded_value) & mask
+        while row := slots[slot]:
+            if self._field(row - 1, index) == encoded_value:
+                return row - 1
+            slot = (slot + 1) & mask
+
+    def _iter_fields(self, field: int) -> Iterator:
+        for row in range(self._n_rows):
+            yield self._load(row, field)
+
+    def _load(self, row: int, field: int) -> Any:
+        return pickle.loads(self._field(row, field))
+
+    def _map_views(self):
+        buffer = self._shared_memory.buf if self._mmap is None else memoryview(self._mmap)
+        if len(buffer) < self._HEADER.size or buffer[:len(self.MAGIC)] != self.MAGIC:
+            if self._mmap is not None:
+                buffer.release()
+            raise ValueError(f'{self.name} is not a {SharedTable.__name__}')
+        _, self._n_rows, self._n_fields, n_indices, n_slots, blob_size = self._HEADER.unpack_from(buffer, 0)
+
+        self._is_closed = False
+
+        start = self._HEADER.size
+        end = start + 8 * (self._n_rows * self._n_fields + 1)
+        self._offsets = buffer[start:end].cast('Q')
+        self._indices = []
+        for _ in range(n_indices):
+            start, end = end, end + 8 * n_slots
+            self._indices.append(buffer[start:end].cast('q'))
+        self._blob = buffer[end:end + blob_size]
+        self._size = end + blob_size
+        self._buffer = buffer
+
+    @classmethod
+    def attach(cls, name: str) -> SharedTable:
+        """Returns the table stored in the shared memory block with that name, created by another table."""
+
+        table = cls.__new__(cls)
+        table._shared_memory = _attach_shared_memory(name)
+        table._mmap = None
+        table._path = None
+        table._is_owner = False
+        table._map_views()
+        return table
+
+    def close(self):
+        """Stops using the shared memory block in this process. The table is empty afterwards."""
+
+        if getattr(self, '_is_closed', True):
+            return
+
+        for view in (self._offsets, self._blob, *self._indices):
+            view.release()
+        if self._mmap is None:
+            self._shared_memory.close()
+        else:
+            self._buffer.release()
+            self._mmap.close()
+        self._is_closed = True
+        self._n_rows = 0
+
+    @property
+    def name(self) -> str:
+        """The name of the shared memory block or the path of the file."""
+
+        return self._shared_memory.name if self._mmap is None else self._path
+
+    @classmethod
+    def open(cls, path: str | pathlib.Path) -> SharedTable:
+        """Returns the table saved in that file, memory-mapped read-only."""
+
+        table = cls.__new__(cls)
+        table._shared_memory = None
+        table._path = str(path)
+        table._is_owner = False
+        with open(path, 'rb') as file:
+            table._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            table._map_views()
+        except ValueError:
+            table._mmap.close()
+            raise
+        return table
+
+    def save(self, path: str | pathlib.Path):
+        """Saves the table to a file that open() can memory-map."""
+
+        pathlib.Path(path).write_bytes(self._buffer[:self._size])
+
+    def unlink(self):
+        """Destroys the shared memory block once every process has closed it. Only the owner should call it."""
+
+        self._shared_memory.unlink()
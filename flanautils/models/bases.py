@@ -1,53 +1,679 @@
 from __future__ import annotations  # todo0 remove when it's by default
 
+import asyncio
 import base64
 import binascii
+import collections
+import collections.abc
+import concurrent.futures
+import contextvars
 import copy
+import copyreg
 import datetime
+import importlib
+import io
+import itertools
 import json
+import operator
 import pickle
 import pprint
+import struct
 import typing
-from dataclasses import dataclass, field
+import weakref
+from dataclasses import dataclass, field, is_dataclass
 from enum import Enum
-from types import NoneType
-from typing import AbstractSet, Any, Iterable, Iterator, Sequence
+from types import BuiltinFunctionType, EllipsisType, FunctionType, NoneType, NotImplementedType, UnionType
+from typing import AbstractSet, Any, AsyncIterator, Callable, Iterable, Iterator, Sequence, Type
 
+import numpy
 import pymongo
 import pymongo.collection
 import pymongo.database
+import pymongo.errors
 import pymongo.results
 from bson import ObjectId
 
-from flanautils import iterables
+try:
+    import orjson
+except ModuleNotFoundError:
+    orjson = None
+
+try:
+    import msgspec
+except ModuleNotFoundError:
+    msgspec = None
+
+from flanautils import asyncs, iterables
+
+BYTES_MAGIC = b'FLB\x05'
+BUFFER_KINDS = (bytes, bytearray, memoryview)
+JSON_PICKLE_TAG = '__pickle__'
+JSON_TYPE_TAG = '__type__'
+IMMUTABLE_TYPES = (NoneType, int, float, str, bool, bytes, datetime.date, datetime.timedelta, ObjectId, Enum)
+SHAREABLE_TYPES = frozenset((
+    NoneType, bool, int, float, complex, str, bytes, range, type, property, FunctionType, BuiltinFunctionType,
+    EllipsisType, NotImplementedType, weakref.ref, datetime.date, datetime.datetime, datetime.time, datetime.timedelta,
+    datetime.timezone, ObjectId
+))
+SCALAR_HINTS = (None, bool, int, float, str)
+SCALAR_TYPES = frozenset((NoneType, bool, int, float, str))
+PLAIN_TYPES = frozenset((NoneType, int, float, str, bool, bytes, dict, datetime.date, datetime.datetime, ObjectId))
+
+
+def _bound_repr_value(value: Any, max_items: int, max_size: int) -> Any:
+    """
+    Returns the value, or a copy of it for pprint.pformat if it contains strings or bytes longer than max_size or
+    collections longer than max_items, with them abbreviated. The nested MongoBase objects are returned as dictionaries
+    like in to_dict. The cost doesn't depend on the size of the values, only on max_items and max_size.
+    """
+
+    class_ = value.__class__
+    if class_ in SHAREABLE_TYPES and class_ not in (str, bytes):
+        return value
+
+    match value:
+        case str() | bytes() | bytearray():
+            if len(value) <= max_size:
+                return value
+            return _Abbreviated(f"{repr(value[:max_size])[:max_size]}... ({len(value)} {'characters' if isinstance(value, str) else 'bytes'})")
+        case MongoBase():
+            return _bound_repr_value(value._dict_repr(), max_items, max_size)
+        case _ if class_ is dict:
+            items = [
+                (_bound_repr_value(k, max_items, max_size), _bound_repr_value(v, max_items, max_size))
+                for k, v in itertools.islice(value.items(), max_items)
+            ]
+            if len(value) <= max_items and all(k is k_ and v is v_ for (k, v), (k_, v_) in zip(value.items(), items)):
+                return value
+            bounded_dict = dict(items)
+            if len(value) > max_items:
+                bounded_dict[_Abbreviated('...')] = _Abbreviated(f'({len(value) - max_items} more)')
+            return bounded_dict
+        case _ if class_ in (list, tuple, set, frozenset):
+            elements = [_bound_repr_value(element, max_items, max_size) for element in itertools.islice(value, max_items)]
+            if len(value) <= max_items and all(map(operator.is_, elements, value)):
+                return value
+            if len(value) > max_items:
+                elements.append(_Abbreviated(f'... ({len(value) - max_items} more)'))
+            return class_(elements)
+        case _ if is_dataclass(value) and isinstance(value, DictBase):
+            value_vars = vars(value)
+            bounded_vars = {k: _bound_repr_value(v, max_items, max_size) for k, v in value_vars.items()}
+            if all(bounded_vars[k] is v for k, v in value_vars.items()):
+                return value
+            bounded_object = copy.copy(value)
+            vars(bounded_object).update(bounded_vars)
+            return bounded_object
+        case collections.abc.Collection() if len(value) > max_items:
+            elements = (repr(_bound_repr_value(element, max_items, max_size)) for element in itertools.islice(value, max_items))
+            return _Abbreviated(f"{class_.__name__}({', '.join(elements)}, ... ({len(value) - max_items} more))")
+        case _:
+            return value
+
+
+def _copy_document_value(value: Any) -> Any:
+    """Copies the lists and dictionaries of a mongo document value. It is much faster than copy.deepcopy."""
+
+    if isinstance(value, list):
+        value = value.copy()
+        for i, element in enumerate(value):
+            if isinstance(element, (list, dict)):
+                value[i] = _copy_document_value(element)
+    elif isinstance(value, dict):
+        value = value.copy()
+        for k, v in value.items():
+            if isinstance(v, (list, dict)):
+                value[k] = _copy_document_value(v)
+
+    return value
+
+
+def _decode_documents(cls: Type[MongoBase], documents: list[dict]) -> list[MongoBase]:
+    """Decodes a batch of documents. It is a module level function so that it can be sent to worker processes."""
+
+    return [cls._from_document(document) for document in documents]
+
+
+def _decode_json_value(value: Any, type_hint: Any) -> Any:
+    """Returns the python value of a value decoded by the JSON backend given its type hint (see JSONBASE.from_typed_json)."""
+
+    if isinstance(value, dict):
+        if JSON_PICKLE_TAG in value:
+            return pickle.loads(base64.b64decode(value[JSON_PICKLE_TAG]))
+        if JSON_TYPE_TAG in value:
+            module_name, _, qualname = value[JSON_TYPE_TAG].partition(':')
+            type_ = importlib.import_module(module_name)
+            for name in qualname.split('.'):
+                type_ = getattr(type_, name)
+            return _decode_json_value(value['value'], type_)
+
+    if value is None:
+        return
+
+    codec, class_, type_hint = MongoCodec.resolve(type_hint)
+    if codec:
+        return codec.decode(value, type_hint, _decode_json_value)
+
+    match value:
+        case str() if class_ is bytes:
+            return base64.b64decode(value)
+        case str() if class_ in (datetime.datetime, datetime.date, datetime.time):
+            return class_.fromisoformat(value)
+        case str() if class_ is ObjectId:
+            return ObjectId(value)
+        case list():
+            elements = list(MongoCodec.decode_elements(value, type_hint, _decode_json_value))
+            return tuple(elements) if class_ is tuple else elements
+        case dict() if isinstance(class_, type) and issubclass(class_, DictBase) and not issubclass(class_, dict):
+            return MongoCodec.decode_document(value, type_hint, _decode_json_value)
+        case dict():
+            args = typing.get_args(type_hint)
+            value_hint = args[1] if len(args) == 2 else None
+            return {k: v if v.__class__ in SCALAR_TYPES and value_hint in SCALAR_HINTS else _decode_json_value(v, value_hint) for k, v in value.items()}
+        case _:
+            return value
+
+
+def _deep_copy(value: Any, memo: dict[int, Any], copy_on_write: bool) -> Any:
+    """
+    Deep copies a value sharing its immutable parts instead of duplicating them (see CopyBase.deep_copy).
+
+    memo maps the ids of the already copied values to their copies, like in copy.deepcopy.
+    """
+
+    class_ = value.__class__
+    if class_ in SHAREABLE_TYPES:
+        return value
+    try:
+        return memo[id(value)]
+    except KeyError:
+        pass
+
+    if class_ is list:
+        memo[id(value)] = copied = value.copy()
+        for i, element in enumerate(copied):
+            if element.__class__ not in SHAREABLE_TYPES:
+                copied[i] = _deep_copy(element, memo, copy_on_write)
+        return copied
+    if class_ is dict:
+        if not all(k.__class__ in SHAREABLE_TYPES for k in value):
+            memo[id(value)] = copied = {}
+            for k, v in value.items():
+                copied[_deep_copy(k, memo, copy_on_write)] = _deep_copy(v, memo, copy_on_write)
+            return copied
+
+        memo[id(value)] = copied = value.copy()
+        for k, v in copied.items():
+            if v.__class__ not in SHAREABLE_TYPES:
+                copied[k] = _deep_copy(v, memo, copy_on_write)
+        return copied
+    if class_ is set:
+        if all(element.__class__ in SHAREABLE_TYPES for element in value):
+            memo[id(value)] = copied = value.copy()
+        else:
+            memo[id(value)] = copied = {_deep_copy(element, memo, copy_on_write) for element in value}
+        return copied
+    if class_ is tuple or class_ is frozenset:
+        elements = [element if element.__class__ in SHAREABLE_TYPES else _deep_copy(element, memo, copy_on_write) for element in value]
+        if id(value) in memo:  # the tuple was copied through a cycle
+            return memo[id(value)]
+        memo[id(value)] = copied = value if all(map(operator.is_, elements, value)) else class_(elements)
+        return copied
+
+    match strategy := CopyBase._get_copy_strategy(class_):
+        case 'share':
+            return value
+        case 'deepcopy':
+            return copy.deepcopy(value, memo)
+        case 'dict':
+            memo[id(value)] = copied = class_.__new__(class_)
+            vars(copied).update(_deep_copy(vars(value), memo, copy_on_write))
+            return copied
+        case 'reduce':
+            return _deep_copy_reduced(value, memo, copy_on_write)
+        case _:
+            memo[id(value)] = copied = strategy(value, lambda value_: _deep_copy(value_, memo, copy_on_write), copy_on_write)
+            return copied
+
+
+def _deep_copy_reduced(value: Any, memo: dict[int, Any], copy_on_write: bool) -> Any:
+    """Deep copies a value through its __reduce_ex__, like copy.deepcopy does, but continuing with _deep_copy."""
+
+    if reductor := copyreg.dispatch_table.get(value.__class__):
+        reduced = reductor(value)
+    else:
+        reduced = value.__reduce_ex__(4)
+    if isinstance(reduced, str):
+        return value
+    memo.setdefault(id(memo), []).append(reduced)  # keeps the temporary values alive so that their ids aren't reused
+
+    func, args, state, list_items, dict_items = (*reduced, None, None, None)[:5]
+    copied = func(*(_deep_copy(arg, memo, copy_on_write) for arg in args))
+    memo[id(value)] = copied
+
+    if state is not None:
+        state = _deep_copy(state, memo, copy_on_write)
+        if hasattr(copied, '__setstate__'):
+            copied.__setstate__(state)
+        else:
+            slot_state = None
+            if isinstance(state, tuple) and len(state) == 2:
+                state, slot_state = state
+            if state:
+                vars(copied).update(state)
+            if slot_state:
+                for k, v in slot_state.items():
+                    setattr(copied, k, v)
+    if list_items is not None:
+        for item in list_items:
+            copied.append(_deep_copy(item, memo, copy_on_write))
+    if dict_items is not None:
+        for k, v in dict_items:
+            copied[_deep_copy(k, memo, copy_on_write)] = _deep_copy(v, memo, copy_on_write)
+
+    return copied
+
+
+def _detach_database():
+    """
+    Initializer of the processes that decode documents for MongoBase.find. The MongoClient inherited by fork is not
+    fork-safe, so the models are decoded from the raw documents without touching the database.
+    """
+
+    for subclass in MongoBase.subclasses:
+        subclass.database = None
+        subclass.collection = None
+
+
+def _dumps_json(obj: Any, indent: int = None) -> str:
+    """Serializes a JSON compatible object with orjson or msgspec if they are installed, else with the json module."""
+
+    if orjson and indent in (None, 2):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+        except TypeError:  # e.g. integers bigger than 64 bits
+            pass
+    elif msgspec and indent is None:
+        try:
+            return msgspec.json.encode(obj).decode()
+        except (TypeError, OverflowError, msgspec.EncodeError):
+            pass
+
+    return json.dumps(obj, indent=indent)
+
+
+def _encode_json_value(value: Any, type_hint: Any) -> Any:
+    """
+    Returns the JSON compatible representation of a value given its type hint (see JSONBASE.to_typed_json).
+
+    The values that the type hint doesn't describe are tagged with their type ({JSON_TYPE_TAG: 'module:qualname',
+    'value': ...}) or, as the last resort, pickled ({JSON_PICKLE_TAG: base64}).
+    """
+
+    if value.__class__ in SCALAR_TYPES:
+        return value
+
+    codec, class_, type_hint = MongoCodec.resolve(type_hint)
+    if value.__class__ is class_:
+        match value:
+            case _ if codec:
+                return codec.encode(value, type_hint, _encode_json_value)
+            case bytes():
+                return base64.b64encode(value).decode()
+            case datetime.date() | datetime.time():
+                return value.isoformat()
+            case ObjectId():
+                return str(value)
+            case list() | tuple():
+                element_hint = MongoCodec.get_element_hint(type_hint)
+                return [element if element.__class__ in SCALAR_TYPES else _encode_json_value(element, element_hint) for element in value]
+            case dict() if JSON_PICKLE_TAG not in value and JSON_TYPE_TAG not in value and all(isinstance(k, str) for k in value):
+                args = typing.get_args(type_hint)
+                value_hint = args[1] if len(args) == 2 else None
+                return {k: v if v.__class__ in SCALAR_TYPES else _encode_json_value(v, value_hint) for k, v in value.items()}
+            case DictBase() if not isinstance(value, dict):
+                return MongoCodec.encode_document(value, type_hint, _encode_json_value)
+    else:
+        match value:
+            case list():
+                return [element if element.__class__ in SCALAR_TYPES else _encode_json_value(element, None) for element in value]
+            case dict() if value.__class__ is dict and JSON_PICKLE_TAG not in value and JSON_TYPE_TAG not in value and all(isinstance(k, str) for k in value):
+                return {k: v if v.__class__ in SCALAR_TYPES else _encode_json_value(v, None) for k, v in value.items()}
+            case (
+                bytes() | datetime.date() | datetime.time() | ObjectId() | tuple() | DictBase()
+            ) if '<locals>' not in value.__class__.__qualname__ and not isinstance(value, dict | set):
+                return {JSON_TYPE_TAG: f'{value.__class__.__module__}:{value.__class__.__qualname__}', 'value': _encode_json_value(value, value.__class__)}
+            case _ if '<locals>' not in value.__class__.__qualname__ and MongoCodec.find(value.__class__):
+                return {JSON_TYPE_TAG: f'{value.__class__.__module__}:{value.__class__.__qualname__}', 'value': _encode_json_value(value, value.__class__)}
+
+    return {JSON_PICKLE_TAG: base64.b64encode(pickle.dumps(value)).decode()}
+
+
+def _encode_mongo_value(value: Any, type_hint: Any, pickle_types: tuple) -> Any:
+    """Returns the mongo compatible representation of a value given the type hint of its field (see MongoCodec)."""
+
+    match value:
+        case _ if isinstance(value, pickle_types):
+            return pickle.dumps(value)
+        case _ if value.__class__ in PLAIN_TYPES:
+            return value
+        case MongoBase():
+            return value.to_mongo(pickle_types)
+        case _ if (resolved := MongoCodec.resolve(type_hint))[0] and value.__class__ is resolved[1]:
+            return resolved[0].encode(value, resolved[2], lambda value_, type_hint_: _encode_mongo_value(value_, type_hint_, pickle_types))
+        case [*_, _]:
+            element_hint = MongoCodec.get_element_hint(type_hint)
+            return [_encode_mongo_value(element, element_hint, pickle_types) for element in value]
+        case _ if not isinstance(value, (NoneType, int, float, str, bool, bytes, Sequence, dict, datetime.date, datetime.datetime, ObjectId)):
+            return pickle.dumps(value)
+        case _:
+            return value
+
+
+def _has_out_of_band_values(obj: Any, out_of_band_size: int, depth=2) -> bool:
+    """Returns True if the attributes, items or elements of obj up to depth levels are big bytes-like values."""
+
+    match obj:
+        case dict():
+            values = obj.values()
+        case list() | tuple():
+            values = obj
+        case Enum():
+            return False
+        case _ if hasattr(obj, '__dict__'):
+            values = vars(obj).values()
+        case _:
+            return False
+
+    for value in values:
+        class_ = value.__class__
+        if class_ in SCALAR_TYPES:
+            continue
+        if class_ is bytes or class_ is bytearray:
+            if len(value) >= out_of_band_size:
+                return True
+        elif class_ is memoryview or depth > 1 and _has_out_of_band_values(value, out_of_band_size, depth - 1):
+            return True
+
+    return False
+
+
+def _loads_json(text: str | bytes) -> Any:
+    """Deserializes a JSON text with orjson or msgspec if they are installed, else with the json module."""
+
+    if orjson:
+        try:
+            return orjson.loads(text)
+        except ValueError:  # e.g. NaN or Infinity written by the json module
+            pass
+    elif msgspec:
+        try:
+            return msgspec.json.decode(text)
+        except msgspec.DecodeError:
+            pass
+
+    return json.loads(text)
+
+
+def _pickle_frames(obj: Any, out_of_band_size: int) -> list[bytes | memoryview]:
+    """
+    Pickles an object with the bytes-like values of at least out_of_band_size bytes written out-of-band.
+
+    Returns the frames of the BytesBase wire format: a header (BYTES_MAGIC, number of buffers, pickle length, buffer
+    lengths and buffer kinds), the pickle and the buffers, so they can be written without joining them. If there are
+    no out-of-band buffers returns only the plain pickle.
+
+    Only the values up to two levels deep are looked for before pickling, since calling persistent_id for every object
+    makes the pickling of small objects several times slower. Deeper bytes values are pickled in-band.
+    """
+
+    if not _has_out_of_band_values(obj, out_of_band_size):
+        try:
+            return [pickle.dumps(obj, protocol=5)]
+        except TypeError:  # e.g. a memoryview deeper than the checked levels
+            pass
+
+    file = io.BytesIO()
+    pickler = _FramesPickler(file, out_of_band_size)
+    pickler.dump(obj)
+    if not (buffers := pickler.buffers):
+        return [file.getvalue()]
+
+    pickle_view = file.getbuffer()
+    header = BYTES_MAGIC + struct.pack(f'<IQ{len(buffers)}Q', len(buffers), pickle_view.nbytes, *(buffer.nbytes for buffer in buffers)) + pickler.kinds
+    return [header, pickle_view, *buffers]
+
+
+def _unpickle_frames(bytes_: bytes | bytearray | memoryview, zero_copy: bool) -> Any:
+    """
+    Loads an object written by _pickle_frames (or a plain pickle). The out-of-band buffers are slices of bytes_.
+
+    If zero_copy is True the bytes values are returned as read-only memoryviews of bytes_ instead of being copied.
+    """
+
+    view = memoryview(bytes_).cast('B')
+    if view[:len(BYTES_MAGIC)] != BYTES_MAGIC:
+        return pickle.loads(view)
+
+    offset = len(BYTES_MAGIC)
+    n_buffers, pickle_length = struct.unpack_from('<IQ', view, offset)
+    offset += 12
+    lengths = struct.unpack_from(f'<{n_buffers}Q', view, offset)
+    offset += 8 * n_buffers
+    kinds = bytes(view[offset:offset + n_buffers])
+    offset += n_buffers
+    pickle_view = view[offset:offset + pickle_length]
+    offset += pickle_length
+    buffers = []
+    for length in lengths:
+        buffers.append(view[offset:offset + length].toreadonly())
+        offset += length
+
+    return _FramesUnpickler(pickle_view, buffers, kinds, zero_copy).load()
+
+
+class _Abbreviated:
+    """Text that pprint shows as is, without quotes, in place of the abbreviated values."""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __gt__(self, other):  # pprint sorts the dictionary keys and the set elements, the abbreviations go last
+        return True
+
+    def __lt__(self, other):
+        return False
+
+    def __repr__(self):
+        return self.text
+
+
+class _FramesPickler(pickle.Pickler):
+    """Pickler of _pickle_frames. Collects the big bytes-like values and the PickleBuffers in buffers."""
+
+    def __init__(self, file: io.BytesIO, out_of_band_size: int):
+        super().__init__(file, protocol=5, buffer_callback=self._add_pickle_buffer)
+        self.out_of_band_size = out_of_band_size
+        self.buffers = []
+        self.kinds = bytearray()
+
+    def _add_pickle_buffer(self, buffer: pickle.PickleBuffer):
+        self.buffers.append(buffer.raw())
+        self.kinds.append(len(BUFFER_KINDS))
+
+    def persistent_id(self, obj: Any) -> int | None:
+        if obj.__class__ in (bytes, bytearray) and len(obj) >= self.out_of_band_size:
+            self.buffers.append(memoryview(obj))
+        elif obj.__class__ is memoryview:  # memoryviews can't be pickled so they are always written out-of-band
+            self.buffers.append(obj.cast('B') if obj.c_contiguous else memoryview(obj.tobytes()))
+        else:
+            return
+
+        self.kinds.append(BUFFER_KINDS.index(obj.__class__))
+        return len(self.buffers) - 1
+
+
+class _FramesUnpickler(pickle.Unpickler):
+    """Unpickler of _unpickle_frames. Loads the out-of-band values from buffers."""
+
+    def __init__(self, pickle_view: memoryview, buffers: list[memoryview], kinds: bytes, zero_copy: bool):
+        super().__init__(io.BytesIO(pickle_view), buffers=(buffer for buffer, kind in zip(buffers, kinds) if kind == len(BUFFER_KINDS)))
+        self.buffers = buffers
+        self.kinds = kinds
+        self.zero_copy = zero_copy
+
+    def persistent_load(self, pid: int) -> Any:
+        buffer = self.buffers[pid]
+        kind = BUFFER_KINDS[self.kinds[pid]]
+        if kind is bytearray:
+            return bytearray(buffer)
+        if kind is bytes and not self.zero_copy:
+            return buffer.tobytes()
+        return buffer
 
 
 class BytesBase:
-    """Base class for serialize objects to bytes with pickle."""
+    """
+    Base class for serialize objects to bytes with pickle.
+
+    The bytes-like values of at least OUT_OF_BAND_SIZE bytes are written out-of-band, after the pickle, so they are not
+    copied into the pickle stream and from_bytes can load them as slices of the received buffer.
+    """
+
+    OUT_OF_BAND_SIZE = 1 << 16
 
     def __bytes__(self):
-        return pickle.dumps(self)
+        return b''.join(self.to_frames())
 
     @classmethod
-    def from_bytes(cls, bytes_: bytes) -> Any:
-        return pickle.loads(bytes_)
+    def from_bytes(cls, bytes_: bytes | bytearray | memoryview, zero_copy=False) -> Any:
+        """
+        Classmethod that constructs an object given its bytes (or a plain pickle).
+
+        If zero_copy is True the big bytes values are returned as read-only memoryviews of bytes_ instead of being
+        copied, so bytes_ must not be modified while the object is alive.
+        """
+
+        return _unpickle_frames(bytes_, zero_copy)
 
     def to_bytes(self):
         return bytes(self)
 
+    def to_frames(self) -> list[bytes | memoryview]:
+        """Returns the frames whose concatenation is bytes(self), e.g. for socket.sendmsg or file.writelines."""
+
+        return _pickle_frames(self, self.OUT_OF_BAND_SIZE)
+
 
 class CopyBase:
     """Base class for copy and deepcopy objects."""
 
+    _copiers = {}
+    _copy_strategies = {}
+
+    @classmethod
+    def _get_copy_strategy(cls, type_: type) -> Any:
+        """
+        Returns how _deep_copy copies the objects of a type: the registered copier for the type or for its closest base
+        class, 'share', 'deepcopy' (its own __deepcopy__), 'dict' (a new object with a copy of its vars) or 'reduce'.
+        """
+
+        try:
+            return cls._copy_strategies[type_]
+        except KeyError:
+            pass
+
+        for class_ in type_.__mro__:
+            if strategy := cls._copiers.get(class_):
+                break
+        else:
+            if issubclass(type_, Enum) or (params := getattr(type_, '__dataclass_params__', None)) and params.frozen:
+                strategy = 'share'
+            elif hasattr(type_, '__deepcopy__'):
+                strategy = 'deepcopy'
+            elif (
+                type_ not in copyreg.dispatch_table
+                and type_.__reduce_ex__ is object.__reduce_ex__
+                and type_.__reduce__ is object.__reduce__
+                and type_.__getstate__ is object.__getstate__
+                and not hasattr(type_, '__setstate__')
+                and '__dict__' in dir(type_)
+                and not any('__slots__' in vars(class_) for class_ in type_.__mro__)
+                and not issubclass(type_, (list, dict, set))
+            ):
+                strategy = 'dict'
+            else:
+                strategy = 'reduce'
+
+        cls._copy_strategies[type_] = strategy
+        return strategy
+
     def copy(self) -> CopyBase:
         return copy.copy(self)
 
-    def deep_copy(self) -> CopyBase:
-        return copy.deepcopy(self)
+    def deep_copy(self, copy_on_write=False) -> CopyBase:
+        """
+        Returns a deep copy of the object that shares the immutable values (strings, bytes, numbers, dates, enums,
+        frozen dataclasses, tuples of them...) with the original instead of duplicating them.
+
+        If copy_on_write is True the containers that support it (e.g. OrderedSet) share their storage with the
+        original until one of them is modified.
+        """
+
+        return _deep_copy(self, {}, copy_on_write)
+
+    @classmethod
+    def register_copier(cls, type_: type, copier: Callable[[Any, Callable[[Any], Any], bool], Any]):
+        """
+        Registers how deep_copy copies the objects of type_ and of its subclasses.
+
+        copier(value, copy_inner, copy_on_write) returns the copy of value and can use copy_inner to deep copy the
+        values it contains.
+        """
+
+        cls._copiers[type_] = copier
+        cls._copy_strategies.clear()
 
 
 class DictBase:
-    """Base class for serialize objects to dictionaries."""
+    """
+    Base class for serialize objects to dictionaries.
+
+    The type hints of each class are resolved only once, the first time that an object is decoded or encoded, into a
+    plan that knows which fields contain nested DictBase objects, lists of DictBase objects, values with a MongoCodec or
+    possibly pickled values.
+    """
+
+    _planned_classes = weakref.WeakSet()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        DictBase._clear_fields_plans()
+
+    @staticmethod
+    def _clear_fields_plans():
+        """
+        Invalidates the cached fields plans and decoders since the type hints can refer to a class that has just been
+        (re)defined or to a type whose MongoCodec has just been registered.
+        """
+
+        for class_ in list(DictBase._planned_classes):
+            for attribute_name in ('_fields_plan', '_data_decoder'):
+                if attribute_name in class_.__dict__:
+                    delattr(class_, attribute_name)
+        DictBase._planned_classes.clear()
+
+    @classmethod
+    def _decode_dict(cls, data: dict, lazy: bool) -> Any:
+        """Constructs an object of the class given a dictionary (see from_dict)."""
+
+        if (data_decoder := cls.__dict__.get('_data_decoder')) is None:
+            data_decoder = cls._get_data_decoder()
+
+        new_data = data_decoder(data, lazy)
+        return new_data if issubclass(cls, dict) else cls(**new_data)
 
     def _dict_repr(self) -> Any:
         """
@@ -59,48 +685,95 @@ class DictBase:
         return vars(self).copy()
 
     @classmethod
-    def from_dict(cls, data: dict, lazy=True) -> DictBase:
-        """Classmethod that constructs an object given a dictionary."""
+    def _get_data_decoder(cls) -> Callable[[dict, bool], dict]:
+        """Returns the function that decodes the values of a dictionary given the dictionary and the lazy flag."""
 
-        def decode_dict(cls_, data_: dict) -> Any:
-            new_data = copy.copy(data_)
-            type_hints = typing.get_type_hints(cls_)
-            for k, v in data_.items():
-                try:
-                    type_ = type_hints[k]
-                except (KeyError, TypeError):
-                    continue
+        if (data_decoder := cls.__dict__.get('_data_decoder')) is not None:
+            return data_decoder
 
-                type_origin = typing.get_origin(type_)
-                type_args = typing.get_args(type_)
-                try:
-                    value_type = type_args[-1]
-                except (IndexError, TypeError):
-                    value_type = type
+        fields_plan = cls._get_fields_plan()
 
-                type_ = type_origin or type_
+        def data_decoder(data: dict, lazy=True) -> dict:
+            new_data = data.copy()
+            for k, v in data.items():
+                try:
+                    _, nested_class, list_nested_class, codec_hint = fields_plan[k]
+                except KeyError:
+                    continue
 
-                match v:
-                    case dict() if issubclass(type_, DictBase) and lazy:
-                        continue
-                    case dict(dict_) if issubclass(type_, DictBase) and not lazy:
-                        new_data[k] = decode_dict(type_, dict_)
-                    case [*_, dict()] as list_ if not isinstance(list_, set) and type_origin and type_origin is not typing.Union and issubclass(type_origin, Iterable) and issubclass(value_type, DictBase) and not lazy:
-                        new_data[k] = [decode_dict(value_type, dict_) for dict_ in list_]
-                    case [*_, bytes()] as list_ if not lazy:
-                        try:
-                            new_data[k] = [pickle.loads(bytes_) for bytes_ in list_]
-                        except (pickle.UnpicklingError, EOFError):
-                            pass
-                    case bytes(bytes_):
+                if isinstance(v, bytes):
+                    try:
+                        new_data[k] = pickle.loads(v)
+                    except (pickle.UnpicklingError, EOFError):
+                        pass
+                elif codec_hint is not None:
+                    new_data[k] = MongoCodec.decode_value(v, codec_hint)
+                elif lazy:
+                    continue
+                elif isinstance(v, dict):
+                    if nested_class:
+                        new_data[k] = nested_class._decode_dict(v, lazy)
+                elif isinstance(v, collections.abc.Sequence) and v and not isinstance(v, (str, bytearray)):
+                    if isinstance(v[-1], dict):
+                        if list_nested_class:
+                            new_data[k] = [list_nested_class._decode_dict(dict_, lazy) for dict_ in v]
+                    elif isinstance(v[-1], bytes):
                         try:
-                            new_data[k] = pickle.loads(bytes_)
+                            new_data[k] = [pickle.loads(bytes_) for bytes_ in v]
                         except (pickle.UnpicklingError, EOFError):
                             pass
 
-            return new_data if issubclass(cls_, dict) else cls_(**new_data)
+            return new_data
 
-        return decode_dict(cls, data)
+        cls._data_decoder = data_decoder
+        return data_decoder
+
+    @classmethod
+    def _get_fields_plan(cls) -> dict[str, tuple[Any, Type[DictBase] | None, Type[DictBase] | None, Any]]:
+        """
+        Returns, for each field with type hint, {field_name: (type_hint, nested_class, list_nested_class, codec_hint)},
+        where codec_hint is the type hint if the field values are decoded with a MongoCodec.
+
+        The result is cached in the class itself.
+        """
+
+        if (fields_plan := cls.__dict__.get('_fields_plan')) is not None:
+            return fields_plan
+
+        fields_plan = {}
+        for field_name, type_ in typing.get_type_hints(cls).items():
+            type_origin = typing.get_origin(type_)
+            try:
+                value_type = typing.get_args(type_)[-1]
+            except IndexError:
+                value_type = None
+
+            class_ = type_origin or type_
+            nested_class = class_ if isinstance(class_, type) and issubclass(class_, DictBase) else None
+            if (
+                isinstance(type_origin, type)
+                and
+                issubclass(type_origin, Iterable)
+                and
+                isinstance(value_type, type)
+                and
+                issubclass(value_type, DictBase)
+            ):
+                list_nested_class = value_type
+            else:
+                list_nested_class = None
+            codec_hint = type_ if MongoCodec.is_codec_hint(type_) else None
+            fields_plan[field_name] = (type_, None if codec_hint else nested_class, list_nested_class, codec_hint)
+
+        cls._fields_plan = fields_plan
+        DictBase._planned_classes.add(cls)
+        return fields_plan
+
+    @classmethod
+    def from_dict(cls, data: dict, lazy=True) -> DictBase:
+        """Classmethod that constructs an object given a dictionary."""
+
+        return cls._decode_dict(data, lazy)
 
     def to_dict(self, pickle_types: tuple | list = ()) -> Any:
         """Returns the representation of the object as a dictionary."""
@@ -112,19 +785,76 @@ class DictBase:
                 case MongoBase():
                     return obj_.to_dict(pickle_types)
                 case [*_, _] as objs:
-                    return [encode_obj(obj) for obj in objs]
+                    return [obj if obj.__class__ in plain_types else encode_obj(obj) for obj in objs]
                 case _:
                     return obj_
 
         if not isinstance(dict_repr := self._dict_repr(), dict):
             return dict_repr
 
-        # noinspection DuplicatedCode
-        self_vars = dict_repr.copy()
-        for k, v in self_vars.items():
-            self_vars[k] = encode_obj(v)
+        pickle_types = tuple(pickle_types)
+        plain_types = frozenset() if pickle_types else PLAIN_TYPES  # the types returned as is, without calling encode_obj
+        return {k: v if v.__class__ in plain_types else encode_obj(v) for k, v in dict_repr.items()}
 
-        return self_vars
+
+class IdentityMap:
+    """
+    Cache of MongoBase objects by (collection_name, ObjectId) so that the same document is represented by the same
+    Python object and it isn't fetched and deserialized again.
+
+    It is opt-in: MongoBase only uses it inside its context manager scope. When max_size is exceeded, the least recently
+    used objects are discarded.
+    """
+
+    _current: contextvars.ContextVar[IdentityMap | None] = contextvars.ContextVar('identity_map', default=None)
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._objects: collections.OrderedDict[tuple[str, ObjectId], MongoBase] = collections.OrderedDict()
+        self._tokens: list[contextvars.Token] = []
+
+    def __contains__(self, key: tuple[str, ObjectId]) -> bool:
+        return key in self._objects
+
+    def __enter__(self) -> IdentityMap:
+        self._tokens.append(IdentityMap._current.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        IdentityMap._current.reset(self._tokens.pop())
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def add(self, object_: MongoBase):
+        """Adds the object to the map replacing the previous object with the same collection_name and ObjectId."""
+
+        key = (object_.collection_name, object_._id)
+        self._objects[key] = object_
+        self._objects.move_to_end(key)
+        while len(self._objects) > self.max_size:
+            self._objects.popitem(last=False)
+
+    def clear(self):
+        self._objects.clear()
+
+    @staticmethod
+    def current() -> IdentityMap | None:
+        """Returns the identity map of the current scope or None if there is no active scope."""
+
+        return IdentityMap._current.get()
+
+    def discard(self, collection_name: str, object_id: ObjectId):
+        self._objects.pop((collection_name, object_id), None)
+
+    def get(self, collection_name: str, object_id: ObjectId) -> MongoBase | None:
+        key = (collection_name, object_id)
+        try:
+            object_ = self._objects[key]
+        except (KeyError, TypeError):
+            return
+        self._objects.move_to_end(key)
+        return object_
 
 
 class JSONBASE:
@@ -188,6 +918,17 @@ class JSONBASE:
         else:
             return obj
 
+    @classmethod
+    def from_typed_json(cls, text: str | bytes) -> Any:
+        """
+        Classmethod that constructs an object given a JSON string written by to_typed_json.
+
+        The fields are decoded following the type hints of the classes, so nothing is guessed from the values. As the
+        texts can contain pickled values, only decode trusted texts.
+        """
+
+        return _decode_json_value(_loads_json(text), cls)
+
     def to_json(self, pickle_types: tuple | list = (Enum,), indent: int = None) -> str:
         """Returns the representation of the object as a JSON string."""
 
@@ -214,6 +955,38 @@ class JSONBASE:
 
         return json.dumps(self, default=json_encoder, indent=indent)
 
+    def to_typed_json(self, indent: int = None) -> str:
+        """
+        Returns the representation of the object as a JSON string that from_typed_json can decode losslessly.
+
+        The fields are encoded following the type hints of the classes and the registered MongoCodecs, the values not
+        described by them are tagged with their type or pickled. It uses orjson or msgspec if they are installed.
+        """
+
+        return _dumps_json(_encode_json_value(self, self.__class__), indent)
+
+
+class LazyRepr:
+    """
+    Wrapper that formats an object with str() only when it is needed and only once, e.g. for log records:
+    logger.debug('%s', LazyRepr(media)) doesn't format the media if the level discards the record and formats it only
+    once for all the handlers.
+    """
+
+    __slots__ = ('object_', '_str')
+
+    def __init__(self, object_: Any):
+        self.object_ = object_
+        self._str = None
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        if self._str is None:
+            self._str = str(self.object_)
+        return self._str
+
 
 class MeanBase:
     """Base class for calculate the mean of objects."""
@@ -224,59 +997,289 @@ class MeanBase:
         Classmethod that builds a new object calculating the mean of the objects in the iterable for the attributes
         specified in attribute_names with the provided ratios.
 
-        When calculating the mean, if an attribute is None, the ratio given for that object is distributed among the
-        rest whose attributes with that name contain some value other than None.
+        When calculating the mean, if an attribute is None, the ratios of the rest of objects whose attributes with that
+        name contain some value other than None are renormalized to keep their sum.
+
+        The datetime and timedelta attributes are averaged through their timestamps and seconds.
 
         By default, ratios is 1 / n_objects for every object in objects.
         """
 
-        if not objects:
-            return cls()
+        return cls.mean_many((objects,), (ratios,), attribute_names)[0]
 
-        n_objects = len(objects)
-        if not ratios:
-            ratios = [1 / n_objects for _ in objects]
-        elif len(ratios) != len(objects):
+    @classmethod
+    def mean_many(
+        cls,
+        groups: Iterable[Sequence],
+        ratios: Iterable[list[float] | None] = None,
+        attribute_names: Iterable[str] = ()
+    ) -> list[MeanBase]:
+        """
+        Classmethod that calculates the mean of every group of objects like MeanBase.mean, all at once with numpy.
+
+        ratios has the ratios of every group, None for the default ones.
+        """
+
+        groups = [group if isinstance(group, Sequence) else list(group) for group in groups]
+        ratios = [None] * len(groups) if ratios is None else list(ratios)
+        if len(ratios) != len(groups):
             raise ValueError('Wrong ratios length')
+        attribute_names = tuple(attribute_names)
+
+        group_weights = []
+        for group, group_ratios in zip(groups, ratios):
+            if not group_ratios:
+                group_weights.append(numpy.full(len(group), 1 / len(group) if group else 0))
+            elif len(group_ratios) != len(group):
+                raise ValueError('Wrong ratios length')
+            else:
+                group_weights.append(numpy.asarray(group_ratios, dtype=float))
+
+        if not (non_empty_groups := [(group, weights) for group, weights in zip(groups, group_weights) if len(group)]):
+            return [cls() for _ in groups]
+
+        objects = [object_ for group, _ in non_empty_groups for object_ in group]
+        weights = numpy.concatenate([weights for _, weights in non_empty_groups])
+        ends = numpy.cumsum([len(group) for group, _ in non_empty_groups])
+        starts = ends - [len(group) for group, _ in non_empty_groups]
+
+        # ----- objects x attributes matrix, NaN for the empty attributes -----
+        values = numpy.full((len(objects), len(attribute_names)), numpy.nan)
+        converters = {}
+        for column, attribute_name in enumerate(attribute_names):
+            attribute_values = [getattr(object_, attribute_name, None) if object_ else None for object_ in objects]
+            match next((value for value in attribute_values if value is not None), None):
+                case datetime.datetime():
+                    timezones = [
+                        next((value.tzinfo for value in attribute_values[start:end] if value is not None), None)
+                        for start, end in zip(starts, ends)
+                    ]
+                    converters[attribute_name] = lambda timestamp, group_index, timezones_=timezones: datetime.datetime.fromtimestamp(timestamp, timezones_[group_index])
+                    attribute_values = [None if value is None else value.timestamp() for value in attribute_values]
+                case datetime.timedelta():
+                    converters[attribute_name] = lambda seconds, _group_index: datetime.timedelta(seconds=seconds)
+                    attribute_values = [None if value is None else value.total_seconds() for value in attribute_values]
+            values[:, column] = numpy.array(attribute_values, dtype=float)
+
+        # ----- renormalized weighted means of all groups in one pass -----
+        present_weights = numpy.where(numpy.isnan(values), 0, weights[:, None])
+        weighted_sums = numpy.add.reduceat(numpy.nan_to_num(values) * present_weights, starts, axis=0)
+        present_ratio_sums = numpy.add.reduceat(present_weights, starts, axis=0)
+        ratio_sums = numpy.add.reduceat(weights, starts)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            group_means = weighted_sums * (ratio_sums[:, None] / present_ratio_sums)
+
+        results = []
+        group_index = 0
+        for group in groups:
+            if not group:
+                results.append(cls())
+                continue
+
+            attribute_values = {}
+            for column, attribute_name in enumerate(attribute_names):
+                if present_ratio_sums[group_index, column]:
+                    value = group_means[group_index, column].item()
+                    if converter := converters.get(attribute_name):
+                        value = converter(value, group_index)
+                    attribute_values[attribute_name] = value
+
+            # noinspection PyArgumentList
+            results.append(cls(**attribute_values))
+            group_index += 1
+
+        return results
+
+
+class MongoCodec:
+    """
+    Native mongo representation of a type whose values otherwise would be pickled, so that they are queryable, indexable
+    and faster to load.
 
-        # ----- updates the ratios depending on empty attributes -----
-        attributes_ratios = {}
-        attributes_ratios_length = {}
-        for attribute_name in attribute_names:
-            attributes_ratios[attribute_name] = ratios.copy()
-            attributes_ratios_length[attribute_name] = len(attributes_ratios[attribute_name])
-            for object_index, object_ in enumerate(objects):
-                if not object_ or getattr(object_, attribute_name, None) is None:
-                    attributes_ratios_length[attribute_name] -= 1
-                    try:
-                        ratio_part_to_add = attributes_ratios[attribute_name][object_index] / attributes_ratios_length[attribute_name]
-                    except ZeroDivisionError:
-                        ratio_part_to_add = 0
-                    attributes_ratios[attribute_name][object_index] = 0
-                    for ratio_index, _ in enumerate(attributes_ratios[attribute_name]):
-                        if attributes_ratios[attribute_name][ratio_index]:
-                            attributes_ratios[attribute_name][ratio_index] += ratio_part_to_add
-
-        attribute_values = {}
-        timezone: datetime.timezone | None = None
-        for attribute_name, attribute_ratios in attributes_ratios.items():
-            values = []
-            for object_, ratio in zip(objects, attribute_ratios):
-                if ratio:
-                    attribute = getattr(object_, attribute_name)
-                    if attribute_name in ('sunrise', 'sunset'):
-                        timezone = attribute.tzinfo
-                        attribute = attribute.timestamp()
-                    values.append(attribute * ratio)
-
-            if values:
-                final_value = sum(values)
-                if attribute_name in ('sunrise', 'sunset'):
-                    final_value = datetime.datetime.fromtimestamp(final_value, timezone)
-                attribute_values[attribute_name] = final_value
-
-        # noinspection PyArgumentList
-        return cls(**attribute_values)
+    encode(value, type_hint, encode_inner) returns a mongo compatible value and decode(value, type_hint, decode_inner)
+    builds the value back, where encode_inner(value, type_hint) and decode_inner(value, type_hint) process the inner
+    values. A value is encoded with its codec only if the type hint of its field determines it, otherwise it is pickled
+    as the last resort.
+
+    The codecs are registered with MongoCodec.register, usually next to the definition of the type.
+    """
+
+    _codec_hints: dict[Any, bool] = {}
+    _codecs: dict[type, MongoCodec] = {}
+    _element_hints: dict[Any, Any] = {}
+    _resolved_hints: dict[Any, tuple[MongoCodec | None, type | None, Any]] = {}
+
+    def __init__(self, type_: type, encode: Callable[[Any, Any, Callable], Any], decode: Callable[[Any, Any, Callable], Any]):
+        self.type_ = type_
+        self.encode = encode
+        self.decode = decode
+
+    @staticmethod
+    def decode_elements(values: Iterable, type_hint: Any, decode_inner: Callable[[Any, Any], Any]) -> Iterator:
+        """Decodes the elements of a collection whose type hint is type_hint (e.g. set[MediaType])."""
+
+        element_hint = MongoCodec.get_element_hint(type_hint)
+        if element_hint in SCALAR_HINTS:  # the scalar elements don't need to be decoded
+            return (value if value.__class__ in SCALAR_TYPES else decode_inner(value, element_hint) for value in values)
+
+        return (decode_inner(value, element_hint) for value in values)
+
+    @staticmethod
+    def decode_document(document: dict, type_hint: Any, decode_inner: Callable[[Any, Any], Any]) -> DictBase:
+        """Decodes a DictBase object encoded with encode_document. The __init__ is not called, like with pickle."""
+
+        class_ = typing.get_origin(type_hint) or type_hint
+        fields_plan = class_._get_fields_plan()
+        object_ = class_.__new__(class_)
+        object_vars = vars(object_)
+        for k, v in document.items():
+            type_hint = fields_plan[k][0] if k in fields_plan else None
+            object_vars[k] = v if v.__class__ in SCALAR_TYPES and type_hint in SCALAR_HINTS else decode_inner(v, type_hint)
+
+        return object_
+
+    @classmethod
+    def decode_value(cls, value: Any, type_hint: Any) -> Any:
+        """Returns the python value of a stored value given the type hint of its field."""
+
+        codec, class_, type_hint = cls.resolve(type_hint)
+        if codec is None:
+            if isinstance(value, bytes) and type_hint is not bytes:
+                try:
+                    return pickle.loads(value)
+                except (pickle.UnpicklingError, EOFError):
+                    return value
+            if isinstance(value, list) and cls.is_codec_hint(element_hint := cls.get_element_hint(type_hint)):
+                return [cls.decode_value(element, element_hint) for element in value]
+            return value
+
+        if value is None or isinstance(value, class_):
+            return value
+
+        try:
+            if isinstance(value, bytes):
+                return pickle.loads(value)
+            return codec.decode(value, type_hint, cls.decode_value)
+        except (KeyError, TypeError, ValueError, pickle.UnpicklingError, EOFError):
+            return value
+
+    @staticmethod
+    def encode_document(object_: DictBase, _type_hint: Any, encode_inner: Callable[[Any, Any], Any]) -> dict:
+        """Encodes a DictBase object as a subdocument using the type hints of its class."""
+
+        fields_plan = object_._get_fields_plan()
+        return {
+            k: v if v.__class__ in SCALAR_TYPES else encode_inner(v, fields_plan[k][0] if k in fields_plan else None)
+            for k, v in object_._dict_repr().items()
+        }
+
+    @staticmethod
+    def encode_elements(values: Iterable, type_hint: Any, encode_inner: Callable[[Any, Any], Any]) -> list:
+        """Encodes the elements of a collection whose type hint is type_hint (e.g. set[MediaType]) as a list."""
+
+        element_hint = MongoCodec.get_element_hint(type_hint)
+        return [encode_inner(value, element_hint) for value in values]
+
+    @staticmethod
+    def encode_set_elements(values: AbstractSet, type_hint: Any, encode_inner: Callable[[Any, Any], Any]) -> list:
+        """
+        Encodes the elements of a set as a list sorted when they are comparable, so that equal sets are stored equal
+        regardless of their iteration order.
+        """
+
+        elements = MongoCodec.encode_elements(values, type_hint, encode_inner)
+        try:
+            elements.sort()
+        except TypeError:
+            pass
+
+        return elements
+
+    @classmethod
+    def find(cls, type_: type) -> MongoCodec | None:
+        """Returns the codec registered for the type or for its closest base class."""
+
+        if issubclass(type_, MongoBase):
+            return
+
+        for class_ in type_.__mro__:
+            if codec := cls._codecs.get(class_):
+                return codec
+
+    @classmethod
+    def get_element_hint(cls, type_hint: Any) -> Any:
+        """Returns the type hint of the elements of a collection type hint (list[int] -> int) or None."""
+
+        try:
+            return cls._element_hints[type_hint]
+        except KeyError:
+            pass
+        except TypeError:
+            return
+
+        args = typing.get_args(type_hint)
+        element_hint = args[0] if len(args) == 1 or len(args) == 2 and args[1] is Ellipsis else None
+        cls._element_hints[type_hint] = element_hint
+        return element_hint
+
+    @classmethod
+    def is_codec_hint(cls, type_hint: Any) -> bool:
+        """Returns True if the values of a field with that type hint are decoded with a codec."""
+
+        try:
+            return cls._codec_hints[type_hint]
+        except KeyError:
+            pass
+        except TypeError:
+            return False
+
+        is_codec_hint = (
+            cls.resolve(type_hint)[0] is not None
+            or
+            (element_hint := cls.get_element_hint(type_hint)) is not None and cls.is_codec_hint(element_hint)
+        )
+        cls._codec_hints[type_hint] = is_codec_hint
+        return is_codec_hint
+
+    @classmethod
+    def register(cls, type_: type, encode: Callable[[Any, Any, Callable], Any], decode: Callable[[Any, Any, Callable], Any]) -> MongoCodec:
+        """Registers the codec of the type (and its subclasses unless they have their own)."""
+
+        codec = cls(type_, encode, decode)
+        cls._codecs[type_] = codec
+        cls._codec_hints.clear()
+        cls._resolved_hints.clear()
+        DictBase._clear_fields_plans()
+        return codec
+
+    @classmethod
+    def resolve(cls, type_hint: Any) -> tuple[MongoCodec | None, type | None, Any]:
+        """
+        Returns (codec, class_, type_hint) for a field type hint, where Optional[X] is treated as X and class_ is the
+        class that the decoded values have.
+        """
+
+        try:
+            return cls._resolved_hints[type_hint]
+        except KeyError:
+            pass
+        except TypeError:
+            return None, None, type_hint
+
+        resolved_hint = type_hint
+        if typing.get_origin(type_hint) in (typing.Union, UnionType):
+            match [arg for arg in typing.get_args(type_hint) if arg is not NoneType]:
+                case [arg]:
+                    resolved_hint = arg
+
+        class_ = typing.get_origin(resolved_hint) or resolved_hint
+        if isinstance(class_, type):
+            resolved = (cls.find(class_), class_, resolved_hint)
+        else:
+            resolved = (None, None, resolved_hint)
+
+        cls._resolved_hints[type_hint] = resolved
+        return resolved
 
 
 class MongoBase(DictBase, BytesBase):
@@ -284,8 +1287,13 @@ class MongoBase(DictBase, BytesBase):
     Base class for mapping objects to mongo documents and vice versa (Object Document Mapper).
 
     Dataclass compatible.
+
+    The objects loaded from the database and the saved ones keep a snapshot of their database document and record the
+    assigned attributes, so save() only writes the modified fields.
     """
 
+    __slots__ = ('_database_document', '_modified_fields', '_unloaded_fields')
+
     _id: ObjectId = None
     subclasses: list = []
     database: pymongo.database.Database = None
@@ -294,6 +1302,13 @@ class MongoBase(DictBase, BytesBase):
     unique_keys: str | Iterable[str] = ()
     nullable_unique_keys: str | Iterable[str] = ()
 
+    def __new__(cls, *args, **kwargs):
+        self = super().__new__(cls)
+        object.__setattr__(self, '_database_document', None)
+        object.__setattr__(self, '_modified_fields', None)
+        object.__setattr__(self, '_unloaded_fields', None)
+        return self
+
     def __init__(self):
         match self._id:
             case str() if self._id:
@@ -306,13 +1321,39 @@ class MongoBase(DictBase, BytesBase):
         self._create_unique_indices()
 
     def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        for subclass in MongoBase.subclasses:
+            if (subclass.__module__, subclass.__qualname__) == (cls.__module__, cls.__qualname__):
+                MongoBase.subclasses.remove(subclass)
+                MongoBase._clear_reference_fields()
+                break
+
         MongoBase.subclasses.append(cls)
 
     def __post_init__(self):
         MongoBase.__init__(self)
 
-    def __bytes__(self):
-        return pickle.dumps(self.to_dict())
+    def __copy__(self) -> MongoBase:
+        """Shallow copy that tracks its own modified fields on its own copy of the database document snapshot."""
+
+        copied_object = self.__class__.__new__(self.__class__)
+        vars(copied_object).update(vars(self))
+        if (database_document := object.__getattribute__(self, '_database_document')) is not None:
+            copied_object._set_database_document(database_document)
+            object.__getattribute__(copied_object, '_modified_fields').update(object.__getattribute__(self, '_modified_fields'))
+        if unloaded_fields := object.__getattribute__(self, '_unloaded_fields'):
+            object.__setattr__(copied_object, '_unloaded_fields', unloaded_fields.copy())
+
+        return copied_object
+
+    def __delattr__(self, attribute_name):
+        super().__delattr__(attribute_name)
+
+        if (modified_fields := object.__getattribute__(self, '_modified_fields')) is not None:
+            modified_fields.add(attribute_name)
+        if unloaded_fields := object.__getattribute__(self, '_unloaded_fields'):
+            unloaded_fields.discard(attribute_name)
 
     def __eq__(self, other):
         if unique_attributes := self.unique_attributes:
@@ -332,19 +1373,31 @@ class MongoBase(DictBase, BytesBase):
 
         value = super().__getattribute__(attribute_name)
 
-        if super().__getattribute__('database') is None:
+        class_ = type(self)
+        if class_.database is None:
             return value
 
+        if (unloaded_fields := object.__getattribute__(self, '_unloaded_fields')) and attribute_name in unloaded_fields:
+            self._load_unloaded_fields()
+            value = super().__getattribute__(attribute_name)
+
+        if (reference_fields := class_.__dict__.get('_reference_fields')) is None:
+            reference_fields = class_._get_reference_fields()
+
         try:
-            type_ = typing.get_type_hints(super().__getattribute__('__class__'))[attribute_name]
+            reference_class, list_reference_class = reference_fields[attribute_name]
         except KeyError:
             return value
 
         match value:
-            case ObjectId() as object_id if issubclass(type_, MongoBase):
-                value = type_.find_one({'_id': object_id})
-            case [*_, ObjectId()] as object_ids if type_arg := iterables.find(typing.get_args(type_), MongoBase):
-                value = [result for object_id in object_ids if (result := type_arg.find_one({'_id': object_id}))]
+            case ObjectId() as object_id if reference_class:
+                value = reference_class.find_by_ids((object_id,)).get(object_id)
+            case [*_, ObjectId()] as object_ids if list_reference_class:
+                found_objects = list_reference_class.find_by_ids(object_ids)
+                value = [found_objects[object_id] for object_id in object_ids if object_id in found_objects]
+            case collections.abc.Set() as object_ids if list_reference_class and object_ids and isinstance(next(iter(object_ids)), ObjectId):
+                found_objects = list_reference_class.find_by_ids(object_ids)
+                value = object_ids.__class__(found_objects[object_id] for object_id in object_ids if object_id in found_objects)
             case _:
                 return value
 
@@ -357,11 +1410,34 @@ class MongoBase(DictBase, BytesBase):
         else:
             return hash(self._id)
 
+    def __setattr__(self, attribute_name, value):
+        super().__setattr__(attribute_name, value)
+
+        if attribute_name in MongoBase.__slots__:
+            return
+
+        if (modified_fields := object.__getattribute__(self, '_modified_fields')) is not None:
+            modified_fields.add(attribute_name)
+        if unloaded_fields := object.__getattribute__(self, '_unloaded_fields'):
+            unloaded_fields.discard(attribute_name)
+
+    @staticmethod
+    def _clear_reference_fields():
+        """Invalidates the cached reference fields of all the subclasses."""
+
+        for subclass in MongoBase.subclasses:
+            if '_reference_fields' in subclass.__dict__:
+                del subclass._reference_fields
+
     @classmethod
     def _create_unique_indices(cls):
-        """Create the unique indices in the database based on unique_keys and nullable_unique_keys attributes."""
+        """
+        Create the unique indices in the database based on unique_keys and nullable_unique_keys attributes.
 
-        if cls.collection is None or not cls.unique_keys:
+        They are created only once per class and collection, not every time an object is constructed.
+        """
+
+        if cls.collection is None or not cls.unique_keys or cls.__dict__.get('_indexed_collection') is cls.collection:
             return
 
         unique_keys = [(unique_key, pymongo.ASCENDING) for unique_key in cls.unique_keys]
@@ -370,6 +1446,91 @@ class MongoBase(DictBase, BytesBase):
         partial_unique_filter = {nullable_unique_key: type_filter for nullable_unique_key in cls.nullable_unique_keys}
 
         cls.collection.create_index(unique_keys, partialFilterExpression=partial_unique_filter, unique=True)
+        cls._indexed_collection = cls.collection
+
+    @classmethod
+    def _from_document(cls, document: dict, lazy=True) -> MongoBase:
+        """Constructs an object from a document read from the collection and keeps the snapshot of the document."""
+
+        object_ = cls.from_dict(document, lazy)
+        if isinstance(object_, MongoBase):
+            object_._set_database_document(document)
+
+        return object_
+
+    @classmethod
+    def _get_reference_fields(cls) -> dict[str, tuple[Type[MongoBase] | None, Type[MongoBase] | None]]:
+        """
+        Returns the fields that can contain references to other MongoBase objects:
+        {field_name: (referenced_class, list_referenced_class)}.
+
+        The type hints are resolved only once per class and the result is cached in the class itself, so the rest of the
+        attributes are returned by __getattribute__ without any extra work.
+        """
+
+        if (reference_fields := cls.__dict__.get('_reference_fields')) is not None:
+            return reference_fields
+
+        reference_fields = {}
+        for field_name, type_ in typing.get_type_hints(cls).items():
+            reference_class = type_ if isinstance(type_, type) and issubclass(type_, MongoBase) else None
+            list_reference_class = iterables.find(typing.get_args(type_), MongoBase)
+            if reference_class or list_reference_class:
+                reference_fields[field_name] = (reference_class, list_reference_class)
+
+        cls._reference_fields = reference_fields
+        return reference_fields
+
+    def _get_save_data(self, fields: Iterable[str] | None, pickle_types: tuple | list, references: bool) -> dict:
+        """Returns the data that save() sets in the database document."""
+
+        data = self.to_mongo(pickle_types, fields)
+
+        if references:
+            for k, v in data.items():
+                match v:
+                    case {'_id': ObjectId() as object_id}:
+                        data[k] = object_id
+                    case [*_, {'_id': ObjectId()}]:
+                        data[k] = [obj_data['_id'] for obj_data in v]
+
+        return data
+
+    def _get_save_update(self, fields: Iterable[str] | None, pickle_types: tuple | list, references: bool) -> dict:
+        """
+        Returns the update document ({'$set': ..., '$unset': ...}) that save() applies.
+
+        If the object has a snapshot of its database document, only the assigned fields and the fields with mutable
+        values are serialized and only the ones that differ from the snapshot are included. Only the deleted attributes
+        are unset, the stored fields that the object doesn't represent are kept. Returns an empty dict if nothing has
+        changed.
+        """
+
+        database_document = object.__getattribute__(self, '_database_document')
+        unloaded_fields = object.__getattribute__(self, '_unloaded_fields')
+        if database_document is None or fields is not None or not isinstance(mongo_repr := self._mongo_repr(), dict):
+            if unloaded_fields:
+                fields = [k for k in (vars(self) if fields is None else fields) if k not in unloaded_fields]
+            return {'$set': self._get_save_data(fields, pickle_types, references)}
+
+        if unloaded_fields:
+            mongo_repr = {k: v for k, v in mongo_repr.items() if k not in unloaded_fields}
+
+        modified_fields = object.__getattribute__(self, '_modified_fields')
+        candidate_fields = [
+            k for k, v in mongo_repr.items()
+            if k in modified_fields or k not in database_document or not isinstance(v, IMMUTABLE_TYPES)
+        ]
+        update = {}
+        if set_data := {
+            k: v for k, v in self._get_save_data(candidate_fields, pickle_types, references).items()
+            if k not in database_document or database_document[k] != v
+        }:
+            update['$set'] = set_data
+        if unset_data := {k: '' for k in database_document if k in modified_fields and k not in mongo_repr}:
+            update['$unset'] = unset_data
+
+        return update
 
     def _json_repr(self) -> Any:
         self_vars = vars(self).copy()
@@ -377,11 +1538,210 @@ class MongoBase(DictBase, BytesBase):
 
         return self_vars
 
+    def _load_unloaded_fields(self):
+        """Fetches from the database, in one query, the fields that were not loaded because of a find projection."""
+
+        unloaded_fields = object.__getattribute__(self, '_unloaded_fields')
+        object.__setattr__(self, '_unloaded_fields', None)
+        if self.collection is None or not unloaded_fields:
+            return
+
+        if not (document := self.collection.find_one({'_id': self._id}, dict.fromkeys(unloaded_fields, True))):
+            return
+
+        loaded_vars = vars(self.from_dict(document))
+        database_document = object.__getattribute__(self, '_database_document')
+        for k in unloaded_fields:
+            if k in document:
+                super().__setattr__(k, loaded_vars[k])
+                if database_document is not None:
+                    database_document[k] = _copy_document_value(document[k])
+
+    def _mark_saved(self, update: dict):
+        """Updates the snapshot of the database document with the applied update and resets the modified fields."""
+
+        database_document = object.__getattribute__(self, '_database_document') or {}
+        unset_data = update.get('$unset', {})
+        self._set_database_document({k: v for k, v in database_document.items() if k not in unset_data} | update.get('$set', {}))
+
+    def _merge_document(self, document: dict, overwrite_fields: Iterable[str], exclude_fields: Iterable[str], lazy: bool):
+        """
+        Updates the values of the current object with the values of the database document (see pull_from_database).
+
+        If the document is the one of the object, it is kept as the snapshot of its database document and the values
+        that have not been taken from it are considered modified, unless the object was already persisted and their
+        stored values haven't changed.
+        """
+
+        kept_fields = set(vars(self))
+        for database_key, database_value in vars(self.from_dict(document, lazy)).items():
+            self_value = getattr(self, database_key)
+            if (
+                database_key not in exclude_fields
+                and
+                (
+                    database_key in overwrite_fields and database_value is not None
+                    or
+                    self_value is None
+                    or
+                    isinstance(self_value, Iterable) and not self_value
+                )
+            ):
+                super().__setattr__(database_key, database_value)
+                kept_fields.discard(database_key)
+                if unloaded_fields := object.__getattribute__(self, '_unloaded_fields'):
+                    unloaded_fields.discard(database_key)
+
+        if document.get('_id') == self._id:
+            previous_document = object.__getattribute__(self, '_database_document')
+            modified_fields = object.__getattribute__(self, '_modified_fields') or set()
+            modified_fields.update(
+                k for k in kept_fields
+                if previous_document is None or k not in previous_document or previous_document[k] != document.get(k)
+            )
+            self._set_database_document(document)
+            object.__setattr__(self, '_modified_fields', modified_fields)
+
     def _mongo_repr(self) -> Any:
         """Returns the object representation to save in mongo database."""
 
         return {k: v.value if isinstance(v, Enum) else v for k, v in self._dict_repr().items()}
 
+    @classmethod
+    def _pull_many_from_database(
+        cls,
+        objects: Iterable[MongoBase],
+        overwrite_fields: Iterable[str] = ('_id',),
+        exclude_fields: Iterable[str] = (),
+        lazy=True
+    ):
+        """
+        Same as pull_from_database but for many objects of this class making only one query.
+
+        The MongoBase values of the unique attributes have to be already pulled.
+        """
+
+        objects_by_id = {}
+        objects_by_unique_values = {}
+        for object_ in objects:
+            unique_attributes = object_.unique_attributes
+            if not unique_attributes or any(value is None for value in unique_attributes.values()):
+                objects_by_id.setdefault(object_._id, []).append(object_)
+                continue
+
+            unique_values = tuple(value._id if isinstance(value, MongoBase) else value for value in unique_attributes.values())
+            try:
+                objects_by_unique_values.setdefault(unique_values, []).append(object_)
+            except TypeError:
+                object_.pull_from_database(overwrite_fields, exclude_fields, lazy)
+
+        queries = []
+        if objects_by_id:
+            queries.append({'_id': {'$in': list(objects_by_id)}})
+        if objects_by_unique_values:
+            if len(cls.unique_keys) == 1:
+                queries.append({cls.unique_keys[0]: {'$in': [unique_values[0] for unique_values in objects_by_unique_values]}})
+            else:
+                queries.extend(dict(zip(cls.unique_keys, unique_values)) for unique_values in objects_by_unique_values)
+
+        match queries:
+            case []:
+                return
+            case [query]:
+                pass
+            case _:
+                query = {'$or': queries}
+
+        for document in cls.collection.find(query):
+            document_objects = [*objects_by_id.get(document['_id'], ())]
+            try:
+                document_objects += objects_by_unique_values.get(tuple(document.get(unique_key) for unique_key in cls.unique_keys), [])
+            except TypeError:
+                pass
+            for object_ in document_objects:
+                object_._merge_document(document, overwrite_fields, exclude_fields, lazy)
+
+    def _set_database_document(self, document: dict):
+        """Saves the snapshot of the database document and starts recording the assigned attributes."""
+
+        object.__setattr__(self, '_database_document', {k: _copy_document_value(v) for k, v in document.items()})
+        object.__setattr__(self, '_modified_fields', set())
+
+    async def adelete(self, *args, **kwargs):
+        """Asynchronous version of delete. The database operations run in a worker thread."""
+
+        await asyncio.to_thread(self.delete, *args, **kwargs)
+
+    @classmethod
+    async def afind(
+        cls,
+        query: dict = None,
+        sort_keys: str | Iterable[str | tuple[str, int]] = (),
+        skip: int = None,
+        limit: int = None,
+        lazy=False,
+        fields: Iterable[str] = None,
+        exclude: Iterable[str] = None,
+        raw=False,
+        batch_size: int = None,
+        decode_workers: int = None,
+        decode_processes=False
+    ) -> AsyncIterator | list:
+        """
+        Asynchronous version of find. The database operations run in a worker thread.
+
+        If lazy=True returns an asynchronous iterator that fetches the results in chunks:
+
+        async for chat in await Chat.afind(lazy=True):
+            ...
+        """
+
+        results = await asyncio.to_thread(cls.find, query, sort_keys, skip, limit, lazy, fields, exclude, raw, batch_size, decode_workers, decode_processes)
+        return asyncs.iterate_in_thread(results, batch_size or 100) if lazy else results
+
+    @classmethod
+    async def afind_by_ids(cls, *args, **kwargs) -> dict[ObjectId, MongoBase]:
+        """Asynchronous version of find_by_ids. The database operations run in a worker thread."""
+
+        return await asyncio.to_thread(cls.find_by_ids, *args, **kwargs)
+
+    @classmethod
+    async def afind_one(cls, *args, **kwargs) -> MongoBase | dict | None:
+        """Asynchronous version of find_one. The database operations run in a worker thread."""
+
+        return await asyncio.to_thread(cls.find_one, *args, **kwargs)
+
+    async def apull_from_database(self, *args, **kwargs):
+        """Asynchronous version of pull_from_database. The database operations run in a worker thread."""
+
+        await asyncio.to_thread(self.pull_from_database, *args, **kwargs)
+
+    async def aresolve(self, *args, **kwargs):
+        """
+        Asynchronous version of resolve. The database operations run in a worker thread.
+
+        Once resolved, the references are read without any database operation.
+        """
+
+        await asyncio.to_thread(self.resolve, *args, **kwargs)
+
+    @staticmethod
+    async def aresolve_many(*args, **kwargs):
+        """Asynchronous version of resolve_many. The database operations run in a worker thread."""
+
+        await asyncio.to_thread(MongoBase.resolve_many, *args, **kwargs)
+
+    async def asave(self, *args, **kwargs):
+        """Asynchronous version of save. The database operations run in a worker thread."""
+
+        await asyncio.to_thread(self.save, *args, **kwargs)
+
+    @staticmethod
+    async def asave_many(*args, **kwargs) -> list[SaveResult]:
+        """Asynchronous version of save_many. The database operations run in a worker thread."""
+
+        return await asyncio.to_thread(MongoBase.save_many, *args, **kwargs)
+
     def delete(self, cascade=False):
         """
         Delete the object from the database.
@@ -397,6 +1757,11 @@ class MongoBase(DictBase, BytesBase):
                 referenced_object.delete(cascade)
 
         self.collection.delete_one({'_id': self._id})
+        object.__setattr__(self, '_database_document', None)
+        object.__setattr__(self, '_modified_fields', None)
+
+        if (identity_map := IdentityMap.current()) is not None:
+            identity_map.discard(self.collection_name, self._id)
 
     @classmethod
     def delete_many_raw(cls, *args, **kwargs) -> pymongo.results.DeleteResult | None:
@@ -419,17 +1784,81 @@ class MongoBase(DictBase, BytesBase):
         sort_keys: str | Iterable[str | tuple[str, int]] = (),
         skip: int = None,
         limit: int = None,
-        lazy=False
+        lazy=False,
+        fields: Iterable[str] = None,
+        exclude: Iterable[str] = None,
+        raw=False,
+        batch_size: int = None,
+        decode_workers: int = None,
+        decode_processes=False
     ) -> Iterator | list:
-        """Query the collection."""
+        """
+        Query the collection.
+
+        fields: specify the only fields to fetch from the database.
+        exclude: specify the fields not to fetch from the database.
+        raw: if it's True, yields the documents as plain dictionaries without constructing the objects.
+        batch_size: number of documents that the cursor fetches from the database in each round trip.
+        decode_workers: if it's given, the documents are decoded in batches of batch_size documents (100 by default) by
+        a pool of decode_workers threads, or processes if decode_processes=True, while the next batches are fetched.
+        The order is kept and only 2 * decode_workers batches are held in memory at the same time.
+
+        When fields or exclude are used the objects are partially loaded: the missing fields are fetched from the
+        database, all in one query, the first time that one of them is accessed.
+        """
+
+        def decode_generator() -> Iterator[tuple[dict, MongoBase | None]]:
+            if not decode_workers:
+                for document in cursor:
+                    yield document, None
+                return
+
+            if decode_processes:
+                executor = concurrent.futures.ProcessPoolExecutor(decode_workers, initializer=_detach_database)
+            else:
+                executor = concurrent.futures.ThreadPoolExecutor(decode_workers)
+            documents = iter(cursor)
+            pending_batches = collections.deque()
+            try:
+                while True:
+                    while len(pending_batches) < 2 * decode_workers and (batch := list(itertools.islice(documents, batch_size or 100))):
+                        pending_batches.append((batch, executor.submit(_decode_documents, cls, batch)))
+                    if not pending_batches:
+                        break
+
+                    batch, future = pending_batches.popleft()
+                    yield from zip(batch, future.result())
+            finally:  # also when the caller stops iterating and the generator is closed or collected
+                executor.shutdown(cancel_futures=True)
 
         def find_generator() -> Iterator:
-            for document in cursor:
-                yield cls.from_dict(document)
+            for document, object_ in decode_generator():
+                if identity_map is not None and (mapped_object := identity_map.get(cls.collection_name, document.get('_id'))) is not None:
+                    yield mapped_object
+                    continue
+
+                if object_ is None:
+                    object_ = cls._from_document(document)
+                if projection and (unloaded_fields := {*(exclude or ()), *(k for k in vars(object_) if k not in document)}):
+                    object.__setattr__(object_, '_unloaded_fields', unloaded_fields)
+                if identity_map is not None:
+                    identity_map.add(object_)
+                yield object_
 
         if cls.collection is None:
             return iter([]) if lazy else []
 
+        if fields is not None and exclude is not None:
+            raise ValueError('fields and exclude cannot be used at the same time')
+        if fields is not None:
+            projection = {'_id': True} | dict.fromkeys(fields, True)
+        elif exclude is not None:
+            projection = dict.fromkeys(exclude := tuple(exclude), False)
+        else:
+            projection = None
+
+        identity_map = None if raw else IdentityMap.current()
+
         match sort_keys:
             case str():
                 sort_keys = ((sort_keys, pymongo.ASCENDING),)
@@ -443,12 +1872,33 @@ class MongoBase(DictBase, BytesBase):
             kwargs['skip'] = skip
         if limit is not None:
             kwargs['limit'] = limit
-        cursor: pymongo.cursor.Cursor = cls.collection.find(query, **kwargs)
+        cursor: pymongo.cursor.Cursor = cls.collection.find(query, projection, **kwargs)
         if sort_keys:
             cursor.sort(sort_keys)
+        if batch_size is not None:
+            cursor.batch_size(batch_size)
+
+        if raw:
+            return cursor if lazy else list(cursor)
 
         return find_generator() if lazy else list(find_generator())
 
+    @classmethod
+    def find_by_ids(cls, object_ids: Iterable[ObjectId]) -> dict[ObjectId, MongoBase]:
+        """Query the collection for all the given ObjectIds in one round trip and returns a {ObjectId: MongoBase} dict."""
+
+        object_ids = list(dict.fromkeys(object_ids))
+        found_objects = {}
+        if (identity_map := IdentityMap.current()) is not None:
+            for object_id in object_ids:
+                if (object_ := identity_map.get(cls.collection_name, object_id)) is not None:
+                    found_objects[object_id] = object_
+
+        if object_ids := [object_id for object_id in object_ids if object_id not in found_objects]:
+            found_objects |= {object_._id: object_ for object_ in cls.find({'_id': {'$in': object_ids}})}
+
+        return found_objects
+
     def find_in_database_by_id(self, object_id: ObjectId) -> dict | None:
         """Find an object in all database collections by its ObjectId."""
 
@@ -459,10 +1909,22 @@ class MongoBase(DictBase, BytesBase):
         return next((document for collection in collections if (document := collection.find_one({'_id': object_id}))), None)
 
     @classmethod
-    def find_one(cls, query: dict = None, sort_keys: str | Iterable[str | tuple[str, int]] = ()) -> MongoBase | None:
-        """Query the collection and return the first match."""
+    def find_one(
+        cls,
+        query: dict = None,
+        sort_keys: str | Iterable[str | tuple[str, int]] = (),
+        fields: Iterable[str] = None,
+        exclude: Iterable[str] = None,
+        raw=False
+    ) -> MongoBase | dict | None:
+        """Query the collection and return the first match (see find)."""
 
-        return next(cls.find(query, sort_keys, lazy=True), None)
+        match query:
+            case {'_id': ObjectId() as object_id, **rest} if not rest and not raw and (identity_map := IdentityMap.current()) is not None:
+                if (object_ := identity_map.get(cls.collection_name, object_id)) is not None:
+                    return object_
+
+        return next(iter(cls.find(query, sort_keys, lazy=True, fields=fields, exclude=exclude, raw=raw)), None)
 
     @classmethod
     def find_one_raw(cls, *args, **kwargs) -> dict | None:
@@ -479,8 +1941,8 @@ class MongoBase(DictBase, BytesBase):
         return cls.collection.find(*args, **kwargs)
 
     @classmethod
-    def from_bytes(cls, bytes_: bytes) -> Any:
-        return cls.from_dict(super().from_bytes(bytes_))
+    def from_bytes(cls, bytes_: bytes | bytearray | memoryview, zero_copy=False) -> Any:
+        return cls.from_dict(super().from_bytes(bytes_, zero_copy))
 
     def get_referenced_objects(self, fields: Iterable[str] = None) -> list[MongoBase]:
         """Returns all referenced objects whose classes inherit from MongoBase."""
@@ -494,7 +1956,7 @@ class MongoBase(DictBase, BytesBase):
             match v:
                 case MongoBase() as obj:
                     referenced_objects.append(obj)
-                case [*_, MongoBase()] as objs:
+                case [*_, MongoBase()] | collections.abc.Set() as objs:
                     referenced_objects.extend(obj for obj in objs if isinstance(obj, MongoBase))
 
         return referenced_objects
@@ -503,6 +1965,7 @@ class MongoBase(DictBase, BytesBase):
     def init_database_attributes(cls, database: pymongo.database.Database):
         """Initializes the attributes needed to connect the object to the database."""
 
+        MongoBase._clear_reference_fields()
         for subclass in MongoBase.subclasses:
             if subclass.collection_name is not None:
                 subclass.database = database
@@ -512,6 +1975,62 @@ class MongoBase(DictBase, BytesBase):
             if isinstance(subclass.nullable_unique_keys, str):
                 subclass.nullable_unique_keys = (subclass.nullable_unique_keys,)
 
+        for subclass in MongoBase.subclasses:
+            try:
+                subclass._get_reference_fields()
+            except NameError:  # forward references not defined yet, they are resolved on the first access
+                pass
+
+    def is_persisted(self) -> bool:
+        """
+        Returns True if the object has been loaded from the database (find/pull_from_database) or saved, and it hasn't
+        been deleted since then.
+        """
+
+        return object.__getattribute__(self, '_database_document') is not None
+
+    @classmethod
+    def migrate_pickled_fields(cls, batch_size: int = 1000) -> int:
+        """
+        Rewrites in bulk the fields of the collection documents that were saved pickled and whose type hints have a
+        MongoCodec now, so they become queryable and indexable. Returns the number of modified documents.
+
+        batch_size: number of documents fetched per cursor batch and of updates per bulk_write.
+        """
+
+        if cls.collection is None:
+            return 0
+
+        fields_plan = cls._get_fields_plan()
+        if not (codec_fields := [k for k, (*_, codec_hint) in fields_plan.items() if codec_hint is not None]):
+            return 0
+
+        data_decoder = cls._get_data_decoder()
+        query = {'$or': [{field_name: {'$type': 'binData'}} for field_name in codec_fields]}
+        n_modified = 0
+        operations = []
+        for document in cls.collection.find(query, dict.fromkeys(codec_fields, True)).batch_size(batch_size):
+            decoded_document = data_decoder(document, True)
+            set_data = {}
+            for k in codec_fields:
+                if k not in document:
+                    continue
+
+                value = _encode_mongo_value(decoded_document[k], fields_plan[k][0], ())
+                if not isinstance(value, bytes) and value != document[k]:
+                    set_data[k] = value
+
+            if set_data:
+                operations.append(pymongo.UpdateOne({'_id': document['_id']}, {'$set': set_data}))
+            if len(operations) >= batch_size:
+                n_modified += cls.collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+
+        if operations:
+            n_modified += cls.collection.bulk_write(operations, ordered=False).modified_count
+
+        return n_modified
+
     @property
     def object_id(self):
         return self._id
@@ -549,91 +2068,243 @@ class MongoBase(DictBase, BytesBase):
                 query[k] = v
 
         if document := self.collection.find_one(query):
-            for database_key, database_value in vars(self.from_dict(document, lazy)).items():
-                self_value = getattr(self, database_key)
-                if (
-                    database_key not in exclude_fields
-                    and
-                    (
-                        database_key in overwrite_fields and database_value is not None
-                        or
-                        self_value is None
-                        or
-                        isinstance(self_value, Iterable) and not self_value
-                    )
-                ):
-                    super().__setattr__(database_key, database_value)
-
-    def resolve(self):
-        """Resolve all the ObjectId references (ObjectId -> MongoBase)."""
-
-        for k in vars(self):
-            getattr(self, k)
+            self._merge_document(document, overwrite_fields, exclude_fields, lazy)
+
+    def resolve(self, fields: Iterable[str] = None):
+        """
+        Resolve all the ObjectId references (ObjectId -> MongoBase).
+
+        fields: specify the fields to resolve. If not, all the fields are resolved.
+        """
+
+        self.resolve_many((self,), fields)
+
+    @staticmethod
+    def resolve_many(objects: Iterable[MongoBase], fields: Iterable[str] = None):
+        """
+        Resolve the ObjectId references (ObjectId -> MongoBase) of all the objects, for example the results of
+        MongoBase.find, making only one query per referenced collection.
+
+        fields: specify the fields to resolve. If not, all the fields are resolved.
+        """
+
+        if fields is not None:
+            fields = set(fields)
+
+        references = []
+        object_ids_by_class = {}
+        for object_ in objects:
+            class_ = type(object_)
+            if class_.database is None:
+                continue
+
+            object_vars = vars(object_)
+            for field_name, (reference_class, list_reference_class) in class_._get_reference_fields().items():
+                if fields is not None and field_name not in fields:
+                    continue
+
+                match object_vars.get(field_name):
+                    case ObjectId() as object_id if reference_class:
+                        object_ids_by_class.setdefault(reference_class, []).append(object_id)
+                        references.append((object_, field_name, reference_class, False))
+                    case [*_, ObjectId()] as object_ids if list_reference_class:
+                        object_ids_by_class.setdefault(list_reference_class, []).extend(object_ids)
+                        references.append((object_, field_name, list_reference_class, True))
+                    case collections.abc.Set() as object_ids if list_reference_class and object_ids and isinstance(next(iter(object_ids)), ObjectId):
+                        object_ids_by_class.setdefault(list_reference_class, []).extend(object_ids)
+                        references.append((object_, field_name, list_reference_class, True))
+
+        found_objects_by_class = {class_: class_.find_by_ids(object_ids) for class_, object_ids in object_ids_by_class.items()}
+
+        for object_, field_name, reference_class, is_list in references:
+            found_objects = found_objects_by_class[reference_class]
+            value = vars(object_)[field_name]
+            if is_list:
+                value = value.__class__(found_objects[object_id] for object_id in value if object_id in found_objects)
+            else:
+                value = found_objects.get(value)
+            super(MongoBase, object_).__setattr__(field_name, value)
 
     def save(
         self,
         fields: Iterable[str] = None,
-        pickle_types: tuple | list = (AbstractSet,),
+        pickle_types: tuple | list = (),
         references=True,
         pull_overwrite_fields: Iterable[str] = ('_id',),
         pull_exclude_fields: Iterable[str] = (),
-        pull_lazy=True
+        pull_lazy=True,
+        pull=True
     ):
         """
         Save (insert or update) the current object in the database.
 
         fields: specify the fields to save. If not, the entire object is saved.
-        pickle_types: specified types are pickled before saving. (AbstractSet,) by default.
+        pickle_types: specified types are pickled before saving instead of being encoded with their MongoCodec.
         references: if it's True (by default), saves the objects without redundancy (MongoBase -> ObjectId).
         pull_overwrite_fields: force overwriting those fields from the database before saving.
         pull_exclude_fields: ignore overwriting those fields from the database before saving.
         pull_lazy: continue pulling elements inside iterables.
+        pull: if it's True (by default), the values of the database are pulled before saving (see pull_from_database).
+        If it's False, the read is skipped and it relies on is_persisted(): new objects are inserted with a single
+        insert_one and persisted ones are updated directly.
         """
 
         if self.collection is None:
             return
 
-        self.pull_from_database(pull_overwrite_fields, pull_exclude_fields, pull_lazy)
+        previous_id = self._id
+        if pull:
+            self.pull_from_database(pull_overwrite_fields, pull_exclude_fields, pull_lazy)
         for referenced_object in self.get_referenced_objects(fields):
-            referenced_object.save(pickle_types=pickle_types, references=references, pull_overwrite_fields=pull_overwrite_fields, pull_exclude_fields=pull_exclude_fields, pull_lazy=pull_lazy)
+            referenced_object.save(pickle_types=pickle_types, references=references, pull_overwrite_fields=pull_overwrite_fields, pull_exclude_fields=pull_exclude_fields, pull_lazy=pull_lazy, pull=pull)
+
+        if not pull and not self.is_persisted():
+            data = {'_id': self._id} | self._get_save_data(fields, pickle_types, references)
+            self.collection.insert_one(data)
+            self._mark_saved({'$set': data})
+        elif update := self._get_save_update(fields, pickle_types, references):
+            self.collection.find_one_and_update({'_id': self._id}, update, upsert=True)
+            self._mark_saved(update)
+
+        if (identity_map := IdentityMap.current()) is not None:
+            if previous_id != self._id:
+                identity_map.discard(self.collection_name, previous_id)
+            identity_map.add(self)
+
+    @staticmethod
+    def save_many(
+        objects: Iterable[MongoBase],
+        fields: Iterable[str] = None,
+        pickle_types: tuple | list = (),
+        references=True,
+        pull_overwrite_fields: Iterable[str] = ('_id',),
+        pull_exclude_fields: Iterable[str] = (),
+        pull_lazy=True,
+        pull=True,
+        ordered=True
+    ) -> list[SaveResult]:
+        """
+        Save (insert or update) many objects in the database with the same semantics as save() but making only one
+        pull query and one bulk_write per collection instead of several round trips per object.
 
-        data = self.to_mongo(pickle_types)
-        if fields is not None:
-            data = {k: v for k, v in data.items() if k in fields}
+        The referenced objects are deduplicated across the batch and saved before the objects that reference them.
 
-        if references:
-            for k, v in data.items():
-                match v:
-                    case {'_id': ObjectId() as object_id}:
-                        data[k] = object_id
-                    case [*_, {'_id': ObjectId()}]:
-                        data[k] = [obj_data['_id'] for obj_data in v]
+        pull: if it's False, the pull queries are skipped and the new objects are written with InsertOne operations
+        (see save).
+        ordered: if it's True (by default), the writes stop at the first error. Otherwise, all the writes are attempted.
 
-        self.collection.find_one_and_update({'_id': self._id}, {'$set': data}, upsert=True)
+        Returns a SaveResult for each object in objects.
+        """
 
-    def to_mongo(self, pickle_types: tuple | list = (AbstractSet,)) -> Any:
-        """Returns the representation of the object as a mongo compatible dictionary."""
+        objects = list(objects)
+        objects_fields = {}
+        heights = {}
+        objects_to_save = {}
+
+        def add_object(object_: MongoBase, fields_: Iterable[str] | None) -> int:
+            if id(object_) in heights:
+                if fields_ is None:
+                    objects_fields[id(object_)] = None
+                return heights[id(object_)]
+
+            heights[id(object_)] = 0
+            objects_fields[id(object_)] = fields_
+            height = 0
+            for referenced_object in object_.get_referenced_objects(fields_):
+                height = max(height, add_object(referenced_object, None) + 1)
+            heights[id(object_)] = height
+            objects_to_save[id(object_)] = object_
+
+            return height
+
+        for object_ in objects:
+            if object_.collection is not None:
+                add_object(object_, None if fields is None else tuple(fields))
+
+        groups: dict[tuple[int, Type[MongoBase]], list[MongoBase]] = {}
+        for object_ in objects_to_save.values():
+            groups.setdefault((heights[id(object_)], type(object_)), []).append(object_)
+        groups = dict(sorted(groups.items(), key=lambda item: item[0][0]))
+
+        identity_map = IdentityMap.current()
+        previous_ids = {id(object_): object_._id for object_ in objects_to_save.values()}
+        canonical_objects = {}
+        for (_, class_), group_objects in groups.items():
+            if pull:
+                class_._pull_many_from_database(group_objects, pull_overwrite_fields, pull_exclude_fields, pull_lazy)
+            for object_ in group_objects:
+                if (canonical_object := canonical_objects.setdefault(object_, object_)) is not object_:
+                    super(MongoBase, object_).__setattr__('_id', canonical_object._id)
+
+        results = {id(object_): SaveResult(object_) for object_ in objects_to_save.values()}
+        for (_, class_), group_objects in groups.items():
+            updated_objects = []
+            operations = []
+            for object_ in group_objects:
+                if not pull and not object_.is_persisted():
+                    data = {'_id': object_._id} | object_._get_save_data(objects_fields[id(object_)], pickle_types, references)
+                    updated_objects.append((object_, {'$set': data}))
+                    operations.append(pymongo.InsertOne(data))
+                elif update := object_._get_save_update(objects_fields[id(object_)], pickle_types, references):
+                    updated_objects.append((object_, update))
+                    operations.append(pymongo.UpdateOne({'_id': object_._id}, update, upsert=True))
+                else:
+                    results[id(object_)].saved = True
+
+            write_errors = {}
+            upserted_ids = {}
+            if operations:
+                try:
+                    upserted_ids = class_.collection.bulk_write(operations, ordered=ordered).upserted_ids
+                except pymongo.errors.BulkWriteError as e:
+                    write_errors = {write_error['index']: write_error for write_error in e.details.get('writeErrors', ())}
+                    upserted_ids = {upserted['index']: upserted['_id'] for upserted in e.details.get('upserted', ())}
+
+            for i, (object_, update) in enumerate(updated_objects):
+                result = results[id(object_)]
+                if i in write_errors:
+                    result.error = write_errors[i]
+                elif not ordered or not write_errors or i < min(write_errors):
+                    result.saved = True
+                    result.inserted = i in upserted_ids or isinstance(operations[i], pymongo.InsertOne)
+                    object_._mark_saved(update)
+
+            if identity_map is not None:
+                for object_ in group_objects:
+                    if results[id(object_)].saved:
+                        if previous_ids[id(object_)] != object_._id:
+                            identity_map.discard(object_.collection_name, previous_ids[id(object_)])
+                        identity_map.add(object_)
+
+            if ordered and write_errors:
+                break
+
+        return [results.get(id(object_)) or SaveResult(object_) for object_ in objects]
+
+    def to_frames(self) -> list[bytes | memoryview]:
+        return _pickle_frames(self.to_dict(), self.OUT_OF_BAND_SIZE)
+
+    def to_mongo(self, pickle_types: tuple | list = (), fields: Iterable[str] = None) -> Any:
+        """
+        Returns the representation of the object as a mongo compatible dictionary.
 
-        def encode_obj(obj_) -> Any:
-            match obj_:
-                case MongoBase() if not isinstance(obj_, pickle_types):
-                    return obj_.to_mongo(pickle_types)
-                case [*_, _] as objs:
-                    return [encode_obj(obj) for obj in objs]
-                case _ if not isinstance(obj_, (NoneType, int, float, str, bool, bytes, Sequence, dict, datetime.date, datetime.datetime, ObjectId)):
-                    return pickle.dumps(obj_)
-                case _:
-                    return obj_
+        pickle_types: specified types are pickled instead of being encoded with their MongoCodec.
+        fields: specify the fields to serialize. If not, the entire object is serialized.
+        """
 
         if not isinstance(mongo_repr := self._mongo_repr(), dict):
             return mongo_repr
 
-        # noinspection DuplicatedCode
-        self_vars = mongo_repr.copy()
-        for k, v in self_vars.items():
-            self_vars[k] = encode_obj(v)
+        if fields is not None:
+            mongo_repr = {k: v for k, v in mongo_repr.items() if k in fields}
 
-        return self_vars
+        try:
+            fields_plan = self._get_fields_plan()
+        except NameError:  # forward references not defined yet, the values are encoded without type hints
+            fields_plan = {}
+
+        pickle_types = tuple(pickle_types)
+        return {k: _encode_mongo_value(v, fields_plan.get(k, (None,))[0], pickle_types) for k, v in mongo_repr.items()}
 
     @property
     def unique_attributes(self):
@@ -664,8 +2335,26 @@ class FrozenDCMongoBase(MongoBase):
     _id: ObjectId = field(kw_only=True, default_factory=ObjectId)
 
 
+@dataclass
+class SaveResult:
+    """Result of saving an object with MongoBase.save_many."""
+
+    object_: MongoBase
+    saved: bool = False
+    inserted: bool = False
+    error: dict = None
+
+
 class REPRBase(DictBase):
-    """Base class for a nicer objects representation."""
+    """
+    Base class for a nicer objects representation.
+
+    The strings and bytes longer than REPR_MAX_SIZE and the collections longer than REPR_MAX_ITEMS are abbreviated, so
+    the cost of the representation doesn't depend on the size of the payloads. Set them to None to show everything.
+    """
+
+    REPR_MAX_ITEMS = 50
+    REPR_MAX_SIZE = 100
 
     def __repr__(self):
         # values = vars(self).values()
@@ -673,7 +2362,10 @@ class REPRBase(DictBase):
         return str(self)
 
     def __str__(self):
-        formatted = pprint.pformat(self.to_dict())
+        if self.REPR_MAX_ITEMS is None or self.REPR_MAX_SIZE is None or not isinstance(dict_repr := self._dict_repr(), dict):
+            formatted = pprint.pformat(self.to_dict())
+        else:
+            formatted = pprint.pformat(_bound_repr_value(dict_repr, self.REPR_MAX_ITEMS, self.REPR_MAX_SIZE))
         return f'{self.__class__.__name__} {formatted[0]}\n {formatted[1:-1]}\n{formatted[-1]}'  # todo1 someday improve the internal objects appearance
 
 
@@ -706,3 +2398,25 @@ class FlanaEnum(JSONBASE, DictBase, CopyBase, BytesBase, Enum):
     @property
     def values(cls) -> list:
         return [element.value for element in cls]
+
+
+MongoCodec.register(
+    datetime.timedelta,
+    lambda timedelta, _type_hint, _encode_inner: timedelta.total_seconds(),
+    lambda seconds, _type_hint, _decode_inner: datetime.timedelta(seconds=seconds)
+)
+MongoCodec.register(
+    Enum,
+    lambda enum_element, _type_hint, encode_inner: encode_inner(enum_element.value, None),
+    lambda value, type_hint, _decode_inner: type_hint(value)
+)
+MongoCodec.register(
+    frozenset,
+    MongoCodec.encode_set_elements,
+    lambda values, type_hint, decode_inner: frozenset(MongoCodec.decode_elements(values, type_hint, decode_inner))
+)
+MongoCodec.register(
+    set,
+    MongoCodec.encode_set_elements,
+    lambda values, type_hint, decode_inner: set(MongoCodec.decode_elements(values, type_hint, decode_inner))
+)
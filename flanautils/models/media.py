@@ -7,7 +7,7 @@ from enum import Enum
 from typing import Any, overload
 
 from flanautils import iterables
-from flanautils.models.bases import FlanaBase
+from flanautils.models.bases import FlanaBase, MongoCodec
 from flanautils.models.enums import MediaType, Source
 
 
@@ -83,3 +83,6 @@ class Media(FlanaBase):
 
     def is_video(self) -> bool:
         return self.type_ is MediaType.VIDEO
+
+
+MongoCodec.register(Media, MongoCodec.encode_document, MongoCodec.decode_document)
@@ -12,7 +12,7 @@ import sympy
 from plotly.io import _html, _kaleido
 
 from flanautils import iterables, oss
-from flanautils.models.bases import FlanaBase
+from flanautils.models.bases import CopyBase, FlanaBase
 
 
 def get_plotlyjs():
@@ -329,3 +329,15 @@ class DateChart(MultiTraceChart):
     """Inherits MultiTraceChart to provide date-dependent state."""
 
     show_now_vertical_line: bool = True
+
+
+def _copy_figure(figure: plotly.graph_objects.Figure, _copy_inner: Callable, _copy_on_write: bool) -> plotly.graph_objects.Figure:
+    """Copies a figure without validating its data again, which is much faster than copy.deepcopy."""
+
+    # noinspection PyArgumentList
+    copied_figure = plotly.graph_objects.Figure(figure.to_dict(), _validate=False)
+    copied_figure._validate = figure._validate
+    return copied_figure
+
+
+CopyBase.register_copier(plotly.graph_objects.Figure, _copy_figure)
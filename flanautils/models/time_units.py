@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 from flanautils import constants, strings
-from flanautils.models.bases import FlanaBase
+from flanautils.models.bases import FlanaBase, MongoCodec
 
 
 def _round_if_close_to_unit(number: float, n_digits: int = 10) -> float:
@@ -164,3 +164,6 @@ class TimeUnits(FlanaBase):
             self_vars['seconds'] = int(self_vars['seconds'])
         words = (f"{v} {translation[k]['singular'] if v == 1 else translation[k]['plural']}" for k, v in self_vars.items() if v)
         return strings.join_last_separator(words, separator, last_separator)
+
+
+MongoCodec.register(TimeUnits, MongoCodec.encode_document, MongoCodec.decode_document)
@@ -92,7 +92,7 @@ async def request(
                             return await response.text()
                     else:
                         return await response.read()
-            except aiohttp.client_exceptions.ClientResponseError, aiohttp.client_exceptions.ServerDisconnectedError:
+            except (aiohttp.client_exceptions.ClientResponseError, aiohttp.client_exceptions.ServerDisconnectedError):
                 if not attempt:
                     raise
                 await asyncio.sleep(1)
@@ -1,5 +1,10 @@
+import collections
+import concurrent.futures
 import datetime
+import functools
+import itertools
 import json
+import math
 import numbers as numbers_module
 import pathlib
 import random
@@ -7,12 +12,117 @@ import re
 import secrets
 import string
 from collections.abc import Iterator
-from typing import Iterable, Type, overload
+from typing import Callable, Iterable, Type, overload
 
 import jellyfish
+import numpy
 import unicodedata
 
 from flanautils import constants, iterables
+from flanautils.data_structures.fuzzy_vocabulary import FuzzyVocabulary
+
+
+def _cartesian_product_string_matching_block(a_words: list[str], b_words: list[str], min_score: float) -> numpy.ndarray:
+    """
+    Returns the matrix of the Jaro-Winkler similarities of the words, with 0 for the ones lower than min_score, without
+    comparing the pairs whose upper bound is lower than min_score.
+
+    The upper bound assumes that all the characters that the words have in common match without transpositions and, if
+    the first characters are the same, that the common prefix is as long as possible.
+    """
+
+    scores = numpy.zeros((len(a_words), len(b_words)))
+    if min_score > 0 and scores.size:
+        a_char_counts, b_char_counts = _char_counts(a_words, b_words)
+        n_matches = numpy.empty(scores.shape)
+        step = max(1, (1 << 22) // (len(b_words) * b_char_counts.shape[1]))
+        for start in range(0, len(a_words), step):
+            n_matches[start:start + step] = numpy.minimum(a_char_counts[start:start + step, None], b_char_counts[None]).sum(axis=2)
+
+        a_lengths = numpy.array([len(word) for word in a_words], dtype=numpy.float64)[:, None]
+        b_lengths = numpy.array([len(word) for word in b_words], dtype=numpy.float64)[None, :]
+        a_first_chars = numpy.array([ord(word[0]) if word else -1 for word in a_words])[:, None]
+        b_first_chars = numpy.array([ord(word[0]) if word else -2 for word in b_words])[None, :]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            jaro = (n_matches / a_lengths + n_matches / b_lengths + 1) / 3
+        max_scores = jaro + (a_first_chars == b_first_chars) * numpy.minimum(4, n_matches) * 0.1 * (1 - jaro)
+        rows, columns = numpy.nonzero((n_matches > 0) & (max_scores >= min_score - 1e-9))
+    else:
+        rows, columns = numpy.indices(scores.shape).reshape(2, -1)
+
+    jaro_winkler_similarity = jellyfish.jaro_winkler_similarity
+    scores[rows, columns] = [jaro_winkler_similarity(a_words[row], b_words[column]) for row, column in zip(rows.tolist(), columns.tolist())]
+    if min_score > 0:
+        scores[scores < min_score] = 0
+    return scores
+
+
+def _char_counts(a_words: list[str], b_words: list[str], n_chars=64) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Returns how many times each word contains each of the n_chars - 1 most common characters of the words, with the
+    rest of the characters counted together in the last column.
+    """
+
+    chars = collections.Counter(itertools.chain.from_iterable(itertools.chain(a_words, b_words))).most_common(n_chars - 1)
+    char_indices = {char: i for i, (char, _) in enumerate(chars)}
+    other_index = len(char_indices)
+
+    char_counts = []
+    for words in (a_words, b_words):
+        counts = numpy.zeros((len(words), other_index + 1), dtype=numpy.int32)
+        for i, word in enumerate(words):
+            for char in word:
+                counts[i, char_indices.get(char, other_index)] += 1
+        char_counts.append(counts)
+    return char_counts[0], char_counts[1]
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_replacements(replacements: tuple[tuple[str, str | None], ...]) -> Callable[[str], str]:
+    """
+    Returns a function that applies the replacements to a text in linear time.
+
+    At every position only the shortest key can match, so the keys with a shorter key as prefix are discarded and the
+    rest are arranged in a trie that is compiled into a regular expression without backtracking.
+    """
+
+    trie = {}
+    for key in sorted((key for key, _ in replacements if isinstance(key, str) and key), key=len):
+        node = trie
+        for char in key:
+            if (child := node.get(char)) is None:
+                child = node[char] = {}
+            elif not child:  # a shorter key ends here
+                break
+            node = child
+
+    if not trie:
+        return lambda text: text
+
+    values = {key: value or '' for key, value in replacements}
+    return functools.partial(re.compile(_trie_to_regex(trie)).sub, lambda match: values[match[0]])
+
+
+@functools.lru_cache(maxsize=32)
+def _fuzzy_vocabulary(words: tuple[str, ...], min_score: float) -> FuzzyVocabulary:
+    return FuzzyVocabulary(words, min_score)
+
+
+def _get_replacer(replacements: dict) -> Callable[[str], str]:
+    try:
+        return _compile_replacements(tuple(replacements.items()))
+    except TypeError:  # unhashable values
+        return _compile_replacements.__wrapped__(tuple(replacements.items()))
+
+
+def _trie_to_regex(trie: dict) -> str:
+    """Returns the regular expression that matches the keys of a trie whose leaves are the ends of the keys."""
+
+    alternatives = [re.escape(char) + _trie_to_regex(child) for char, child in trie.items() if child]
+    if last_chars := [re.escape(char) for char, child in trie.items() if not child]:
+        alternatives.append(last_chars[0] if len(last_chars) == 1 else f"[{''.join(last_chars)}]")
+
+    return alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
 
 
 def cartesian_product_string_matching(a_text: str | Iterable[str], b_text: str | Iterable[str], min_score: float = 0) -> dict[str, dict[str, float]]:
@@ -26,6 +136,52 @@ def cartesian_product_string_matching(a_text: str | Iterable[str], b_text: str |
     return {a_word: matches for a_word in a_words if (matches := {b_word: score for b_word in b_words if (score := jellyfish.jaro_winkler_similarity(a_word, b_word)) >= min_score})}
 
 
+def cartesian_product_string_matching_matrix(a_text: str | Iterable[str], b_text: str | Iterable[str], min_score: float = 0, processes: int = None) -> numpy.ndarray:
+    """
+    Compare between all the strings of the first iterable (rows) with all of the second (columns) and returns a matrix
+    with the scores, with 0 for the ones lower than min_score.
+
+    The pairs that can't reach min_score because of their lengths, characters and first characters aren't compared. If
+    processes is given and there are at least constants.STRING_MATCHING_PROCESS_MIN_PAIRS pairs, the rows are split in
+    blocks that are scored by a pool of processes.
+
+    >>> cartesian_product_string_matching_matrix(['hola', 'adios'], ['hola', 'hora', 'bye'], 0.8).round(2).tolist()
+    [[1.0, 0.87, 0.0], [0.0, 0.0, 0.0]]
+    """
+
+    a_words = a_text.split() if isinstance(a_text, str) else list(a_text)
+    b_words = b_text.split() if isinstance(b_text, str) else list(b_text)
+    if not processes or processes < 2 or len(a_words) < 2 or len(a_words) * len(b_words) < constants.STRING_MATCHING_PROCESS_MIN_PAIRS:
+        return _cartesian_product_string_matching_block(a_words, b_words, min_score)
+
+    block_size = math.ceil(len(a_words) / (4 * processes))
+    a_blocks = [a_words[i:i + block_size] for i in range(0, len(a_words), block_size)]
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        return numpy.concatenate(list(executor.map(_cartesian_product_string_matching_block, a_blocks, itertools.repeat(b_words), itertools.repeat(min_score))))
+
+
+def cartesian_product_string_matching_top_k(a_text: str | Iterable[str], b_text: str | Iterable[str], k: int, min_score: float = 0, processes: int = None) -> dict[str, dict[str, float]]:
+    """
+    Like cartesian_product_string_matching but only with the k best matches of every string of the first iterable, from
+    the best to the worst, computed with cartesian_product_string_matching_matrix.
+
+    >>> cartesian_product_string_matching_top_k('hola adios', ['hola', 'hora', 'bye', 'adio'], 1, 0.8)
+    {'hola': {'hola': 1.0}, 'adios': {'adio': 0.96}}
+    """
+
+    a_words = list(dict.fromkeys(a_text.split() if isinstance(a_text, str) else a_text))
+    b_words = list(dict.fromkeys(b_text.split() if isinstance(b_text, str) else b_text))
+    scores = cartesian_product_string_matching_matrix(a_words, b_words, min_score, processes)
+
+    top_k = {}
+    for a_word, row in zip(a_words, scores):
+        columns = numpy.flatnonzero(row >= min_score)
+        columns = columns[numpy.lexsort((columns, -row[columns]))][:k]
+        if columns.size:
+            top_k[a_word] = {b_words[column]: float(row[column]) for column in columns.tolist()}
+    return top_k
+
+
 @overload
 def cast_number(x: numbers_module.Number, raise_exception=True) -> numbers_module.Number:
     pass
@@ -292,7 +448,9 @@ replace_symbols = remove_symbols
 
 def replace(text: str, replacements: dict) -> str:
     """
-    Returns a copy of text with the replacements applied.
+    Returns a copy of text with the replacements applied. At every position the shortest key that matches is replaced.
+
+    The replacements are compiled into a trie once and cached, so replacing takes linear time in the length of text.
 
     >>> replace('abc.-.', {'.': '*', '-': '<===>'})
     'abc*<===>*'
@@ -303,30 +461,25 @@ def replace(text: str, replacements: dict) -> str:
     if not replacements:
         return text
 
-    result: list[str] = []
+    return _get_replacer(replacements)(text)
 
-    start = 0
-    while start < len(text):
-        pattern: list[str] = []
 
-        for char in text[start:]:
-            pattern.append(char)
-            try:
-                new_value = replacements[''.join(pattern)]
-            except KeyError:
-                pass
-            else:
-                result.append(new_value or '')
-                start += len(pattern)
-                break
-        else:
-            result.append(text[start])
-            start += 1
+translate = replace
 
-    return ''.join(result)
 
+def replace_many(texts: Iterable[str], replacements: dict) -> list[str]:
+    """
+    Returns copies of the texts with the replacements applied (see replace), compiling the replacements only once.
 
-translate = replace
+    >>> replace_many(['hola', 'que ase'], {'a': 'o', 'que': 'k'})
+    ['holo', 'k ose']
+    """
+
+    if not replacements:
+        return list(texts)
+
+    replacer = _get_replacer(replacements)
+    return [replacer(text) for text in texts]
 
 
 @overload
@@ -391,6 +544,7 @@ def text_to_number(text: str, parse_k=True, ignore_no_numbers=True, language='es
 
     if language == 'es':
         number_words_es = constants.NUMBER_WORDS[language]
+        number_words_vocabulary = _fuzzy_vocabulary(tuple(number_words_es.values()), constants.NUMBERS_SCORE_MATCHING)
         text = replace(text, {'y': ' ', 'ç': None})
         text = re.sub(r'(([ei]nt[aeio])|(ec))', r'\1 ', text)
         words = text.lower().split()
@@ -418,15 +572,16 @@ def text_to_number(text: str, parse_k=True, ignore_no_numbers=True, language='es
             if len(word) > constants.TEXT_TO_NUMBER_MAX_WORD_LENGTH:
                 continue
 
-            if word == '+' or jellyfish.jaro_winkler_similarity(word, number_words_es['+']) >= constants.NUMBERS_SCORE_MATCHING:
+            word_matches = number_words_vocabulary.matches(word)
+            if word == '+' or number_words_es['+'] in word_matches:
                 sign = 1
                 continue
-            elif word == '-' or jellyfish.jaro_winkler_similarity(word, number_words_es['-']) >= constants.NUMBERS_SCORE_MATCHING:
+            elif word == '-' or number_words_es['-'] in word_matches:
                 sign = -1
                 continue
 
-            if word_matches := cartesian_product_string_matching(word, number_words_es.values(), constants.NUMBERS_SCORE_MATCHING):
-                number_word = max(word_matches[word].items(), key=lambda item: item[1])[0]
+            if word_matches:
+                number_word = max(word_matches.items(), key=lambda item: item[1])[0]
                 total += sign * number_words_es[number_word]
             elif not ignore_no_numbers:
                 raise KeyError(word)
@@ -453,26 +608,28 @@ def text_to_time(text: str | Iterable[str], language='es') -> datetime.timedelta
     n = 0
 
     if language == 'es':
+        time_units_vocabulary = _fuzzy_vocabulary(constants.TIME_UNITS[language], constants.TIME_UNITS_SCORE_MATCHING)
         for word in words:
-            if jellyfish.jaro_winkler_similarity(word, 'segundo') >= constants.TIME_UNITS_SCORE_MATCHING:
+            word_matches = time_units_vocabulary.matches(word)
+            if 'segundo' in word_matches:
                 delta_time += datetime.timedelta(seconds=n)
                 n = 0
-            elif jellyfish.jaro_winkler_similarity(word, 'minuto') >= constants.TIME_UNITS_SCORE_MATCHING or jellyfish.jaro_winkler_similarity(word, 'min') >= constants.TIME_UNITS_SCORE_MATCHING:
+            elif 'minuto' in word_matches or 'min' in word_matches:
                 delta_time += datetime.timedelta(minutes=n)
                 n = 0
-            elif jellyfish.jaro_winkler_similarity(word, 'hora') >= constants.TIME_UNITS_SCORE_MATCHING:
+            elif 'hora' in word_matches:
                 delta_time += datetime.timedelta(hours=n)
                 n = 0
-            elif jellyfish.jaro_winkler_similarity(word, 'dia') >= constants.TIME_UNITS_SCORE_MATCHING:
+            elif 'dia' in word_matches:
                 delta_time += datetime.timedelta(days=n)
                 n = 0
-            elif jellyfish.jaro_winkler_similarity(word, 'semana') >= constants.TIME_UNITS_SCORE_MATCHING:
+            elif 'semana' in word_matches:
                 delta_time += datetime.timedelta(weeks=n)
                 n = 0
-            elif jellyfish.jaro_winkler_similarity(word, 'mes') >= constants.TIME_UNITS_SCORE_MATCHING:
+            elif 'mes' in word_matches:
                 delta_time += datetime.timedelta(weeks=n * constants.WEEKS_IN_A_MONTH)
                 n = 0
-            elif jellyfish.jaro_winkler_similarity(word, 'año') >= constants.TIME_UNITS_SCORE_MATCHING:
+            elif 'año' in word_matches:
                 delta_time += datetime.timedelta(weeks=n * constants.WEEKS_IN_A_YEAR)
                 n = 0
             else:
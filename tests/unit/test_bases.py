@@ -0,0 +1,196 @@
+import datetime
+import pickle
+import pprint
+import unittest
+from dataclasses import dataclass
+from enum import Enum
+from unittest import mock
+
+from data_structures.bi_dict import BiDict
+from models.bases import BYTES_MAGIC, CopyBase, DCMongoBase, FlanaBase, LazyRepr, MeanBase
+
+
+@dataclass
+class Blob(FlanaBase):
+    name: str = None
+    data: bytes = None
+    buffer: bytearray = None
+    view: memoryview = None
+
+
+@dataclass(eq=False)
+class Document(DCMongoBase):
+    id: int = None
+    data: bytes = None
+
+
+class Color(Enum):
+    RED = 1
+
+
+@dataclass
+class Weather(MeanBase):
+    temperature: float = None
+    humidity: int = None
+    sunrise: datetime.datetime = None
+    duration: datetime.timedelta = None
+
+
+@dataclass(frozen=True)
+class Size:
+    width: int = 0
+    height: int = 0
+
+
+class TestBytesBase(unittest.TestCase):
+    def test_small_values(self):
+        blob = Blob('blob', b'abc', bytearray(b'def'))
+        bytes_ = bytes(blob)
+        self.assertEqual(pickle.dumps(blob, protocol=5), bytes_)
+        self.assertEqual(blob, Blob.from_bytes(bytes_))
+        self.assertEqual(blob, Blob.from_bytes(pickle.dumps(blob)))
+
+    def test_out_of_band(self):
+        data = bytes(range(256)) * 1024
+        blob = Blob('blob', data, bytearray(data), memoryview(data)[::2])
+        frames = blob.to_frames()
+        self.assertTrue(bytes(frames[0]).startswith(BYTES_MAGIC))
+        self.assertIs(data, frames[2].obj)
+        bytes_ = b''.join(frames)
+        self.assertEqual(bytes_, bytes(blob))
+
+        loaded_blob = Blob.from_bytes(memoryview(bytes_))
+        self.assertIs(bytes, type(loaded_blob.data))
+        self.assertEqual(data, loaded_blob.data)
+        self.assertEqual(bytearray(data), loaded_blob.buffer)
+        self.assertEqual(data[::2], loaded_blob.view)
+
+        loaded_blob = Blob.from_bytes(bytes_, zero_copy=True)
+        self.assertIsInstance(loaded_blob.data, memoryview)
+        self.assertIs(bytes_, loaded_blob.data.obj)
+        self.assertTrue(loaded_blob.data.readonly)
+        self.assertEqual(data, loaded_blob.data)
+        self.assertIs(bytearray, type(loaded_blob.buffer))
+
+    def test_mongo_base(self):
+        document = Document(1, bytes(Document.OUT_OF_BAND_SIZE))
+        bytes_ = bytes(document)
+        self.assertTrue(bytes_.startswith(BYTES_MAGIC))
+        loaded_document = Document.from_bytes(bytes_)
+        self.assertEqual(1, loaded_document.id)
+        self.assertEqual(document.data, loaded_document.data)
+
+
+class TestCopyBase(unittest.TestCase):
+    def test_deep_copy(self):
+        data = bytes(1000)
+        blob = Blob('blob', data, bytearray(data))
+        blob.items = [data, [1, 2], {'key': [3]}, (4, [5]), (6, 7), Color.RED, Size(1, 2)]
+        blob.self = blob
+        copied_blob = blob.deep_copy()
+
+        self.assertIsNot(blob, copied_blob)
+        self.assertIs(copied_blob, copied_blob.self)
+        self.assertEqual(vars(blob).keys(), vars(copied_blob).keys())
+        self.assertIs(blob.data, copied_blob.data)
+        self.assertEqual(blob.buffer, copied_blob.buffer)
+        self.assertIsNot(blob.buffer, copied_blob.buffer)
+        self.assertEqual(blob.items, copied_blob.items)
+        for i in (1, 2, 3):
+            self.assertIsNot(blob.items[i], copied_blob.items[i])
+        for i in (0, 4, 5, 6):
+            self.assertIs(blob.items[i], copied_blob.items[i])
+        self.assertIsNot(blob.items[2]['key'], copied_blob.items[2]['key'])
+        self.assertIsNot(blob.items[3][1], copied_blob.items[3][1])
+
+    def test_deep_copy_reduce(self):
+        bi_dict = BiDict({1: 'a', 2: 'b'})
+        blob = Blob(buffer=bytearray(b'abc'))
+        blob.bi_dict = bi_dict
+        blob.document = Document(1)
+        copied_blob = blob.deep_copy()
+
+        self.assertIs(BiDict, type(copied_blob.bi_dict))
+        self.assertEqual(bi_dict, copied_blob.bi_dict)
+        self.assertEqual(bi_dict.inverted, copied_blob.bi_dict.inverted)
+        self.assertIsNot(bi_dict.inverted, copied_blob.bi_dict.inverted)
+        self.assertEqual(blob.document, copied_blob.document)
+        self.assertIsNot(blob.document, copied_blob.document)
+
+    def test_register_copier(self):
+        copier = mock.Mock(side_effect=lambda value, copy_inner, copy_on_write: Size(value.width, copy_inner(value.height)))
+        CopyBase.register_copier(Size, copier)
+        try:
+            blob = Blob()
+            blob.sizes = [Size(1, [2])] * 2
+            copied_blob = blob.deep_copy(copy_on_write=True)
+        finally:
+            del CopyBase._copiers[Size]
+            CopyBase._copy_strategies.clear()
+
+        copier.assert_called_once_with(blob.sizes[0], mock.ANY, True)
+        self.assertIs(copied_blob.sizes[0], copied_blob.sizes[1])
+        self.assertEqual([2], copied_blob.sizes[0].height)
+        self.assertIsNot(blob.sizes[0].height, copied_blob.sizes[0].height)
+        self.assertEqual(['name', 'data', 'buffer', 'view'], list(Blob._get_fields_plan()))
+
+
+class TestMeanBase(unittest.TestCase):
+    def test_mean(self):
+        timezone = datetime.timezone(datetime.timedelta(hours=2))
+        weathers = [
+            Weather(10, 50, datetime.datetime(2022, 1, 1, 8, tzinfo=timezone), datetime.timedelta(hours=1)),
+            Weather(20, None, datetime.datetime(2022, 1, 1, 9, tzinfo=timezone)),
+            None,
+            Weather(30, 70)
+        ]
+
+        self.assertEqual(Weather(20, 60, datetime.datetime(2022, 1, 1, 8, 30, tzinfo=timezone), datetime.timedelta(hours=1)), Weather.mean(weathers, attribute_names=('temperature', 'humidity', 'sunrise', 'duration')))
+        self.assertAlmostEqual(17 / 0.7, Weather.mean(weathers, [0.1, 0.2, 0.3, 0.4], ('temperature',)).temperature)
+        self.assertEqual(Weather(humidity=70), Weather.mean(weathers, [0, 0.5, 0.25, 0.25], ('humidity',)))
+        self.assertEqual(Weather(), Weather.mean([]))
+        self.assertRaises(ValueError, Weather.mean, weathers, [1], ('temperature',))
+
+    def test_mean_many(self):
+        groups = [[Weather(1), Weather(3)], [], [Weather(), Weather(5, 1)], [None]]
+
+        self.assertEqual([Weather(2), Weather(), Weather(5, 1), Weather()], Weather.mean_many(groups, attribute_names=('temperature', 'humidity')))
+        self.assertEqual([Weather(2.5), Weather(), Weather(5), Weather()], Weather.mean_many(groups, [[0.25, 0.75], None, None, None], ('temperature',)))
+        self.assertRaises(ValueError, Weather.mean_many, groups, [None])
+
+
+class TestREPRBase(unittest.TestCase):
+    def test_small_values(self):
+        blob = Blob('blob', b'abc', bytearray(b'def'))
+        blob.items = [1, [2, 3], {'a': Blob('nested')}]
+        blob.document = Document(1, b'data')
+        formatted = pprint.pformat(blob.to_dict())
+
+        self.assertEqual(f'Blob {formatted[0]}\n {formatted[1:-1]}\n{formatted[-1]}', str(blob))
+
+    def test_bounded(self):
+        blob = Blob('x' * 1000, bytes(10 ** 7))
+        blob.items = list(range(1000))
+        blob.nested = Blob(data=bytes(1000))
+        blob.document = Document(1, bytes(1000))
+        text = str(blob)
+
+        self.assertLess(len(text), 2000)
+        self.assertIn(f"'{'x' * 99}... (1000 characters)", text)
+        self.assertIn('... (10000000 bytes)', text)
+        self.assertIn('49,\n           ... (950 more)]', text)
+        self.assertIn("Blob(name=None,\n", text)
+        self.assertIn("{'_id': ObjectId(", text)
+        self.assertEqual(2, text.count('... (1000 bytes)'))
+
+        with mock.patch.multiple(Blob, REPR_MAX_ITEMS=None):
+            self.assertIn('999]', str(blob))
+
+    def test_lazy_repr(self):
+        blob = Blob('blob')
+        with mock.patch.object(Blob, '__str__', return_value='text') as str_mock:
+            lazy_repr = LazyRepr(blob)
+            self.assertEqual(0, str_mock.call_count)
+            self.assertEqual('text', str(lazy_repr))
+            self.assertEqual('text', f'{lazy_repr!r}')
+            self.assertEqual(1, str_mock.call_count)
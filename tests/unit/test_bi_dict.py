@@ -0,0 +1,253 @@
+import asyncio
+import copy
+import operator
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import asyncs
+import constants
+from data_structures.bi_dict import BiDict, ConcurrentBiDict, FrozenBiDict, SharedBiDict
+
+
+def _get_item(mapping, key):
+    return mapping[key]
+
+
+class TestBiDict(unittest.TestCase):
+    def assert_consistent(self, bi_dict: BiDict):
+        self.assertEqual(len(bi_dict), len(bi_dict.inverted))
+        for k, v in bi_dict.items():
+            self.assertEqual(k, bi_dict.inverted[v])
+
+    def test_init(self):
+        bi_dict = BiDict({1: 'a', 2: 'b', 3: 'a'})
+        self.assertEqual({2: 'b', 3: 'a'}, bi_dict)
+        self.assertEqual({'b': 2, 'a': 3}, bi_dict.inverted)
+        self.assertEqual(bi_dict, BiDict.from_pairs([(1, 'a'), (2, 'b'), (3, 'a')]))
+        self.assertEqual(bi_dict, BiDict(bi_dict))
+        self.assertEqual({}, BiDict())
+
+    def test_get(self):
+        bi_dict = BiDict({1: 'a', 2: None})
+        self.assertEqual('a', bi_dict[1])
+        self.assertEqual(1, bi_dict['a'])
+        self.assertEqual(2, bi_dict[None])
+        self.assertRaises(KeyError, bi_dict.__getitem__, 'b')
+        self.assertIsNone(bi_dict.get(2, 'default'))
+        self.assertEqual(2, bi_dict.get(None, 'default'))
+        self.assertEqual('default', bi_dict.get('b', 'default'))
+        self.assertIn('a', bi_dict)
+        self.assertNotIn('b', bi_dict)
+
+    def test_mutators(self):
+        random_ = random.Random(0)
+        bi_dict = BiDict()
+        for _ in range(5000):
+            k = random_.randrange(50)
+            v = str(random_.randrange(50))
+            match random_.randrange(7):
+                case 0:
+                    bi_dict[k] = v
+                    self.assertEqual(v, bi_dict[k])
+                    self.assertEqual(k, bi_dict[v])
+                case 1:
+                    bi_dict.update({k: v, k + 1: v, k + 2: v + 'x'}, z=k)
+                    self.assertNotIn(k, bi_dict.forward)
+                    self.assertEqual(k + 1, bi_dict[v])
+                case 2:
+                    if (item := random_.choice((k, v))) in bi_dict:
+                        del bi_dict[item]
+                        self.assertNotIn(item, bi_dict)
+                    else:
+                        self.assertRaises(KeyError, bi_dict.__delitem__, item)
+                case 3:
+                    expected = bi_dict.get(v)
+                    self.assertEqual(expected, bi_dict.pop(v, None))
+                    self.assertNotIn(v, bi_dict)
+                case 4:
+                    self.assertEqual(bi_dict.get(k, v), bi_dict.setdefault(k, v))
+                case 5:
+                    if bi_dict:
+                        k, v = bi_dict.popitem()
+                        self.assertNotIn(k, bi_dict.forward)
+                        self.assertNotIn(v, bi_dict.inverse)
+                case 6:
+                    bi_dict = bi_dict | {k: v}
+                    self.assertIs(BiDict, type(bi_dict))
+            self.assert_consistent(bi_dict)
+
+        bi_dict.clear()
+        self.assertEqual({}, bi_dict.inverted)
+
+    def test_pickle_and_copy(self):
+        bi_dict = BiDict({1: 'a', 2: 'b'})
+        for copied in (bi_dict.copy(), copy.deepcopy(bi_dict), pickle.loads(pickle.dumps(bi_dict))):
+            self.assertIs(BiDict, type(copied))
+            self.assertEqual(bi_dict, copied)
+            self.assertEqual(bi_dict.inverted, copied.inverted)
+            self.assertIsNot(bi_dict.inverted, copied.inverted)
+
+    def test_views(self):
+        bi_dict = BiDict({1: 'a', 'b': 2})
+        self.assertEqual({1: 'a', 'b': 2}, dict(bi_dict.forward))
+        self.assertEqual({'a': 1, 2: 'b'}, dict(bi_dict.inverse))
+        self.assertEqual('a', bi_dict.forward[1])
+        self.assertRaises(KeyError, bi_dict.forward.__getitem__, 'a')
+        self.assertIsNone(bi_dict.forward.get('a'))
+        self.assertNotIn('a', bi_dict.forward)
+        self.assertEqual(1, bi_dict.inverse['a'])
+        self.assertRaises(KeyError, bi_dict.inverse.__getitem__, 1)
+        self.assertRaises(TypeError, operator.setitem, bi_dict.inverse, 'c', 3)
+        bi_dict[3] = 'c'
+        self.assertEqual('c', bi_dict.forward[3])
+        self.assertEqual(3, bi_dict.inverse['c'])
+
+
+class TestFrozenBiDict(unittest.TestCase):
+    def test_frozen_bi_dict(self):
+        frozen_bi_dict = FrozenBiDict({1: 'a', 2: 'b'})
+        self.assertEqual('a', frozen_bi_dict[1])
+        self.assertEqual(2, frozen_bi_dict['b'])
+        self.assertEqual(hash(FrozenBiDict({2: 'b', 1: 'a'})), hash(frozen_bi_dict))
+        self.assertEqual(1, len({frozen_bi_dict, FrozenBiDict({2: 'b', 1: 'a'})}))
+        self.assertIs(frozen_bi_dict, frozen_bi_dict.copy())
+
+        for operation in (
+            lambda: operator.setitem(frozen_bi_dict, 3, 'c'),
+            lambda: operator.delitem(frozen_bi_dict, 1),
+            lambda: operator.ior(frozen_bi_dict, {3: 'c'}),
+            frozen_bi_dict.clear,
+            lambda: frozen_bi_dict.pop(1),
+            frozen_bi_dict.popitem,
+            lambda: frozen_bi_dict.setdefault(3, 'c'),
+            lambda: frozen_bi_dict.update({3: 'c'})
+        ):
+            self.assertRaises(TypeError, operation)
+        self.assertEqual({1: 'a', 2: 'b'}, frozen_bi_dict)
+
+        for new_frozen_bi_dict in (frozen_bi_dict | {3: 'c'}, {3: 'c'} | frozen_bi_dict, frozen_bi_dict.union({3: 'c'})):
+            self.assertIs(FrozenBiDict, type(new_frozen_bi_dict))
+            self.assertEqual({1: 'a', 2: 'b', 3: 'c'}, new_frozen_bi_dict)
+            self.assertEqual(3, new_frozen_bi_dict['c'])
+
+    def test_intern(self):
+        frozen_bi_dict = FrozenBiDict({'x': 1, 'y': 2})
+        self.assertIs(frozen_bi_dict.intern(), FrozenBiDict({'y': 2, 'x': 1}).intern())
+        unpickled = pickle.loads(pickle.dumps(frozen_bi_dict))
+        self.assertIs(unpickled, pickle.loads(pickle.dumps(FrozenBiDict({'x': 1, 'y': 2}))))
+        self.assertIs(unpickled, frozen_bi_dict.intern())
+        self.assertEqual({1: 'x', 2: 'y'}, unpickled.inverted)
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'number_words')
+            constants.NUMBER_WORDS['es'].save(path)
+            shared_bi_dict = SharedBiDict.open(path)
+            self.assertEqual(constants.NUMBER_WORDS['es'], shared_bi_dict.to_frozen_bi_dict())
+            self.assertEqual(path, shared_bi_dict.name)
+            self.assertEqual(7, asyncio.run(asyncs.run_process(_get_item, shared_bi_dict, 'siete')))
+            self.assertEqual('cien', pickle.loads(pickle.dumps(shared_bi_dict))[100])
+            shared_bi_dict.close()
+            self.assertEqual(0, len(shared_bi_dict))
+
+            with open(path, 'wb') as file:
+                file.write(b'not a table')
+            self.assertRaises(ValueError, SharedBiDict.open, path)
+
+
+class TestConcurrentBiDict(unittest.TestCase):
+    def test_locking_related_stripes_changed(self):
+        bi_dict = ConcurrentBiDict({1: 16})  # the stripes of 1 are 1 and 0 (16 % 16)
+        related_stripes = ConcurrentBiDict._related_stripes
+        calls = []
+
+        def stale_related_stripes(self_, keys):
+            calls.append(keys)
+            return [1] if len(calls) == 1 else related_stripes(self_, keys)
+
+        def try_acquire(stripe: int, results: list[bool]):
+            if acquired := bi_dict._locks[stripe].acquire(blocking=False):
+                bi_dict._locks[stripe].release()
+            results.append(acquired)
+
+        with mock.patch.object(ConcurrentBiDict, '_related_stripes', stale_related_stripes), bi_dict._locking(1):
+            results = []
+            for stripe in (0, 1):
+                thread = threading.Thread(target=try_acquire, args=(stripe, results))
+                thread.start()
+                thread.join()
+            self.assertEqual([False, False], results)
+        self.assertEqual(4, len(calls))  # locks the stale stripes, checks, locks the new ones and checks again
+
+    def test_threads(self):
+        bi_dict = ConcurrentBiDict()
+
+        def work(thread_number: int):
+            for i in range(1000):
+                bi_dict.update({(thread_number, i): f'{thread_number}-{i}'})
+                if i % 2:
+                    bi_dict.pop((thread_number, i - 1))
+                list(bi_dict)
+            with bi_dict.transaction():
+                bi_dict.update({(thread_number, 'first'): thread_number})
+                bi_dict.setdefault((thread_number, 'first'), None)
+
+        threads = [threading.Thread(target=work, args=(thread_number,)) for thread_number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8 * 500 + 8, len(bi_dict))
+        self.assertEqual(len(bi_dict), len(bi_dict.inverted))
+        for k, v in bi_dict.items():
+            self.assertEqual(v, bi_dict[k])
+            self.assertEqual(k, bi_dict[v])
+
+    def test_copy_and_pickle(self):
+        bi_dict = ConcurrentBiDict({1: 'a', 2: 'b'})
+        for copied in (bi_dict.copy(), pickle.loads(pickle.dumps(bi_dict)), bi_dict | {3: 'c'}):
+            self.assertIs(ConcurrentBiDict, copied.__class__)
+            self.assertEqual(1, copied['a'])
+            self.assertEqual('b', copied[2])
+
+
+class TestSharedBiDict(unittest.TestCase):
+    def test_shared_bi_dict(self):
+        bi_dict = BiDict({'a': 1, 2: 'b', (3,): None})
+        with SharedBiDict(bi_dict) as shared_bi_dict:
+            self.assertEqual(dict(bi_dict), dict(shared_bi_dict))
+            self.assertEqual(list(bi_dict), list(shared_bi_dict))
+            for k, v in bi_dict.items():
+                self.assertIn(k, shared_bi_dict)
+                self.assertIn(v, shared_bi_dict)
+                self.assertEqual(v, shared_bi_dict[k])
+                self.assertEqual(k, shared_bi_dict[v])
+            self.assertNotIn('c', shared_bi_dict)
+            self.assertNotIn([], shared_bi_dict)
+            self.assertRaises(KeyError, shared_bi_dict.__getitem__, 'c')
+            self.assertIsNone(shared_bi_dict.get('c'))
+            self.assertEqual(bi_dict, shared_bi_dict.to_bi_dict())
+
+    def test_attach_from_other_process(self):
+        with SharedBiDict(constants.NUMBER_WORDS['es']) as shared_bi_dict:
+            code = f'from flanautils.data_structures.bi_dict import SharedBiDict; SharedBiDict.attach({shared_bi_dict.name!r}).close()'
+            process = subprocess.run((sys.executable, '-c', code), capture_output=True, text=True, env=os.environ | {'PYTHONPATH': os.pathsep.join(sys.path)})
+            self.assertEqual(0, process.returncode, process.stderr)
+            self.assertNotIn('leaked', process.stderr)
+
+            attached_bi_dict = SharedBiDict.attach(shared_bi_dict.name)
+            self.assertEqual(7, attached_bi_dict['siete'])
+            attached_bi_dict.close()
+
+    def test_run_process(self):
+        with SharedBiDict(constants.NUMBER_WORDS['es']) as shared_bi_dict:
+            self.assertEqual(7, asyncio.run(asyncs.run_process(_get_item, shared_bi_dict, 'siete')))
+            self.assertEqual('cien', asyncio.run(asyncs.run_process(_get_item, shared_bi_dict, 100)))
@@ -1,9 +1,38 @@
+import random
 import unittest
 
 import strings
 
 
 class TestFlanaUtils(unittest.TestCase):
+    def test_cartesian_product_string_matching_batch(self):
+        random_ = random.Random(0)
+        for _ in range(100):
+            a_words = [''.join(random_.choices('abcdeo', k=random_.randint(0, 8))) for _ in range(random_.randint(0, 15))]
+            b_words = [''.join(random_.choices('abcdeo', k=random_.randint(0, 8))) for _ in range(random_.randint(0, 15))]
+            min_score = random_.choice((0, 0.5, 0.8, 0.9))
+            k = random_.randint(1, 4)
+            with self.subTest(a_words=a_words, b_words=b_words, min_score=min_score, k=k):
+                expected = strings.cartesian_product_string_matching(a_words, b_words, min_score)
+                scores = strings.cartesian_product_string_matching_matrix(a_words, b_words, min_score)
+                self.assertEqual((len(a_words), len(b_words)), scores.shape)
+                for i, a_word in enumerate(a_words):
+                    for j, b_word in enumerate(b_words):
+                        self.assertEqual(expected.get(a_word, {}).get(b_word, 0), scores[i, j])
+
+                top_k = strings.cartesian_product_string_matching_top_k(a_words, b_words, k, min_score)
+                self.assertEqual(
+                    {a_word: dict(sorted(matches.items(), key=lambda item: -item[1])[:k]) for a_word, matches in expected.items()},
+                    top_k
+                )
+                for matches in top_k.values():
+                    self.assertEqual(sorted(matches.values(), reverse=True), list(matches.values()))
+
+    def test_cartesian_product_string_matching_processes(self):
+        random_ = random.Random(0)
+        words = [''.join(random_.choices('abcdefghijklmno', k=random_.randint(3, 9))) for _ in range(400)]
+        self.assertTrue((strings.cartesian_product_string_matching_matrix(words, words, 0.85) == strings.cartesian_product_string_matching_matrix(words, words, 0.85, processes=2)).all())
+
     def test_replace(self):
         tests_args = [
             ('hola', {}, 'hola'),
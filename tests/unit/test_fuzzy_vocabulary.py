@@ -0,0 +1,38 @@
+import pickle
+import random
+import unittest
+
+import constants
+import strings
+from data_structures.fuzzy_vocabulary import FuzzyVocabulary
+
+
+class TestFuzzyVocabulary(unittest.TestCase):
+    def test_matches(self):
+        random_ = random.Random(0)
+        alphabet = 'abcdeimnostu'
+        for _ in range(200):
+            words = [''.join(random_.choices(alphabet, k=random_.randint(0, 9))) for _ in range(random_.randint(0, 40))]
+            min_score = random_.choice((0, 0.5, 0.8, 0.9, 1))
+            vocabulary = FuzzyVocabulary(words, min_score)
+            for _ in range(20):
+                word = ''.join(random_.choices(alphabet, k=random_.randint(0, 10)))
+                if words and random_.random() < 0.5:
+                    word = random_.choice(words)[:-1] + random_.choice(alphabet)
+                with self.subTest(word=word, words=words, min_score=min_score):
+                    expected = strings.cartesian_product_string_matching([word], words, min_score).get(word, {})
+                    self.assertEqual(list(expected.items()), list(vocabulary.matches(word).items()))
+                    self.assertEqual(max(expected.items(), key=lambda item: item[1])[0] if expected else None, vocabulary.best_match(word))
+
+    def test_number_words(self):
+        vocabulary = FuzzyVocabulary(constants.NUMBER_WORDS['es'].values(), constants.NUMBERS_SCORE_MATCHING)
+        self.assertEqual('cuarenta', vocabulary.best_match('cuarentaa'))
+        self.assertEqual('siete', vocabulary.best_match('siete'))
+        self.assertIsNone(vocabulary.best_match('hola'))
+        self.assertIn('cien', vocabulary)
+        self.assertNotIn('mil', vocabulary)
+        self.assertEqual(len(constants.NUMBER_WORDS['es']), len(vocabulary))
+
+        unpickled = pickle.loads(pickle.dumps(vocabulary))
+        self.assertEqual(vocabulary.words, unpickled.words)
+        self.assertEqual(vocabulary.matches('sieteee'), unpickled.matches('sieteee'))
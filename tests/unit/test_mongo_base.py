@@ -0,0 +1,564 @@
+from __future__ import annotations
+
+import copy
+import datetime
+import itertools
+import json
+import pickle
+import sys
+import threading
+import types
+import unittest
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+from unittest import mock
+
+from bson import ObjectId
+
+try:
+    import mongomock
+except ModuleNotFoundError:
+    mongomock = None
+
+import models.bases
+from models.bases import DCMongoBase, FlanaBase, IdentityMap, MongoBase, MongoCodec
+
+
+@dataclass(eq=False)
+class User(DCMongoBase):
+    collection_name = 'user'
+    unique_keys = 'id'
+
+    id: int = None
+    name: str = None
+
+
+@dataclass(eq=False)
+class Chat(DCMongoBase):
+    collection_name = 'chat'
+    unique_keys = 'id'
+
+    id: int = None
+    owner: User = None
+    users: list[User] = field(default_factory=list)
+
+
+@dataclass(eq=False)
+class Team(DCMongoBase):
+    collection_name = 'team'
+    unique_keys = 'id'
+
+    id: int = None
+    members: set[User] = field(default_factory=set)
+
+
+class Color(Enum):
+    RED = 1
+    GREEN = 2
+
+
+@dataclass
+class Size(FlanaBase):
+    width: int = 0
+    height: int = 0
+    color: Color = None
+
+
+MongoCodec.register(Size, MongoCodec.encode_document, MongoCodec.decode_document)
+
+
+@dataclass(eq=False)
+class Item(DCMongoBase):
+    collection_name = 'item'
+    unique_keys = 'id'
+
+    id: int = None
+    tags: set[str] = field(default_factory=set)
+    colors: list[Color] = field(default_factory=list)
+    color: Color | None = None
+    duration: datetime.timedelta = None
+    size: Size = None
+    extra: Any = None
+
+
+@dataclass
+class Parcel(FlanaBase):
+    id: ObjectId = None
+    tags: set[str] = field(default_factory=set)
+    colors: list[Color] = field(default_factory=list)
+    sent: datetime.datetime = None
+    duration: datetime.timedelta = None
+    size: Size = None
+    extra: Any = None
+    labels: dict[str, str] = field(default_factory=dict)
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class TestMongoBase(unittest.TestCase):
+    def setUp(self):
+        self.database = mongomock.MongoClient(tz_aware=True)['test']
+        MongoBase.init_database_attributes(self.database)
+
+    def tearDown(self):
+        for subclass in MongoBase.subclasses:
+            subclass.database = None
+            subclass.collection = None
+
+    def test_reference_fields(self):
+        self.assertEqual({'owner': (User, None), 'users': (None, User)}, Chat._get_reference_fields())
+        self.assertEqual({}, User._get_reference_fields())
+        self.assertIs(Chat._get_reference_fields(), Chat._get_reference_fields())
+
+    def test_reference_fields_redefinition(self):
+        source = (
+            'from __future__ import annotations\n'
+            'from models.bases import MongoBase\n'
+            'class Member(MongoBase):\n'
+            '    pass\n'
+            'class Group(MongoBase):\n'
+            '    members: list[Member] = []\n'
+        )
+        module = types.ModuleType('redefinition')
+        sys.modules[module.__name__] = module
+        exec(source, module.__dict__)
+        old_namespace = module.__dict__.copy()
+        old_reference_fields = old_namespace['Group']._get_reference_fields()
+        new_namespace = module.__dict__
+        try:
+            exec(source, new_namespace)
+            self.assertNotIn(old_namespace['Member'], MongoBase.subclasses)
+            self.assertNotIn('_reference_fields', old_namespace['Group'].__dict__)
+            self.assertIs(old_namespace['Member'], old_reference_fields['members'][1])
+            self.assertIs(new_namespace['Member'], new_namespace['Group']._get_reference_fields()['members'][1])
+        finally:
+            MongoBase.subclasses.remove(new_namespace['Member'])
+            MongoBase.subclasses.remove(new_namespace['Group'])
+            del sys.modules[module.__name__]
+
+    def test_dict_codec(self):
+        users = [User(id=i, name=f'user_{i}') for i in range(3)]
+        chat = Chat(id=1, owner=users[0], users=users)
+        data = chat.to_dict(pickle_types=(int,))
+        self.assertEqual(pickle.dumps(1), data['id'])
+        self.assertEqual([pickle.dumps(i) for i in range(3)], [user_data['id'] for user_data in data['users']])
+
+        lazy_chat = Chat.from_dict(data)
+        self.assertEqual(1, lazy_chat.id)
+        self.assertEqual(data['owner'], vars(lazy_chat)['owner'])
+        self.assertIs(Chat._get_data_decoder(), Chat._get_data_decoder())
+
+        loaded_chat = Chat.from_dict(data, lazy=False)
+        self.assertEqual(chat, loaded_chat)
+        self.assertEqual(users, vars(loaded_chat)['users'])
+        self.assertEqual('user_2', vars(loaded_chat)['users'][2].name)
+
+        self.assertIn('id_1', User.collection.index_information())
+        with mock.patch.object(User.collection, 'create_index', wraps=User.collection.create_index) as create_index_mock:
+            User.from_dict({'id': 1, 'name': 'user_1'})
+            User(id=2)
+            self.assertEqual(0, create_index_mock.call_count)
+
+    def test_mongo_codecs(self):
+        item = Item(1, {'a', 'b'}, [Color.RED, Color.GREEN], Color.GREEN, datetime.timedelta(minutes=1.5), Size(1, 2, Color.RED), {1, 2})
+        item.save()
+
+        document = Item.collection.find_one({'id': 1})
+        self.assertEqual(['a', 'b'], document['tags'])
+        self.assertEqual([1, 2], document['colors'])
+        self.assertEqual(2, document['color'])
+        self.assertEqual(90, document['duration'])
+        self.assertEqual({'width': 1, 'height': 2, 'color': 1}, document['size'])
+        self.assertIsInstance(document['extra'], bytes)
+
+        self.assertEqual(item, Item.find_one({'tags': 'a', 'size.color': 1}))
+        loaded_item = Item.find_one({'id': 1})
+        self.assertEqual({'a', 'b'}, loaded_item.tags)
+        self.assertEqual([Color.RED, Color.GREEN], loaded_item.colors)
+        self.assertIs(Color.GREEN, loaded_item.color)
+        self.assertEqual(datetime.timedelta(minutes=1.5), loaded_item.duration)
+        self.assertEqual(Size(1, 2, Color.RED), loaded_item.size)
+        self.assertEqual({1, 2}, loaded_item.extra)
+
+        loaded_item.save()
+        self.assertEqual(document, Item.collection.find_one({'id': 1}))
+
+    def test_typed_json(self):
+        parcel = Parcel(ObjectId(), {'a'}, [Color.RED], datetime.datetime(2022, 1, 2, 3, 4), datetime.timedelta(minutes=1.5), Size(1, 2, Color.RED), {'set': {1}, 'id': ObjectId(), 'c': 1 + 2j})
+        for orjson in (models.bases.orjson, None):
+            with self.subTest(orjson=orjson), mock.patch('models.bases.orjson', orjson):
+                text = parcel.to_typed_json()
+                data = json.loads(text)
+                self.assertEqual(str(parcel.id), data['id'])
+                self.assertEqual(['a'], data['tags'])
+                self.assertEqual([1], data['colors'])
+                self.assertEqual('2022-01-02T03:04:00', data['sent'])
+                self.assertEqual(90, data['duration'])
+                self.assertEqual({'width': 1, 'height': 2, 'color': 1}, data['size'])
+                self.assertEqual({'__type__': 'builtins:set', 'value': [1]}, data['extra']['set'])
+                self.assertIn('__pickle__', data['extra']['c'])
+
+                self.assertEqual(parcel, Parcel.from_typed_json(text))
+
+                for labels in ({'__pickle__': 'abc'}, {'__type__': 'os:system', 'value': 'x'}):
+                    with self.subTest(labels=labels):
+                        parcel_with_labels = Parcel(labels=labels)
+                        self.assertEqual(parcel_with_labels, Parcel.from_typed_json(parcel_with_labels.to_typed_json()))
+
+    def test_migrate_pickled_fields(self):
+        Item.collection.insert_many([
+            {'id': i, 'tags': pickle.dumps({'x'}), 'colors': [pickle.dumps(Color.RED)], 'duration': pickle.dumps(datetime.timedelta(days=1)), 'extra': pickle.dumps({3})}
+            for i in range(3)
+        ])
+        Item(3, {'y'}).save()
+
+        with mock.patch.object(Item.collection, 'bulk_write', wraps=Item.collection.bulk_write) as bulk_write_mock:
+            self.assertEqual(3, Item.migrate_pickled_fields(batch_size=2))
+            self.assertEqual(2, bulk_write_mock.call_count)
+        self.assertEqual(0, Item.migrate_pickled_fields())
+
+        document = Item.collection.find_one({'id': 0})
+        self.assertEqual(['x'], document['tags'])
+        self.assertEqual([1], document['colors'])
+        self.assertEqual(86400, document['duration'])
+        self.assertEqual(pickle.dumps({3}), document['extra'])
+        self.assertEqual(3, len(Item.find({'tags': 'x'})))
+        self.assertEqual({3}, Item.find_one({'id': 0}).extra)
+
+    def test_resolve_references(self):
+        users = [User(id=i, name=f'user_{i}') for i in range(3)]
+        chat = Chat(id=1, owner=users[0], users=users)
+        chat.save()
+
+        loaded_chat = Chat.find_one({'id': 1})
+        self.assertEqual(users[0], loaded_chat.owner)
+        self.assertEqual(users, loaded_chat.users)
+        self.assertEqual('user_2', loaded_chat.users[2].name)
+
+    def test_resolve_set_references(self):
+        users = {User(id=i, name=f'user_{i}') for i in range(3)}
+        Team(id=1, members=users).save()
+        self.assertEqual(3, len(User.find()))
+        self.assertEqual(sorted(user._id for user in users), sorted(Team.collection.find_one()['members']))
+
+        team = Team.find_one({'id': 1})
+        self.assertEqual(users, team.members)
+        self.assertTrue(all(isinstance(user, User) for user in team.members))
+
+        team = Team.find_one({'id': 1})
+        MongoBase.resolve_many((team,))
+        self.assertIsInstance(vars(team)['members'], set)
+        self.assertEqual(users, vars(team)['members'])
+
+    def test_resolve_references_batched(self):
+        users = [User(id=i, name=f'user_{i}') for i in range(5)]
+        Chat(id=1, owner=users[4], users=users).save()
+        Chat(id=2, owner=users[0], users=users[3:0:-1]).save()
+        users[2].delete()
+
+        with mock.patch.object(User.collection, 'find', wraps=User.collection.find) as find_mock:
+            self.assertEqual([users[0], users[1], users[3], users[4]], Chat.find_one({'id': 1}).users)
+            self.assertEqual(1, find_mock.call_count)
+
+        chats = Chat.find(sort_keys='id')
+        with mock.patch.object(User.collection, 'find', wraps=User.collection.find) as find_mock:
+            MongoBase.resolve_many(chats)
+            self.assertEqual(1, find_mock.call_count)
+        self.assertEqual(users[4], vars(chats[0])['owner'])
+        self.assertEqual([users[3], users[1]], vars(chats[1])['users'])
+
+        chat = Chat.find_one({'id': 1})
+        chat.resolve(fields=('owner',))
+        self.assertIsInstance(vars(chat)['owner'], User)
+        self.assertIsInstance(vars(chat)['users'][0], ObjectId)
+
+    def test_identity_map(self):
+        users = [User(id=i, name=f'user_{i}') for i in range(3)]
+        Chat(id=1, owner=users[0], users=users).save()
+        Chat(id=2, owner=users[0], users=users[:2]).save()
+
+        chat_1, chat_2 = Chat.find(sort_keys='id')
+        self.assertIsNot(chat_1.owner, chat_2.owner)
+
+        with IdentityMap(max_size=10) as identity_map:
+            chat_1, chat_2 = Chat.find(sort_keys='id')
+            self.assertIs(chat_1.owner, chat_2.owner)
+            with mock.patch.object(User.collection, 'find', wraps=User.collection.find) as find_mock:
+                self.assertIs(chat_1.owner, chat_2.users[0])
+                self.assertIs(chat_1.users[1], chat_2.users[1])
+                self.assertIs(chat_1.owner, User.find_one({'_id': users[0]._id}))
+                self.assertEqual(2, find_mock.call_count)
+            self.assertIs(chat_1, Chat.find_one({'id': 1}))
+
+            user = User(id=5, name='user_5')
+            user.save()
+            self.assertIs(user, User.find_one({'id': 5}))
+            user.delete()
+            self.assertNotIn(('user', user._id), identity_map)
+            self.assertIsNone(User.find_one({'_id': user._id}))
+
+        self.assertIsNone(IdentityMap.current())
+
+    def test_find_by_ids_generator(self):
+        users = [User(id=i) for i in range(3)]
+        MongoBase.save_many(users)
+
+        self.assertEqual(users, list(User.find_by_ids(user._id for user in users).values()))
+        with IdentityMap():
+            User.find_one({'id': 0})
+            self.assertEqual(users, list(User.find_by_ids(user._id for user in users).values()))
+
+    def test_identity_map_save(self):
+        with IdentityMap() as identity_map:
+            user = User(id=1, name='user_1')
+            user.save()
+            self.assertIn(('user', user._id), identity_map)
+            self.assertIs(user, User.find_one({'id': 1}))
+            self.assertIs(user, User.find_one({'_id': user._id}))
+
+        with IdentityMap() as identity_map:
+            users = [User(id=i) for i in range(2, 4)]
+            MongoBase.save_many(users)
+            self.assertEqual(2, len(identity_map))
+            self.assertIs(users[0], User.find_one({'id': 2}))
+
+    def test_identity_map_max_size(self):
+        users = [User(id=i) for i in range(5)]
+        for user in users:
+            user.save()
+
+        with IdentityMap(max_size=3) as identity_map:
+            User.find()
+            self.assertEqual(3, len(identity_map))
+            self.assertNotIn(('user', users[0]._id), identity_map)
+            self.assertIn(('user', users[4]._id), identity_map)
+
+    def test_save_many(self):
+        User(id=0, name='old_name').save()
+        users = [User(id=i) for i in range(3)]
+        chats = [Chat(id=i, owner=users[i % 3], users=users) for i in range(10)]
+
+        with (
+            mock.patch.object(User.collection, 'find', wraps=User.collection.find) as user_find_mock,
+            mock.patch.object(User.collection, 'bulk_write', wraps=User.collection.bulk_write) as user_bulk_write_mock,
+            mock.patch.object(Chat.collection, 'bulk_write', wraps=Chat.collection.bulk_write) as chat_bulk_write_mock
+        ):
+            results = MongoBase.save_many(chats)
+            self.assertEqual(1, user_find_mock.call_count)
+            self.assertEqual(1, user_bulk_write_mock.call_count)
+            self.assertEqual(1, chat_bulk_write_mock.call_count)
+            self.assertEqual(2, len(user_bulk_write_mock.call_args.args[0]))  # users[0] hasn't changed after the pull
+
+        self.assertEqual([chat._id for chat in chats], [result.object_._id for result in results])
+        self.assertTrue(all(result.saved and result.inserted and result.error is None for result in results))
+        self.assertEqual('old_name', users[0].name)
+        self.assertEqual(3, len(User.find()))
+        self.assertEqual(users, Chat.find_one({'id': 4}).users)
+
+        chats[0].users = users[:1]
+        results = MongoBase.save_many(chats[:1])
+        self.assertTrue(results[0].saved)
+        self.assertFalse(results[0].inserted)
+        self.assertEqual(users[:1], Chat.find_one({'id': 0}).users)
+
+    def test_save_many_errors(self):
+        User.collection.create_index('name', unique=True)
+        users = [User(id=0, name='a'), User(id=1, name='a'), User(id=2, name='b')]
+
+        results = MongoBase.save_many(users)
+        self.assertEqual([True, False, False], [result.saved for result in results])
+        self.assertIsNotNone(results[1].error)
+        self.assertIsNone(results[2].error)
+
+        User.collection.delete_many({})
+        users = [User(id=0, name='a'), User(id=1, name='a'), User(id=2, name='b')]
+        results = MongoBase.save_many(users, ordered=False)
+        self.assertEqual([True, False, True], [result.saved for result in results])
+        self.assertIsNotNone(results[1].error)
+
+    def test_modified_fields(self):
+        users = [User(id=i, name=f'user_{i}') for i in range(3)]
+        Chat(id=1, owner=users[0], users=users[:2]).save()
+
+        chat = Chat.find_one({'id': 1})
+        with mock.patch.object(Chat.collection, 'find_one_and_update', wraps=Chat.collection.find_one_and_update) as update_mock:
+            chat.save()
+            self.assertEqual(0, update_mock.call_count)
+
+            chat.id = 2
+            chat.save()
+            self.assertEqual({'$set': {'id': 2}}, update_mock.call_args.args[1])
+
+            chat.users.append(users[2])
+            chat.save()
+            self.assertEqual({'$set': {'users': [user._id for user in users]}}, update_mock.call_args.args[1])
+
+            chat.save()
+            self.assertEqual(2, update_mock.call_count)
+
+            del chat.owner
+            chat.save(pull_exclude_fields=('owner',))
+            self.assertEqual({'$unset': {'owner': ''}}, update_mock.call_args.args[1])
+
+        self.assertEqual({'_id': chat._id, 'id': 2, 'users': [user._id for user in users]}, Chat.collection.find_one())
+        self.assertNotIn('_database_document', vars(chat))
+
+        chat = Chat.find_one({'id': 2})
+        with mock.patch.object(Chat, '_mongo_repr', lambda self: {k: v for k, v in vars(self).items() if k != 'users'}):
+            chat.id = 3
+            chat.save()
+        self.assertEqual({'_id': chat._id, 'id': 3, 'owner': None, 'users': [user._id for user in users]}, Chat.collection.find_one())
+
+    def test_copy_tracks_own_changes(self):
+        User(id=1, name='user_1').save()
+        for copy_function in (copy.copy, copy.deepcopy, lambda user_: pickle.loads(pickle.dumps(user_))):
+            with self.subTest(copy_function=copy_function):
+                user = User.find_one({'id': 1}, fields=('id',))
+                copied_user = copy_function(user)
+                self.assertTrue(copied_user.is_persisted())
+                copied_user.id = 2
+                self.assertEqual('user_1', copied_user.name)
+                self.assertEqual(set(), object.__getattribute__(user, '_modified_fields'))
+                self.assertEqual({'_id': user._id, 'id': 1}, object.__getattribute__(user, '_database_document'))
+                self.assertEqual('user_1', user.name)
+                self.assertEqual({'$set': {'id': 2}}, copied_user._get_save_update(None, (), True))
+
+    def test_save_without_pull(self):
+        users = [User(id=i) for i in range(2)]
+        chat = Chat(id=1, owner=users[0], users=users)
+        self.assertFalse(chat.is_persisted())
+
+        with (
+            mock.patch.object(MongoBase, 'pull_from_database') as pull_mock,
+            mock.patch.object(Chat.collection, 'insert_one', wraps=Chat.collection.insert_one) as insert_mock,
+            mock.patch.object(Chat.collection, 'find_one_and_update', wraps=Chat.collection.find_one_and_update) as update_mock
+        ):
+            chat.save(pull=False)
+            self.assertTrue(chat.is_persisted())
+            self.assertTrue(users[0].is_persisted())
+            self.assertEqual(1, insert_mock.call_count)
+
+            chat.id = 2
+            chat.save(pull=False)
+            self.assertEqual(1, update_mock.call_count)
+            self.assertEqual(0, pull_mock.call_count)
+
+        loaded_chat = Chat.find_one({'id': 2})
+        self.assertTrue(loaded_chat.is_persisted())
+        self.assertEqual(users, loaded_chat.users)
+        loaded_chat.delete()
+        self.assertFalse(loaded_chat.is_persisted())
+
+        results = MongoBase.save_many([Chat(id=3, users=[User(id=5)]), loaded_chat], pull=False)
+        self.assertTrue(all(result.saved and result.inserted for result in results))
+        self.assertEqual(2, len(Chat.find()))
+
+        user = User(id=6, name='user_6')
+        user.save(fields=('name',), pull=False)
+        user.save()
+        self.assertEqual([{'_id': user._id, 'name': 'user_6', 'id': 6}], list(User.find_raw({'name': 'user_6'})))
+
+        users = [User(id=i, name=f'user_{i}') for i in range(7, 9)]
+        MongoBase.save_many(users, fields=('name',), pull=False)
+        MongoBase.save_many(users)
+        self.assertEqual([user._id for user in users], [document['_id'] for document in User.find_raw({'id': {'$in': [7, 8]}})])
+
+    def test_save_copy_not_persisted(self):
+        user = User(id=1, name='user_1')
+        for copied_user in (User.from_bytes(bytes(user)), User.from_dict(user.to_dict())):
+            self.assertFalse(copied_user.is_persisted())
+
+        copied_user = User.from_bytes(bytes(user))
+        copied_user.save()
+        self.assertTrue(copied_user.is_persisted())
+        self.assertEqual({'_id': user._id, 'id': 1, 'name': 'user_1'}, User.collection.find_one())
+
+        user.name = 'new_name'
+        user.save()
+        self.assertTrue(user.is_persisted())
+        self.assertEqual({'_id': user._id, 'id': 1, 'name': 'new_name'}, User.collection.find_one())
+
+    def test_find_projection(self):
+        users = [User(id=i, name=f'user_{i}') for i in range(2)]
+        Chat(id=1, owner=users[0], users=users).save()
+        Chat(id=2, owner=users[1], users=users).save()
+
+        self.assertEqual([{'_id': users[0]._id, 'id': 0}, {'_id': users[1]._id, 'id': 1}], User.find(sort_keys='id', fields=('id',), raw=True))
+        self.assertEqual({'id': 2}, Chat.find_one({'id': 2}, exclude=('_id', 'owner', 'users'), raw=True))
+        self.assertRaises(ValueError, Chat.find, fields=('id',), exclude=('users',))
+
+        chat = Chat.find_one({'id': 1}, exclude=('users',))
+        self.assertEqual([], vars(chat)['users'])
+        with mock.patch.object(Chat.collection, 'find_one', wraps=Chat.collection.find_one) as find_one_mock:
+            self.assertEqual(users, chat.users)
+            self.assertEqual(users, chat.users)
+            self.assertEqual(1, find_one_mock.call_count)
+
+        user = User.find_one({'id': 0}, fields=('id',))
+        self.assertIsNone(vars(user)['name'])
+        with mock.patch.object(User.collection, 'find_one_and_update', wraps=User.collection.find_one_and_update) as update_mock:
+            user.id = 10
+            user.save()
+            self.assertEqual({'$set': {'id': 10}}, update_mock.call_args.args[1])
+        self.assertEqual('user_0', user.name)
+        self.assertEqual({'_id': user._id, 'id': 10, 'name': 'user_0'}, User.find_one_raw({'_id': user._id}))
+
+    def test_find_decode_workers(self):
+        users = [User(id=i, name=f'user_{i}') for i in range(300)]
+        MongoBase.save_many(users)
+
+        self.assertEqual(users, User.find(sort_keys='id', batch_size=64))
+        self.assertEqual(users, User.find(sort_keys='id', batch_size=64, decode_workers=4))
+        self.assertEqual(users[:10], list(itertools.islice(User.find(sort_keys='id', lazy=True, batch_size=3, decode_workers=2), 10)))
+        self.assertEqual(users, User.find(sort_keys='id', batch_size=64, decode_workers=2, decode_processes=True))
+        self.assertTrue(all(user.is_persisted() for user in User.find(decode_workers=2, decode_processes=True)))
+
+        del User._indexed_collection  # the decoding processes would create the index again if they used the collection
+        with mock.patch.object(User.collection, 'create_index', side_effect=AssertionError('the collection was used in a decoding process')):
+            self.assertEqual(users, User.find(sort_keys='id', batch_size=64, decode_workers=2, decode_processes=True))
+
+        n_threads = threading.active_count()
+        users_iterator = User.find(sort_keys='id', lazy=True, batch_size=3, decode_workers=2)
+        self.assertEqual(users[0], next(users_iterator))
+        self.assertLess(n_threads, threading.active_count())
+        users_iterator.close()
+        self.assertEqual(n_threads, threading.active_count())
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class TestAsyncMongoBase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.database = mongomock.MongoClient(tz_aware=True)['test']
+        MongoBase.init_database_attributes(self.database)
+
+    def tearDown(self):
+        for subclass in MongoBase.subclasses:
+            subclass.database = None
+            subclass.collection = None
+
+    async def test_async_api(self):
+        users = [User(id=i, name=f'user_{i}') for i in range(250)]
+        results = await MongoBase.asave_many(users)
+        self.assertTrue(all(result.saved for result in results))
+        chat = Chat(id=1, owner=users[0], users=users[:3])
+        await chat.asave()
+
+        self.assertEqual(250, len(await User.afind()))
+        self.assertEqual(users, [user async for user in await User.afind(sort_keys='id', lazy=True)])
+        self.assertEqual(users[5], await User.afind_one({'id': 5}))
+
+        n_threads = threading.active_count()
+        users_iterator = await User.afind(sort_keys='id', lazy=True, batch_size=3, decode_workers=2)
+        async for user in users_iterator:
+            self.assertEqual(users[0], user)
+            break
+        await users_iterator.aclose()
+        self.assertEqual(n_threads, threading.active_count())
+
+        loaded_chat = await Chat.afind_one({'id': 1})
+        await loaded_chat.aresolve()
+        self.assertIsInstance(vars(loaded_chat)['owner'], User)
+        self.assertEqual(users[:3], vars(loaded_chat)['users'])
+
+        await loaded_chat.adelete()
+        self.assertIsNone(await Chat.afind_one({'id': 1}))
@@ -1,13 +1,17 @@
 import itertools
+import json
+import pickle
 import random
+import threading
 import unittest
 from collections.abc import Callable
 from typing import Iterable
+from unittest import mock
 
 import iterables
 import strings
 import test_utils
-from data_structures.ordered_set import OrderedSet
+from data_structures.ordered_set import CompactOrderedSet, ConcurrentOrderedSet, IndexedOrderedSet, OrderedSet, SharedOrderedSet
 from functions import repeat
 
 REPEAT_TIMES = 500
@@ -351,6 +355,23 @@ class TestOrderedSet(unittest.TestCase):
         self.assertEqual(s1, s1_copy)
         self.assertIsNot(s1, s1_copy)
 
+    @repeat(REPEAT_TIMES)
+    def test_deep_copy(self):
+        elements = test_utils.random_collections(random.randint(0, 5))
+        for copy_on_write in (False, True):
+            with self.subTest(copy_on_write=copy_on_write):
+                s1 = OrderedSet(*elements)
+                s1_copy = s1.deep_copy(copy_on_write)
+                self.assertEqual(s1, s1_copy)
+                self.assertIsNot(s1, s1_copy)
+
+                expected_elements = list(s1)
+                s1_copy.add(object())
+                s1_copy.discard(next(iter(s1), None))
+                self.assertEqual(expected_elements, list(s1))
+                s1.add('new')
+                self.assertNotIn('new', s1_copy)
+
     @repeat(REPEAT_TIMES)
     def test_discard(self):
         elements = test_utils.random_collections(random.randint(0, 5))
@@ -525,6 +546,22 @@ class TestOrderedSet(unittest.TestCase):
         s1.symmetric_difference_update(s2)
         self.assertEqual(expected_elements, list(s1))
 
+    def test_updates_with_several_arguments(self):
+        s1 = OrderedSet(1, 2, 3, 4, 5, 6)
+        s1.difference_update([1, [2]], (6,), 'a')
+        self.assertEqual([2, 3, 4, 5], list(s1))
+
+        s1.intersection_update([2, 3, 4, [5]], {3, 4, 5})
+        self.assertEqual([3, 4], list(s1))
+
+        s1.symmetric_difference_update([4, 7], (7, 8))
+        self.assertEqual([3, 8], list(s1))
+
+        s2 = s1.deep_copy(copy_on_write=True)
+        s2.clear()
+        self.assertEqual([3, 8], list(s1))
+        self.assertEqual([], list(s2))
+
     @repeat(REPEAT_TIMES)
     def test_union_union_update_update(self):
         elements_s1 = test_utils.random_collections(random.randint(0, 5))
@@ -542,3 +579,199 @@ class TestOrderedSet(unittest.TestCase):
         s1 = OrderedSet(*elements_s1)
         s1.update(s2)
         self.assertEqual(expected_elements, list(s1))
+
+
+class TestIndexedOrderedSet(TestOrderedSet):
+    def setUp(self):
+        for patcher in (mock.patch.dict(globals(), OrderedSet=IndexedOrderedSet), mock.patch.object(IndexedOrderedSet, 'BLOCK_SIZE', 2)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @repeat(20)
+    def test_positional_operations(self):
+        elements = list(range(random.randint(0, 50)))
+        random.shuffle(elements)
+        s1 = IndexedOrderedSet(elements)
+        for _ in range(200):
+            if (operation := random.random()) < 0.3:
+                i = random.randint(-len(elements) - 5, len(elements) + 5)
+                element = random.randint(0, 100)
+                if element not in elements:
+                    elements.insert(i, element)
+                s1.insert(i, element)
+            elif operation < 0.5 and elements:
+                i = random.randint(-len(elements), len(elements) - 1)
+                self.assertEqual(elements.pop(i), s1.pop(i))
+            elif operation < 0.7:
+                element = random.randint(0, 100)
+                if element in elements:
+                    elements.remove(element)
+                s1.discard(element)
+            else:
+                element = random.randint(0, 100)
+                s1.add(element)
+                if element not in elements:
+                    elements.append(element)
+
+            self.assertEqual(elements, list(s1))
+            self.assertEqual(elements[::-1], list(reversed(s1)))
+            for i, element in enumerate(elements):
+                self.assertEqual(element, s1[i])
+                self.assertEqual(i, s1.index(element))
+
+
+class TestCompactOrderedSet(unittest.TestCase):
+    @staticmethod
+    def _random_elements(kind: type, k: int) -> list:
+        if kind is int:
+            return [random.randint(-30, 30) for _ in range(k)]
+        return [strings.random_string(0, 2) for _ in range(k)]
+
+    def setUp(self):
+        patcher = mock.patch.object(CompactOrderedSet, 'PENDING_SIZE', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @repeat(50)
+    def test_operations_like_ordered_set(self):
+        kind = random.choice((int, str))
+        elements = self._random_elements(kind, random.randint(0, 40))
+        s1 = CompactOrderedSet(elements)
+        expected = OrderedSet(elements)
+        for _ in range(100):
+            other = self._random_elements(kind, random.randint(0, 10))
+            match random.randint(0, 9):
+                case 0:
+                    element = self._random_elements(kind, 1)[0]
+                    s1.add(element)
+                    expected.add(element)
+                case 1:
+                    s1.add_many(other)
+                    expected.add_many(other)
+                case 2:
+                    element = self._random_elements(kind, 1)[0]
+                    s1.discard(element)
+                    expected.discard(element)
+                case 3 if expected:
+                    i = random.randint(-len(expected), len(expected) - 1)
+                    self.assertEqual(expected.pop(i), s1.pop(i))
+                case 4:
+                    i = random.randint(-len(expected) - 5, len(expected) + 5)
+                    element = self._random_elements(kind, 1)[0]
+                    s1.insert(i, element)
+                    expected.insert(i, element)
+                case 5:
+                    s1.difference_update(other)
+                    expected.difference_update(other)
+                case 6:
+                    s1.intersection_update(other + list(expected)[::2])
+                    expected.intersection_update(other + list(expected)[::2])
+                case 7:
+                    s1.symmetric_difference_update(other)
+                    expected.symmetric_difference_update(other)
+                case 8:
+                    reverse = random.random() < 0.5
+                    s1.sort(reverse=reverse)
+                    expected.sort(reverse=reverse)
+                case _:
+                    s1.reverse()
+                    expected.reverse()
+
+            self.assertEqual(list(expected), list(s1))
+            self.assertEqual(list(reversed(expected)), list(reversed(s1)))
+            for i, element in enumerate(expected):
+                self.assertIn(element, s1)
+                self.assertEqual(element, s1[i])
+                self.assertEqual(i, s1.index(element))
+            for element in self._random_elements(kind, 5):
+                self.assertEqual(element in expected, element in s1)
+
+            for operation in ('__and__', '__or__', '__sub__', '__xor__'):
+                self.assertEqual(list(getattr(expected, operation)(other)), list(getattr(s1, operation)(other)))
+
+    def test_kinds(self):
+        s1 = CompactOrderedSet(1, 2, 3)
+        self.assertIn(2.0, s1)
+        self.assertIn(True, s1)
+        self.assertNotIn('1', s1)
+        self.assertRaises(TypeError, s1.add, 'a')
+        self.assertRaises(TypeError, s1.add, False)
+        self.assertRaises(TypeError, s1.add, 2 ** 63)
+        self.assertRaises(TypeError, CompactOrderedSet, 1, 'a')
+        self.assertRaises(TypeError, CompactOrderedSet, 'a\0')
+
+        s2 = s1 | ['a']
+        self.assertIs(OrderedSet, s2.__class__)
+        self.assertEqual([1, 2, 3, 'a'], list(s2))
+        self.assertIs(CompactOrderedSet, (s1 | [4]).__class__)
+
+        s1.clear()
+        s1.add('ñ\ud800')
+        self.assertEqual(['ñ\ud800'], list(s1))
+
+    def test_serialization(self):
+        for elements in ([5, -1, 2 ** 40], ['a', 'bcd', '']):
+            s1 = CompactOrderedSet(elements)
+            for s2 in (pickle.loads(pickle.dumps(s1)), CompactOrderedSet.from_bytes(s1.to_bytes()), s1.deep_copy()):
+                self.assertEqual(CompactOrderedSet, s2.__class__)
+                self.assertEqual(s1, s2)
+                s2.add(7 if elements[0] == 5 else 'z')
+                self.assertNotEqual(s1, s2)
+            self.assertEqual(elements, json.loads(s1.to_json()))
+
+
+class TestConcurrentOrderedSet(TestOrderedSet):
+    def setUp(self):
+        patcher = mock.patch.dict(globals(), OrderedSet=ConcurrentOrderedSet)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_threads(self):
+        s1 = ConcurrentOrderedSet()
+
+        def work(thread_number: int):
+            for i in range(1000):
+                s1.add((thread_number, i))
+                if i % 3 == 0:
+                    s1.discard((thread_number, i - 1))
+                    list(s1)
+            with s1.transaction():
+                s1.insert(0, (thread_number, 'first'))
+                s1.insert(1, (thread_number, 'second'))
+
+        threads = [threading.Thread(target=work, args=(thread_number,)) for thread_number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8 * 1000 - 8 * 333 + 8 * 2, len(s1))
+        for i in range(0, len(s1) - 1):
+            if s1[i][1] == 'first':
+                self.assertEqual((s1[i][0], 'second'), s1[i + 1])
+
+
+class TestSharedOrderedSet(unittest.TestCase):
+    def test_shared_ordered_set(self):
+        elements = ['a', 1, (2, 'b'), None, 'a', 3.5]
+        expected = OrderedSet(elements)
+        with SharedOrderedSet(elements) as s1:
+            self.assertEqual(list(expected), list(s1))
+            self.assertEqual(list(reversed(expected)), list(reversed(s1)))
+            self.assertEqual(len(expected), len(s1))
+            for i, element in enumerate(expected):
+                self.assertIn(element, s1)
+                self.assertEqual(element, s1[i])
+                self.assertEqual(element, s1[i - len(s1)])
+                self.assertEqual(i, s1.index(element))
+            self.assertNotIn('b', s1)
+            self.assertNotIn([1], s1)
+            self.assertRaises(IndexError, s1.__getitem__, len(s1))
+            self.assertEqual(expected[1:4], s1[1:4])
+            self.assertEqual(expected & ['a', None], s1 & ['a', None])
+
+            s2 = pickle.loads(pickle.dumps(s1))
+            self.assertEqual(s1.name, s2.name)
+            self.assertEqual(list(s1), list(s2))
+            s2.close()
+            self.assertEqual(0, len(s2))